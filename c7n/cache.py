@@ -14,16 +14,24 @@
 """Provide basic caching services to avoid extraneous queries over
 multiple policies on the same resource type.
 """
+import hashlib
+import json
 import pickle
 
 import os
 import logging
+import tempfile
+import threading
 import time
 
 log = logging.getLogger('custodian.cache')
 
 CACHE_NOTIFY = False
 
+# Locks of cache files, saves merge with entries saved by other threads.
+FILE_LOCKS = {}
+FILE_LOCKS_LOCK = threading.Lock()
+
 
 def factory(config):
 
@@ -43,6 +51,11 @@ def factory(config):
             CACHE_NOTIFY = True
         return InMemoryCache()
 
+    # A path ending with a separator opts into a cache file per key in
+    # that directory, else a single cache file.
+    if config.cache.endswith(('/', os.sep)):
+        return ShardedFileCache(config)
+
     return FileCacheManager(config)
 
 
@@ -115,11 +128,37 @@ class FileCacheManager:
             log.debug("Using cache file %s" % self.cache_path)
             return True
 
+    def get_lock(self):
+        with FILE_LOCKS_LOCK:
+            return FILE_LOCKS.setdefault(self.cache_path, threading.Lock())
+
+    def read(self):
+        try:
+            if time.time() - os.stat(self.cache_path).st_mtime > self.cache_period * 60:
+                return {}
+            with open(self.cache_path, 'rb') as fh:
+                return pickle.load(fh)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return {}
+
     def save(self, key, data):
         try:
-            with open(self.cache_path, 'wb') as fh:
-                self.data[pickle.dumps(key)] = data
-                pickle.dump(self.data, fh, protocol=2)
+            k = pickle.dumps(key)
+            # policies of several regions may load and save the cache
+            # concurrently, entries saved by others since this cache was
+            # loaded are merged, and the file replaced atomically.
+            with self.get_lock():
+                self.data.update(self.read())
+                self.data[k] = data
+                fd, tmp_path = tempfile.mkstemp(
+                    dir=os.path.dirname(self.cache_path), suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'wb') as fh:
+                        pickle.dump(self.data, fh, protocol=2)
+                    os.replace(tmp_path, self.cache_path)
+                except Exception:
+                    os.unlink(tmp_path)
+                    raise
         except Exception as e:
             log.warning("Could not save cache %s err: %s" % (
                 self.cache_path, e))
@@ -134,3 +173,125 @@ class FileCacheManager:
 
     def size(self):
         return os.path.exists(self.cache_path) and os.path.getsize(self.cache_path) or 0
+
+
+class ShardedFileCache:
+    """File cache storing each key in its own file within a directory.
+
+    Only the keys requested are read, and a save only writes its own key,
+    so cost is proportional to the resources a run uses rather than to the
+    total size of the cache. Entries expire individually after the cache
+    period. Writes go to a temporary file that is atomically renamed into
+    place, so concurrent workers sharing a cache directory never observe
+    partial entries. When the directory exceeds the size cap, the least
+    recently used entries are evicted.
+    """
+
+    # Default size cap in bytes for the cache directory.
+    max_size = 1024 * 1024 * 1024
+
+    def __init__(self, config):
+        self.config = config
+        self.cache_period = config.cache_period
+        self.cache_path = os.path.abspath(
+            os.path.expanduser(
+                os.path.expandvars(
+                    config.cache)))
+        self.max_size = getattr(config, 'cache_size', None) or self.max_size
+        self.data = {}
+
+    def get_key_path(self, key):
+        digest = hashlib.sha256(
+            json.dumps(key, sort_keys=True, default=str).encode('utf8')).hexdigest()
+        return os.path.join(self.cache_path, "%s.cache" % digest)
+
+    def load(self):
+        return os.path.isdir(self.cache_path)
+
+    def get(self, key):
+        k = pickle.dumps(key)
+        if k in self.data:
+            return self.data[k]
+
+        key_path = self.get_key_path(key)
+        try:
+            mtime = os.stat(key_path).st_mtime
+        except OSError:
+            return None
+        now = time.time()
+        if now - mtime > self.cache_period * 60:
+            return None
+        try:
+            with open(key_path, 'rb') as fh:
+                value = pickle.load(fh)
+            # track recency via access time, the modification time is the entry age.
+            os.utime(key_path, (now, mtime))
+        except (OSError, EOFError, pickle.UnpicklingError) as e:
+            log.warning("Could not read cache entry %s err: %s" % (key_path, e))
+            return None
+        self.data[k] = value
+        return value
+
+    def save(self, key, data):
+        self.data[pickle.dumps(key)] = data
+        try:
+            if not os.path.isdir(self.cache_path):
+                log.info('Generating Cache directory: %s.' % self.cache_path)
+                os.makedirs(self.cache_path, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_path, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as fh:
+                    pickle.dump(data, fh, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self.get_key_path(key))
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+        except Exception as e:
+            log.warning("Could not save cache %s err: %s" % (
+                self.cache_path, e))
+            return
+        self.evict()
+
+    def entries(self):
+        results = []
+        try:
+            names = os.listdir(self.cache_path)
+        except OSError:
+            return results
+        for n in names:
+            if not n.endswith('.cache'):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_path, n))
+            except OSError:
+                continue
+            results.append((n, st))
+        return results
+
+    def evict(self):
+        """Remove expired entries, then least recently used ones over the size cap."""
+        entries = self.entries()
+        now = time.time()
+        live = []
+        for n, st in entries:
+            if now - st.st_mtime > self.cache_period * 60:
+                self._remove(n)
+            else:
+                live.append((n, st))
+        total = sum(st.st_size for n, st in live)
+        if total <= self.max_size:
+            return
+        for n, st in sorted(live, key=lambda e: e[1].st_atime):
+            self._remove(n)
+            total -= st.st_size
+            if total <= self.max_size:
+                break
+
+    def _remove(self, name):
+        try:
+            os.unlink(os.path.join(self.cache_path, name))
+        except OSError:
+            pass
+
+    def size(self):
+        return sum(st.st_size for n, st in self.entries())
@@ -101,7 +101,8 @@ def _default_options(p, blacklist=""):
     if 'cache' not in blacklist:
         p.add_argument(
             "-f", "--cache", default="~/.cache/cloud-custodian.cache",
-            help="Cache file (default %(default)s)")
+            help="Cache file, or a directory with a file per key when ending "
+                 "with a path separator (default %(default)s)")
         p.add_argument(
             "--cache-period", default=15, type=int,
             help="Cache validity in minutes (default %(default)i)")
@@ -246,6 +247,15 @@ def setup_parser():
         dest="tracer",
         help="Tracing integration",
         default=None, nargs="?", const="default")
+    run.add_argument(
+        "--stream", action="store_true",
+        help="Augment and filter resources a page at a time, retaining only matches")
+    run.add_argument(
+        "--region-workers", type=int, default=1,
+        help="Number of regions to execute policies in concurrently")
+    run.add_argument(
+        "--describe-concurrency", type=int, default=None,
+        help="Number of detail calls in flight per policy with the describe-async source")
 
     schema_desc = ("Browse the available vocabularies (resources, filters, modes, and "
                    "actions) for policy construction. The selector "
@@ -293,6 +303,8 @@ def setup_parser():
         "-c", "--config", help=argparse.SUPPRESS)
     validate.add_argument("configs", nargs='*',
                           help="Policy Configuration File(s)")
+    validate.add_argument("-j", "--jobs", type=int, default=1,
+                          help="Validate policies with this many processes")
     validate.add_argument("-v", "--verbose", action="count", help="Verbose Logging")
     validate.add_argument("-q", "--quiet", action="count", help="Less logging (repeatable)")
     validate.add_argument("--debug", default=False, help=argparse.SUPPRESS)
@@ -0,0 +1,143 @@
+# Copyright 2020 Cloud Custodian Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Columnar resource records.
+
+Writes a policy's resources as a parquet file. Scalar top level
+attributes present on every resource are stored as typed columns, and
+the remaining attributes of each resource as a json column.
+
+Requires pyarrow, from the `columnar` extra.
+"""
+import datetime
+import json
+
+from dateutil.tz import tzutc
+
+from c7n.utils import dumps
+
+try:
+    import pyarrow
+    import pyarrow.parquet as parquet
+    HAVE_ARROW = True
+except ImportError:
+    HAVE_ARROW = False
+
+
+JSON_COLUMN = 'c7n:json'
+
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def get_value_type(value):
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, int):
+        return INT64_MIN <= value <= INT64_MAX and 'int' or False
+    if isinstance(value, float):
+        return 'float'
+    if isinstance(value, str):
+        return 'string'
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        return 'timestamp'
+    return False
+
+
+def merge_types(t1, t2):
+    if t1 is None or t1 == t2:
+        return t2
+    if t2 is None:
+        return t1
+    if {t1, t2} == {'int', 'float'}:
+        return 'float'
+    return False
+
+
+def get_column_types(resources):
+    """Map the scalar attributes present on all resources to their column type.
+
+    Attributes of varying or non scalar types, or that are null on all
+    resources, are left to the json column.
+    """
+    if not resources:
+        return {}
+    types = dict.fromkeys(resources[0])
+    types.pop(JSON_COLUMN, None)
+    for r in resources:
+        for k, t in list(types.items()):
+            if k not in r:
+                del types[k]
+                continue
+            t = merge_types(t, get_value_type(r[k]))
+            if t is False:
+                del types[k]
+            else:
+                types[k] = t
+    return {k: t for k, t in types.items() if t is not None}
+
+
+def get_arrow_type(column_type):
+    return {
+        'bool': pyarrow.bool_(),
+        'int': pyarrow.int64(),
+        'float': pyarrow.float64(),
+        'string': pyarrow.string(),
+        'timestamp': pyarrow.timestamp('us', tz='UTC')}[column_type]
+
+
+def get_columns(resources, types):
+    """Split resources into column values and json encoded remainders."""
+    columns = {k: [] for k in types}
+    remainder = []
+    for r in resources:
+        for k, t in types.items():
+            v = r[k]
+            if t == 'timestamp' and v is not None:
+                v = v.astimezone(tzutc()).replace(tzinfo=None)
+            columns[k].append(v)
+        remainder.append(dumps({k: v for k, v in r.items() if k not in types}, indent=None))
+    columns[JSON_COLUMN] = remainder
+    return columns
+
+
+def write_resources(path, resources):
+    types = get_column_types(resources)
+    columns = get_columns(resources, types)
+    fields = [pyarrow.field(k, get_arrow_type(t)) for k, t in types.items()]
+    fields.append(pyarrow.field(JSON_COLUMN, pyarrow.string()))
+    schema = pyarrow.schema(fields)
+    table = pyarrow.Table.from_arrays(
+        [pyarrow.array(columns[f.name], type=f.type) for f in fields], schema=schema)
+    parquet.write_table(table, path, compression='zstd')
+
+
+def iter_resources(fh):
+    """Iterate the resources of a parquet file.
+
+    Timestamps are returned in their json serialized form, matching
+    resources read from json records.
+    """
+    for batch in parquet.ParquetFile(fh).iter_batches():
+        columns = batch.to_pydict()
+        remainder = columns.pop(JSON_COLUMN)
+        for i, extra in enumerate(remainder):
+            r = {}
+            for k, values in columns.items():
+                v = values[i]
+                if isinstance(v, datetime.datetime):
+                    v = v.isoformat()
+                r[k] = v
+            r.update(json.loads(extra))
+            yield r
@@ -14,6 +14,7 @@
 from collections import Counter, defaultdict
 from datetime import timedelta, datetime
 from functools import wraps
+import contextvars
 import json
 import itertools
 import logging
@@ -24,7 +25,9 @@ import yaml
 from yaml.constructor import ConstructorError
 
 from c7n.exceptions import ClientError, PolicyValidationError
+from c7n.executor import ThreadPoolExecutor
 from c7n.provider import clouds
+from c7n.planner import FetchPlanner
 from c7n.policy import Policy, PolicyCollection, load as policy_load
 from c7n.schema import ElementSchema, StructureParser, generate
 from c7n.utils import load_file, local_session, SafeLoader, yaml_dump
@@ -229,9 +232,10 @@ def validate(options):
             errors.append(e)
             continue
 
-        load_resources(structure.get_resource_types(data))
-        schm = schema.generate()
-        errors += schema.validate(data, schm)
+        resource_types = structure.get_resource_types(data)
+        load_resources(resource_types)
+        schm = schema.generate(resource_types)
+        errors += schema.validate(data, schm, getattr(options, 'jobs', None) or 1)
         conf_policy_names = {
             p.get('name', 'unknown') for p in data.get('policies', ())}
         dupes = conf_policy_names.intersection(used_policy_names)
@@ -265,8 +269,6 @@ def validate(options):
 
 @policy_command
 def run(options, policies):
-    exit_code = 0
-
     # AWS - Sanity check that we have an assumable role before executing policies
     # Todo - move this behind provider interface
     if options.assume_role and [p for p in policies if p.provider_name == 'aws']:
@@ -276,22 +278,123 @@ def run(options, policies):
             log.exception("Unable to assume role %s", options.assume_role)
             sys.exit(1)
 
+    # Fetch resources shared by several policies only once
+    planner = FetchPlanner(policies)
+    planner.plan()
+
+    region_workers = getattr(options, 'region_workers', None) or 1
+    if region_workers > 1:
+        errored_policies = run_regions(options, planner, policies, region_workers)
+    else:
+        errored_policies = run_policies(options, planner, policies)
+
+    if errored_policies:
+        log.error("The following policies had errors while executing\n - %s" % (
+            "\n - ".join(errored_policies)))
+        sys.exit(2)
+
+
+def run_policies(options, planner, policies):
     errored_policies = []
     for policy in policies:
         try:
             policy()
         except Exception:
-            exit_code = 2
             errored_policies.append(policy.name)
             if options.debug:
                 raise
             log.exception(
                 "Error while executing policy %s, continuing" % (
                     policy.name))
-    if exit_code != 0:
-        log.error("The following policies had errors while executing\n - %s" % (
-            "\n - ".join(errored_policies)))
-        sys.exit(exit_code)
+        finally:
+            planner.complete(policy)
+    return errored_policies
+
+
+def run_regions(options, planner, policies, workers):
+    """Execute the policies of each region concurrently.
+
+    Policies within a region execute in order, each region in a worker
+    thread. Log output is emitted in region order.
+    """
+    regions = {}
+    for p in policies:
+        regions.setdefault(p.options.region, []).append(p)
+
+    errored_policies = []
+    with RegionLogBuffer(regions) as logs:
+        with ThreadPoolExecutor(max_workers=workers) as w:
+            futures = [
+                (region, w.submit(
+                    logs.run, region, run_policies, options, planner, region_policies))
+                for region, region_policies in regions.items()]
+            for region, f in futures:
+                try:
+                    errored_policies.extend(f.result())
+                finally:
+                    logs.flush(region)
+    return errored_policies
+
+
+class RegionLogBuffer(logging.Filter):
+    """Order the log output of regions executing concurrently.
+
+    Log records are tagged with the region of the thread logging them, and
+    held back from the root logger's handlers, a region's records being
+    emitted once it and all prior regions complete.
+    """
+
+    region = contextvars.ContextVar('c7n_region', default=None)
+
+    def __init__(self, regions):
+        super(RegionLogBuffer, self).__init__()
+        self.buffers = {r: [] for r in regions}
+        self.handlers = ()
+        self.record_factory = None
+
+    def __enter__(self):
+        self.record_factory = logging.getLogRecordFactory()
+        logging.setLogRecordFactory(self.make_record)
+        self.handlers = list(logging.getLogger().handlers)
+        for h in self.handlers:
+            h.addFilter(self)
+        return self
+
+    def __exit__(self, exc_type=None, exc_value=None, exc_traceback=None):
+        logging.setLogRecordFactory(self.record_factory)
+        for h in self.handlers:
+            h.removeFilter(self)
+        for region in list(self.buffers):
+            self.flush(region)
+
+    def make_record(self, *args, **kw):
+        record = self.record_factory(*args, **kw)
+        record.c7n_region = self.region.get()
+        return record
+
+    def filter(self, record):
+        records = self.buffers.get(getattr(record, 'c7n_region', None))
+        if records is None:
+            return True
+        # a record is filtered by each handler
+        if not records or records[-1] is not record:
+            records.append(record)
+        return False
+
+    def run(self, region, func, *args):
+        # the region is carried into the threads of the policies' resource
+        # managers, filters and actions by c7n.executor.ThreadPoolExecutor
+        token = self.region.set(region)
+        try:
+            return func(*args)
+        finally:
+            self.region.reset(token)
+
+    def flush(self, region):
+        for record in self.buffers.pop(region, ()):
+            for h in self.handlers:
+                if record.levelno >= h.level:
+                    h.handle(record)
 
 
 @policy_command
@@ -325,7 +428,7 @@ def schema_cmd(options):
 
     if options.outline:
         provider = options.resource and options.resource.lower().split('.')[0] or None
-        load_available()
+        load_available(resources=False)
         outline = schema.resource_outline(provider)
         if options.json:
             print(json.dumps(outline, indent=2))
@@ -15,6 +15,7 @@
 Authentication utilities
 """
 import os
+import threading
 
 from botocore.credentials import RefreshableCredentials
 from botocore.session import get_session
@@ -43,6 +44,20 @@ class SessionFactory:
             self.session_name = "%s@%s" % (
                 self.session_name, os.environ['C7N_SESSION_SUFFIX'])
         self._subscribers = []
+        # sessions by assumption and region, when reused
+        self._sessions = None
+
+    def reuse_sessions(self):
+        """Reuse sessions, and their clients, across calls.
+
+        For processes executing policies repeatedly, ie. warm lambda
+        containers. Assumed role credentials are refreshed as they expire.
+
+        Cached clients keep the user agent they were created with, so a
+        factory reusing sessions must only serve a single policy.
+        """
+        if self._sessions is None:
+            self._sessions = {}
 
     def _set_policy_name(self, name):
         self.user_agent_name = ("CloudCustodian(%s)" % name).strip()
@@ -50,6 +65,15 @@ class SessionFactory:
     policy_name = property(None, _set_policy_name)
 
     def __call__(self, assume=True, region=None):
+        key = (bool(self.assume_role and assume), region or self.region)
+        if self._sessions and key in self._sessions:
+            session = self._sessions[key]
+            # one factory per policy, the user agent of cached clients
+            # doesn't follow policy name changes.
+            if session._session.user_agent_name != self.user_agent_name:
+                raise RuntimeError("reused sessions are bound to a single policy")
+            return self.update(session)
+
         if self.assume_role and assume:
             session = Session(profile_name=self.profile)
             session = assumed_session(
@@ -59,6 +83,9 @@ class SessionFactory:
             session = Session(
                 region_name=region or self.region, profile_name=self.profile)
 
+        if self._sessions is not None:
+            session.client = ClientCache(session.client)
+            self._sessions[key] = session
         return self.update(session)
 
     def update(self, session):
@@ -74,6 +101,45 @@ class SessionFactory:
         self._subscribers = subscribers
 
 
+class ClientCache:
+    """Reuse the clients of a session.
+
+    Clients are thread safe, while their creation from a session is
+    not, and is expensive relative to a warm lambda invocation.
+
+    Clients are keyed by their creation arguments only, settings of the
+    session applied at creation, such as the user agent, are assumed
+    fixed, see `SessionFactory.reuse_sessions`.
+    """
+
+    def __init__(self, create_client):
+        self.create_client = create_client
+        self.clients = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, service_name, region_name=None, **kw):
+        key = (service_name, region_name, tuple(sorted(kw.items())))
+        client = self.clients.get(key)
+        if client is not None:
+            return client
+        with self.lock:
+            if key not in self.clients:
+                self.clients[key] = self.create_client(service_name, region_name, **kw)
+            return self.clients[key]
+
+
+def get_event_emitters(session):
+    """The event emitters of a session, and of any clients it reuses.
+
+    Clients copy their session's event handlers on creation, so handlers
+    registered later also need registering on reused clients.
+    """
+    emitters = [session.events]
+    if isinstance(session.client, ClientCache):
+        emitters.extend(c.meta.events for c in list(session.client.clients.values()))
+    return emitters
+
+
 def assumed_session(role_arn, session_name, session=None, region=None, external_id=None):
     """STS Role assume a boto3.Session
 
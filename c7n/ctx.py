@@ -45,6 +45,14 @@ class ExecutionContext:
         self.api_stats = None
         self.sys_stats = None
 
+        # Shared resource snapshots, set by the fetch planner when
+        # several policies in a run target the same resources.
+        self.snapshots = None
+        # Related resource populations shared across the run's policies.
+        self.related = None
+        # Prior run resource state, set by incremental execution modes.
+        self.incremental = None
+
         # A few tests patch on metrics flush
         # For backward compatibility, accept both 'metrics' and 'metrics_enabled' params (PR #4361)
         metrics = self.options.metrics or self.options.metrics_enabled
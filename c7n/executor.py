@@ -11,11 +11,24 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-from concurrent.futures import (ProcessPoolExecutor, ThreadPoolExecutor)  # noqa
+from concurrent import futures
+from concurrent.futures import ProcessPoolExecutor  # noqa
 
+import contextvars
 import threading
 
 
+class ThreadPoolExecutor(futures.ThreadPoolExecutor):
+    """Thread pool executing calls in the context of their submitter.
+
+    Context variables, such as the region of a policy's log records, are
+    carried into the worker threads.
+    """
+
+    def submit(self, fn, *args, **kw):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kw)
+
+
 class MainThreadExecutor:
     """ For running tests.
 
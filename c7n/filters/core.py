@@ -18,6 +18,7 @@ import copy
 import datetime
 from datetime import timedelta
 import fnmatch
+import functools
 import ipaddress
 import logging
 import operator
@@ -108,6 +109,10 @@ OPERATORS = {
     'intersect': intersect}
 
 
+# A value filter key that is a plain attribute path rather than an expression.
+SIMPLE_KEY = re.compile(r'^(tag:.+|[\w-]+(\.[\w-]+)*)$')
+
+
 VALUE_TYPES = [
     'age', 'integer', 'expiration', 'normalize', 'size',
     'cidr', 'cidr_size', 'swap', 'resource_count', 'expr',
@@ -400,6 +405,7 @@ class ValueFilter(Filter):
     """
     expr = None
     op = v = vtype = None
+    matcher = value_regex = None
 
     schema = {
         'type': 'object',
@@ -531,21 +537,7 @@ class ValueFilter(Filter):
 
     def get_resource_value(self, k, i):
         if k.startswith('tag:'):
-            tk = k.split(':', 1)[1]
-            r = None
-            if 'Tags' in i:
-                for t in i.get("Tags", []):
-                    if t.get('Key') == tk:
-                        r = t.get('Value')
-                        break
-            # GCP schema: 'labels': {'key': 'value'}
-            elif 'labels' in i:
-                r = i.get('labels', {}).get(tk, None)
-            # GCP has a secondary form of labels called tags
-            # as labels without values.
-            # Azure schema: 'tags': {'key': 'value'}
-            elif 'tags' in i:
-                r = i.get('tags', {}).get(tk, None)
+            r = get_tag_value(i, k.split(':', 1)[1])
         elif k in i:
             r = i.get(k)
         elif k not in self.expr:
@@ -555,126 +547,234 @@ class ValueFilter(Filter):
             r = self.expr[k].search(i)
 
         if 'value_regex' in self.data:
-            regex = ValueRegex(self.data['value_regex'])
-            r = regex.get_resource_value(r)
+            r = self.get_value_regex().get_resource_value(r)
         return r
 
+    def get_value_regex(self):
+        if self.value_regex is None:
+            self.value_regex = ValueRegex(self.data['value_regex'])
+        return self.value_regex
+
     def match(self, i):
-        if self.v is None and len(self.data) == 1:
-            [(self.k, self.v)] = self.data.items()
-        elif self.v is None and not hasattr(self, 'content_initialized'):
-            self.k = self.data.get('key')
-            self.op = self.data.get('op')
-            if 'value_from' in self.data:
-                values = ValuesFrom(self.data['value_from'], self.manager)
-                self.v = values.get_values()
+        if self.matcher is None:
+            if len(self.data) == 1:
+                [(self.k, self.v)] = self.data.items()
             else:
-                self.v = self.data.get('value')
-            self.content_initialized = True
-            self.vtype = self.data.get('value_type')
+                self.k = self.data.get('key')
+                self.op = self.data.get('op')
+                if 'value_from' in self.data:
+                    values = ValuesFrom(self.data['value_from'], self.manager)
+                    self.v = values.get_values()
+                else:
+                    self.v = self.data.get('value')
+                self.content_initialized = True
+                self.vtype = self.data.get('value_type')
+            self.matcher = self.compile_matcher()
 
         if i is None:
             return False
+        return self.matcher(i)
+
+    def compile_matcher(self):
+        """Compile the filter into a predicate over a single resource.
+
+        Everything that is constant across resources, the key accessor,
+        the operator and the value type conversion of the filter value, is
+        resolved once here rather than on every match.
+        """
+        value = self.compile_accessor(self.k)
+        sentinel = self.v
+        null_value = () if self.op in ('in', 'not-in') else None
+        op = self.op and OPERATORS[self.op]
+
+        if self.vtype is None:
+            convert = None
+        elif type(self).process_value_type is not ValueFilter.process_value_type:
+            def convert(r, i):
+                return self.process_value_type(sentinel, r, i)
+        else:
+            convert = self.compile_value_type(self.vtype, sentinel)
+
+        def match(i):
+            r = value(i)
+            if r is None:
+                r = null_value
+
+            if convert is None:
+                v = sentinel
+            else:
+                v, r = convert(r, i)
+
+            if r is None and v == 'absent':
+                return True
+            elif r is not None and v == 'present':
+                return True
+            elif v == 'not-null' and r:
+                return True
+            elif v == 'empty' and not r:
+                return True
+            elif op:
+                try:
+                    return op(r, v)
+                except TypeError:
+                    return False
+            elif r == sentinel:
+                return True
+            return False
+
+        return match
 
-        # value extract
-        r = self.get_resource_value(self.k, i)
+    def compile_accessor(self, k):
+        """Return a function extracting the value of key `k` from a resource."""
+        if type(self).get_resource_value is not ValueFilter.get_resource_value:
+            return functools.partial(self.get_resource_value, k)
 
-        if self.op in ('in', 'not-in') and r is None:
-            r = ()
+        if k.startswith('tag:'):
+            tk = k.split(':', 1)[1]
 
-        # value type conversion
-        if self.vtype is not None:
-            v, r = self.process_value_type(self.v, r, i)
+            def value(i):
+                return get_tag_value(i, tk)
         else:
-            v = self.v
-
-        # Value match
-        if r is None and v == 'absent':
-            return True
-        elif r is not None and v == 'present':
-            return True
-        elif v == 'not-null' and r:
-            return True
-        elif v == 'empty' and not r:
-            return True
-        elif self.op:
-            op = OPERATORS[self.op]
-            try:
-                return op(r, v)
-            except TypeError:
-                return False
-        elif r == self.v:
-            return True
+            expr = self.expr.get(k)
 
-        return False
+            def value(i):
+                nonlocal expr
+                if k in i:
+                    return i.get(k)
+                if expr is None:
+                    expr = self.expr[k] = jmespath.compile(k)
+                return expr.search(i)
 
-    def process_value_type(self, sentinel, value, resource):
-        if self.vtype == 'normalize' and isinstance(value, str):
-            return sentinel, value.strip().lower()
+        if 'value_regex' not in self.data:
+            return value
+
+        regex = self.get_value_regex()
 
-        elif self.vtype == 'expr':
-            sentinel = self.get_resource_value(sentinel, resource)
+        def regex_value(i):
+            return regex.get_resource_value(value(i))
+        return regex_value
+
+    def process_value_type(self, sentinel, value, resource):
+        convert = self.compile_value_type(self.vtype, sentinel)
+        if convert is None:
             return sentinel, value
+        return convert(value, resource)
 
-        elif self.vtype == 'integer':
-            try:
-                value = int(str(value).strip())
-            except ValueError:
-                value = 0
-        elif self.vtype == 'size':
-            try:
-                return sentinel, len(value)
-            except TypeError:
-                return sentinel, 0
-        elif self.vtype == 'unique_size':
-            try:
-                return sentinel, len(set(value))
-            except TypeError:
-                return sentinel, 0
-        elif self.vtype == 'swap':
-            return value, sentinel
-        elif self.vtype == 'date':
-            return parse_date(sentinel), parse_date(value)
-        elif self.vtype == 'age':
+    def compile_value_type(self, vtype, sentinel):
+        """Return a conversion for the given value type, or None.
+
+        The conversion takes a resource value and the resource and
+        returns the (sentinel, value) pair to compare, with any
+        conversion of the sentinel itself done up front.
+        """
+        if vtype == 'normalize':
+            def convert(value, resource):
+                if isinstance(value, str):
+                    value = value.strip().lower()
+                return sentinel, value
+
+        elif vtype == 'expr':
+            def convert(value, resource):
+                return self.get_resource_value(sentinel, resource), value
+
+        elif vtype == 'integer':
+            def convert(value, resource):
+                try:
+                    return sentinel, int(str(value).strip())
+                except ValueError:
+                    return sentinel, 0
+
+        elif vtype == 'size':
+            def convert(value, resource):
+                try:
+                    return sentinel, len(value)
+                except TypeError:
+                    return sentinel, 0
+
+        elif vtype == 'unique_size':
+            def convert(value, resource):
+                try:
+                    return sentinel, len(set(value))
+                except TypeError:
+                    return sentinel, 0
+
+        elif vtype == 'swap':
+            def convert(value, resource):
+                return value, sentinel
+
+        elif vtype == 'date':
+            s = parse_date(sentinel)
+
+            def convert(value, resource):
+                return s, parse_date(value)
+
+        elif vtype in ('age', 'expiration'):
+            # Relative to now, unless the sentinel is already a date.
+            delta = None
             if not isinstance(sentinel, datetime.datetime):
-                sentinel = datetime.datetime.now(tz=tzutc()) - timedelta(sentinel)
-            value = parse_date(value)
-            if value is None:
-                # compatiblity
-                value = 0
-            # Reverse the age comparison, we want to compare the value being
-            # greater than the sentinel typically. Else the syntax for age
-            # comparisons is intuitively wrong.
-            return value, sentinel
-        elif self.vtype == 'cidr':
+                delta = timedelta(sentinel)
+                if vtype == 'age':
+                    delta = -delta
+
+            def convert(value, resource):
+                s = sentinel
+                if delta is not None:
+                    s = datetime.datetime.now(tz=tzutc()) + delta
+                value = parse_date(value)
+                if value is None:
+                    # compatiblity
+                    value = 0
+                # Reverse the age comparison, we want to compare the value being
+                # greater than the sentinel typically. Else the syntax for age
+                # comparisons is intuitively wrong. Expiration is for events in
+                # the future as opposed to events in the past.
+                if vtype == 'age':
+                    return value, s
+                return s, value
+
+        elif vtype == 'cidr':
             s = parse_cidr(sentinel)
-            v = parse_cidr(value)
-            if (isinstance(s, ipaddress._BaseAddress) and isinstance(v, ipaddress._BaseNetwork)):
-                return v, s
-            return s, v
-        elif self.vtype == 'cidr_size':
-            cidr = parse_cidr(value)
-            if cidr:
-                return sentinel, cidr.prefixlen
-            return sentinel, 0
-
-        # Allows for expiration filtering, for events in the future as opposed
-        # to events in the past which age filtering allows for.
-        elif self.vtype == 'expiration':
-            if not isinstance(sentinel, datetime.datetime):
-                sentinel = datetime.datetime.now(tz=tzutc()) + timedelta(sentinel)
-            value = parse_date(value)
-            if value is None:
-                value = 0
-            return sentinel, value
+            s_address = isinstance(s, ipaddress._BaseAddress)
+
+            def convert(value, resource):
+                v = parse_cidr(value)
+                if s_address and isinstance(v, ipaddress._BaseNetwork):
+                    return v, s
+                return s, v
+
+        elif vtype == 'cidr_size':
+            def convert(value, resource):
+                cidr = parse_cidr(value)
+                if cidr:
+                    return sentinel, cidr.prefixlen
+                return sentinel, 0
 
         # Allows for comparing version numbers, for things that you expect a minimum version number.
-        elif self.vtype == 'version':
+        elif vtype == 'version':
             s = ComparableVersion(sentinel)
-            v = ComparableVersion(value)
-            return s, v
 
-        return sentinel, value
+            def convert(value, resource):
+                return s, ComparableVersion(value)
+        else:
+            convert = None
+
+        return convert
+
+
+def get_tag_value(resource, key):
+    """Get the value of tag `key` on a resource, across provider schemas."""
+    if 'Tags' in resource:
+        for t in resource.get("Tags", []):
+            if t.get('Key') == key:
+                return t.get('Value')
+    # GCP schema: 'labels': {'key': 'value'}
+    elif 'labels' in resource:
+        return resource.get('labels', {}).get(key, None)
+    # GCP has a secondary form of labels called tags
+    # as labels without values.
+    # Azure schema: 'tags': {'key': 'value'}
+    elif 'tags' in resource:
+        return resource.get('tags', {}).get(key, None)
 
 
 class AgeFilter(Filter):
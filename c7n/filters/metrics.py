@@ -17,7 +17,7 @@ CloudWatch Metrics suppport for resources
 from concurrent.futures import as_completed
 from datetime import datetime, timedelta
 
-from c7n.exceptions import PolicyValidationError
+from c7n.exceptions import ClientError, PolicyValidationError
 from c7n.filters.core import Filter, OPERATORS
 from c7n.utils import local_session, type_schema, chunks
 
@@ -75,6 +75,10 @@ class MetricsFilter(Filter):
     policy to treat their request counts as 0.
 
     Note the default statistic for metrics is Average.
+
+    For larger resource sets, metrics are fetched with GetMetricData,
+    packing queries for many resources into each request. Series fetched
+    are shared by the metrics filters of a policy.
     """
 
     schema = type_schema(
@@ -97,11 +101,18 @@ class MetricsFilter(Filter):
            'missing-value': {'type': 'number'},
            'required': ('value', 'name')})
     schema_alias = True
-    permissions = ("cloudwatch:GetMetricStatistics",)
+    permissions = ("cloudwatch:GetMetricStatistics", "cloudwatch:GetMetricData")
 
     MAX_QUERY_POINTS = 50850
     MAX_RESULT_POINTS = 1440
 
+    # GetMetricData limits per request
+    MAX_DATA_QUERIES = 500
+    MAX_DATA_POINTS = 100800
+
+    # Resource set size at which metrics are fetched with GetMetricData
+    BatchThreshold = 50
+
     # Default per service, for overloaded services like ec2
     # we do type specific default namespace annotation
     # specifically AWS/EBS and AWS/EC2Spot
@@ -138,7 +149,8 @@ class MetricsFilter(Filter):
         duration = timedelta(days)
 
         self.metric = self.data['name']
-        self.end = datetime.utcnow()
+        # minute aligned, so filters in a policy can share series
+        self.end = datetime.utcnow().replace(second=0, microsecond=0)
         self.start = self.end - duration
         self.period = int(self.data.get('period', duration.total_seconds()))
         self.statistics = self.data.get('statistics', 'Average')
@@ -154,6 +166,9 @@ class MetricsFilter(Filter):
         self.namespace = ns
 
         self.log.debug("Querying metrics for %d", len(resources))
+        if len(resources) >= self.BatchThreshold:
+            return self.process_batched(resources)
+
         matched = []
         with self.executor_factory(max_workers=3) as w:
             futures = []
@@ -181,60 +196,164 @@ class MetricsFilter(Filter):
             dims.append({'Name': k, 'Value': v})
         return dims
 
+    def get_resource_dimensions(self, resource):
+        # if we overload dimensions with multiple resources we get
+        # the statistics/average over those resources.
+        dimensions = self.get_dimensions(resource)
+        # Merge in any filter specified metrics, get_dimensions is
+        # commonly overridden so we can't do it there.
+        dimensions.extend(self.get_user_dimensions())
+        return dimensions
+
+    def get_series_key(self, dimensions):
+        return (self.namespace, self.metric, self.statistics,
+                tuple((d['Name'], d['Value']) for d in dimensions),
+                self.period, self.start, self.end)
+
+    def get_series_cache(self):
+        """Metric series fetched by the metrics filters of the policy."""
+        if getattr(self.manager, 'metric_series', None) is None:
+            self.manager.metric_series = {}
+        return self.manager.metric_series
+
+    def get_annotation_key(self):
+        # Note this annotation cache is policy scoped, not across
+        # policies, still the lack of full qualification on the key
+        # means multiple filters within a policy using the same metric
+        # across different periods or dimensions would be problematic.
+        return "%s.%s.%s" % (self.namespace, self.metric, self.statistics)
+
     def process_resource_set(self, resource_set):
         client = local_session(
             self.manager.session_factory).client('cloudwatch')
+        series = self.get_series_cache()
+        key = self.get_annotation_key()
 
         matched = []
         for r in resource_set:
-            # if we overload dimensions with multiple resources we get
-            # the statistics/average over those resources.
-            dimensions = self.get_dimensions(r)
-            # Merge in any filter specified metrics, get_dimensions is
-            # commonly overridden so we can't do it there.
-            dimensions.extend(self.get_user_dimensions())
+            collected_metrics = r.setdefault('c7n.metrics', {})
+            if key not in collected_metrics:
+                dimensions = self.get_resource_dimensions(r)
+                series_key = self.get_series_key(dimensions)
+                if series_key not in series:
+                    series[series_key] = client.get_metric_statistics(
+                        Namespace=self.namespace,
+                        MetricName=self.metric,
+                        Statistics=[self.statistics],
+                        StartTime=self.start,
+                        EndTime=self.end,
+                        Period=self.period,
+                        Dimensions=dimensions)['Datapoints']
+                collected_metrics[key] = list(series[series_key])
+            if self.match_resource(r, collected_metrics[key]):
+                matched.append(r)
+        return matched
 
+    def process_batched(self, resources):
+        client = local_session(
+            self.manager.session_factory).client('cloudwatch')
+        series = self.get_series_cache()
+        key = self.get_annotation_key()
+
+        series_keys = {}
+        pending = {}
+        for r in resources:
+            if key in r.get('c7n.metrics', {}):
+                continue
+            dimensions = self.get_resource_dimensions(r)
+            series_key = series_keys[id(r)] = self.get_series_key(dimensions)
+            if series_key not in series:
+                pending[series_key] = dimensions
+        if pending:
+            series.update(self.get_metric_data(client, list(pending.items())))
+
+        matched = []
+        for r in resources:
             collected_metrics = r.setdefault('c7n.metrics', {})
-            # Note this annotation cache is policy scoped, not across
-            # policies, still the lack of full qualification on the key
-            # means multiple filters within a policy using the same metric
-            # across different periods or dimensions would be problematic.
-            key = "%s.%s.%s" % (self.namespace, self.metric, self.statistics)
             if key not in collected_metrics:
-                collected_metrics[key] = client.get_metric_statistics(
-                    Namespace=self.namespace,
-                    MetricName=self.metric,
-                    Statistics=[self.statistics],
-                    StartTime=self.start,
-                    EndTime=self.end,
-                    Period=self.period,
-                    Dimensions=dimensions)['Datapoints']
-
-            # In certain cases CloudWatch reports no data for a metric.
-            # If the policy specifies a fill value for missing data, add
-            # that here before testing for matches. Otherwise, skip
-            # matching entirely.
-            if len(collected_metrics[key]) == 0:
-                if 'missing-value' not in self.data:
+                # retrieval errored
+                if series_keys[id(r)] not in series:
                     continue
-                collected_metrics[key].append({
-                    'Timestamp': self.start,
-                    self.statistics: self.data['missing-value'],
-                    'c7n:detail': 'Fill value for missing data'
-                })
-
-            if self.data.get('percent-attr'):
-                rvalue = r[self.data.get('percent-attr')]
-                if self.data.get('attr-multiplier'):
-                    rvalue = rvalue * self.data['attr-multiplier']
-                percent = (collected_metrics[key][0][self.statistics] /
-                           rvalue * 100)
-                if self.op(percent, self.value):
-                    matched.append(r)
-            elif self.op(collected_metrics[key][0][self.statistics], self.value):
+                collected_metrics[key] = list(series[series_keys[id(r)]])
+            if self.match_resource(r, collected_metrics[key]):
                 matched.append(r)
         return matched
 
+    def get_metric_data(self, client, queries):
+        """Fetch datapoints for (series key, dimensions) pairs.
+
+        Queries are packed into GetMetricData requests up to the api's
+        limits on queries and datapoints per request. Datapoints are
+        returned in the shape of GetMetricStatistics, in ascending time
+        order.
+        """
+        points = max(1, int((self.end - self.start).total_seconds() // self.period))
+        batch_size = max(1, min(self.MAX_DATA_QUERIES, self.MAX_DATA_POINTS // points))
+        retry = getattr(self.manager, 'retry', None)
+        results = {}
+
+        for batch in chunks(queries, batch_size):
+            query_keys = {}
+            metric_queries = []
+            for idx, (series_key, dimensions) in enumerate(batch):
+                query_keys['m%d' % idx] = series_key
+                metric_queries.append({
+                    'Id': 'm%d' % idx,
+                    'MetricStat': {
+                        'Metric': {
+                            'Namespace': self.namespace,
+                            'MetricName': self.metric,
+                            'Dimensions': dimensions},
+                        'Period': self.period,
+                        'Stat': self.statistics}})
+            params = dict(
+                MetricDataQueries=metric_queries,
+                StartTime=self.start,
+                EndTime=self.end,
+                ScanBy='TimestampAscending')
+            batch_results = {k: [] for k in query_keys.values()}
+            try:
+                while True:
+                    if retry:
+                        response = retry(client.get_metric_data, **params)
+                    else:
+                        response = client.get_metric_data(**params)
+                    for r in response['MetricDataResults']:
+                        batch_results[query_keys[r['Id']]].extend(
+                            {'Timestamp': t, self.statistics: v}
+                            for t, v in zip(r['Timestamps'], r['Values']))
+                    if not response.get('NextToken'):
+                        break
+                    params['NextToken'] = response['NextToken']
+            except ClientError as e:
+                self.log.warning("CW Retrieval error: %s" % e)
+                continue
+            results.update(batch_results)
+        return results
+
+    def match_resource(self, r, datapoints):
+        # In certain cases CloudWatch reports no data for a metric.
+        # If the policy specifies a fill value for missing data, add
+        # that here before testing for matches. Otherwise, skip
+        # matching entirely.
+        if len(datapoints) == 0:
+            if 'missing-value' not in self.data:
+                return False
+            datapoints.append({
+                'Timestamp': self.start,
+                self.statistics: self.data['missing-value'],
+                'c7n:detail': 'Fill value for missing data'
+            })
+
+        if self.data.get('percent-attr'):
+            rvalue = r[self.data.get('percent-attr')]
+            if self.data.get('attr-multiplier'):
+                rvalue = rvalue * self.data['attr-multiplier']
+            percent = (datapoints[0][self.statistics] /
+                       rvalue * 100)
+            return self.op(percent, self.value)
+        return self.op(datapoints[0][self.statistics], self.value)
+
 
 class ShieldMetrics(MetricsFilter):
     """Specialized metrics filter for shield
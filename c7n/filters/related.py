@@ -52,6 +52,10 @@ class RelatedResourceFilter(ValueFilter):
         resource_manager = self.get_resource_manager()
         related_ids = self.get_related_ids(resources)
         model = resource_manager.get_model()
+        registry = getattr(self.manager.ctx, 'related', None)
+        if registry is not None and (
+                resource_manager in registry or len(related_ids) >= self.FetchThreshold):
+            return {r[model.id]: r for r in registry.get(resource_manager, related_ids)}
         if len(related_ids) < self.FetchThreshold:
             related = resource_manager.get_resources(list(related_ids))
         else:
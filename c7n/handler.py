@@ -17,8 +17,10 @@ Cloud-Custodian AWS Lambda Entry Point
 import os
 import logging
 import json
+import time
 
 from c7n.config import Config
+from c7n.credentials import SessionFactory
 from c7n.structure import StructureParser
 from c7n.resources import load_resources
 from c7n.policy import PolicyCollection
@@ -63,6 +65,12 @@ policy_data = None
 # execution options for the policy
 policy_config = None
 
+# policies, reused across warm invocations of the container
+policies = None
+
+# seconds spent initializing the container's policies
+init_duration = None
+
 
 def init_env_globals():
     """Set module level values from environment variables.
@@ -142,6 +150,19 @@ def init_config(policy_config):
     return Config.empty(**exec_options)
 
 
+def init_policies(policy_data, policy_config):
+    """Load the policies of a container.
+
+    Policies and their sessions are reused across warm invocations,
+    along with sessions' clients.
+    """
+    collection = PolicyCollection.from_data(policy_data, policy_config)
+    for p in collection:
+        if isinstance(p.session_factory, SessionFactory):
+            p.session_factory.reuse_sessions()
+    return collection
+
+
 # One time initilization of global environment settings
 init_env_globals()
 
@@ -153,12 +174,19 @@ def dispatch_event(event, context):
         return
 
     # one time initialization for cold starts.
-    global policy_config, policy_data
-    if policy_config is None:
+    # the globals are only set once initialization succeeds, so a failed
+    # cold start is retried by the next invocation.
+    global policy_config, policy_data, policies, init_duration
+    cold_start = policies is None
+    if cold_start:
+        t = time.time()
         with open('config.json') as f:
-            policy_data = json.load(f)
-        policy_config = init_config(policy_data)
-        load_resources(StructureParser().get_resource_types(policy_data))
+            data = json.load(f)
+        config = init_config(data)
+        load_resources(StructureParser().get_resource_types(data))
+        collection = init_policies(data, config)
+        policy_data, policy_config, policies = data, config, collection
+        init_duration = time.time() - t
 
     if C7N_DEBUG_EVENT:
         event['debug'] = True
@@ -167,9 +195,18 @@ def dispatch_event(event, context):
     if not policy_data or not policy_data.get('policies'):
         return False
 
-    policies = PolicyCollection.from_data(policy_data, policy_config)
+    t = time.time()
+    # the container's init time is put once, with its first policy.
+    put_init_time = cold_start
     for p in policies:
         try:
+            # filters and actions hold per execution state, so
+            # each invocation starts with a fresh resource manager.
+            if not cold_start:
+                p.resource_manager = p.load_resource_manager()
+            elif put_init_time:
+                p.ctx.metrics.put_metric('InitTime', init_duration, 'Seconds')
+                put_init_time = False
             # validation provides for an initialization point for
             # some filters/actions.
             p.validate()
@@ -179,4 +216,7 @@ def dispatch_event(event, context):
             if C7N_CATCH_ERR:
                 continue
             raise
+    log.debug(
+        "Invocation cold-start:%s init:%0.2f invoke:%0.2f",
+        cold_start, cold_start and init_duration or 0, time.time() - t)
     return True
@@ -0,0 +1,169 @@
+# Copyright 2020 Cloud Custodian Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Resource state for incremental policy evaluation.
+
+Records a fingerprint of each resource's augmented document along with
+the policy's filter verdict and annotations, so a subsequent run only
+evaluates filters on new or changed resources.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+
+from c7n.utils import DateTimeEncoder, dumps
+
+log = logging.getLogger('custodian.incremental')
+
+
+def fingerprint(data):
+    return hashlib.sha256(json.dumps(
+        data, cls=DateTimeEncoder, sort_keys=True).encode('utf8')).hexdigest()
+
+
+class ResourceState:
+    """Prior run fingerprints and filter verdicts of a policy's resources.
+
+    State is only reused when it was recorded for the same policy
+    definition, and is younger than `max_age` seconds, as filters may
+    depend on time (ie. resource age, or metrics) and not just on the
+    resource document.
+
+    Filters may also depend on other resources, ie. a security group
+    being unused depends on the network interfaces referencing it. Once
+    filters are seen looking up other resource types, all resources are
+    evaluated on each run, and only actions are incremental.
+
+    Verdicts of resources acted upon are held as pending, and only
+    recorded once committed after the actions succeed.
+    """
+
+    def __init__(self, path, policy_data, max_age):
+        self.path = path
+        self.policy_fingerprint = fingerprint(policy_data)
+        self.max_age = max_age
+        self.resources = {}
+        self.created = time.time()
+        self.related = False
+        self.evaluating = False
+        self.filtered = False
+        self.updated = {}
+        self.pending = {}
+        self.changed = set()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as fh:
+            try:
+                data = json.load(fh)
+            except ValueError:
+                log.warning("Ignoring invalid resource state %s", self.path)
+                return False
+        if data.get('policy') != self.policy_fingerprint:
+            log.debug("Policy changed, evaluating all resources")
+            return False
+        if time.time() - data['created'] > self.max_age:
+            log.debug("Resource state expired, evaluating all resources")
+            return False
+        self.resources = data['resources']
+        self.created = data['created']
+        self.related = data.get('related', False)
+        return True
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = "%s.tmp" % self.path
+        with open(tmp_path, 'w') as fh:
+            dumps({'policy': self.policy_fingerprint,
+                   'created': self.created,
+                   'related': self.related,
+                   'resources': self.updated}, fh, indent=None)
+        os.replace(tmp_path, self.path)
+
+    def commit(self):
+        """Record the verdicts of resources whose actions succeeded."""
+        self.updated.update(self.pending)
+        self.pending = {}
+
+    def evaluate(self, manager, resources, event):
+        self.evaluating = True
+        try:
+            return {id(r) for r in manager.filter_resources(
+                resources, event, filters=manager.filters)}
+        finally:
+            self.evaluating = False
+
+    def filter(self, manager, resources, event=None):
+        """Filter resources, evaluating only those new or changed.
+
+        Unchanged resources take their prior verdict and annotations,
+        unless filters depend on other resources. Resources newly matched
+        are tracked in `changed`.
+        """
+        id_key = manager.get_model().id
+        fresh = []
+        known = {}
+        fingerprints = {}
+        for r in resources:
+            rid = r.get(id_key)
+            fingerprints[id(r)] = fp = fingerprint(r)
+            prior = rid is not None and self.resources.get(rid) or None
+            if prior and prior['fingerprint'] == fp:
+                known[id(r)] = prior
+            else:
+                fresh.append(r)
+
+        keys = {id(r): set(r) for r in resources}
+        evaluated = self.related and list(resources) or fresh
+        matched = self.evaluate(manager, evaluated, event)
+        if self.related and len(evaluated) < len(resources):
+            # filters looked up other resources while evaluating those
+            # changed, so verdicts of unchanged resources may differ too.
+            log.debug("Filters depend on other resources, evaluating all resources")
+            unchanged = [r for r in resources if id(r) in known]
+            matched.update(self.evaluate(manager, unchanged, event))
+            evaluated = resources
+        evaluated = {id(r) for r in evaluated}
+
+        results = []
+        for r in resources:
+            rid = r.get(id_key)
+            prior = known.get(id(r))
+            if id(r) not in evaluated:
+                if prior['matched']:
+                    r.update(prior['annotations'])
+                    results.append(r)
+                self.updated[rid] = prior
+                continue
+            annotations = {k: v for k, v in r.items() if k not in keys[id(r)]}
+            is_matched = id(r) in matched
+            entry = {
+                'fingerprint': fingerprints[id(r)],
+                'matched': is_matched,
+                'annotations': json.loads(dumps(annotations))}
+            if is_matched:
+                results.append(r)
+            if is_matched and not (prior and prior['matched']):
+                self.changed.add(id(r))
+                if rid is not None:
+                    self.pending[rid] = entry
+            elif rid is not None:
+                self.updated[rid] = entry
+        self.filtered = True
+        log.debug(
+            "Evaluated %d of %d resources, matched %d",
+            len(evaluated), len(resources), len(results))
+        return results
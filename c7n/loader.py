@@ -49,6 +49,8 @@ class SchemaValidator:
         return errors or []
 
     def _validate(self, policy_data):
+        if schema.is_valid(self.validator, policy_data):
+            return schema.check_unique(policy_data) or []
         errors = list(self.validator.iter_errors(policy_data))
         if not errors:
             return schema.check_unique(policy_data) or []
@@ -80,9 +82,7 @@ class SchemaValidator:
     def _gen_schema(self, resource_types):
         if schema is None:
             raise RuntimeError("missing jsonschema dependency")
-        rt_schema = schema.generate(resource_types)
-        schema.JsonSchemaValidator.check_schema(rt_schema)
-        return schema.JsonSchemaValidator(rt_schema)
+        return schema.get_validator(schema.generate(resource_types))
 
 
 class PolicyLoader:
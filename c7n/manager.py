@@ -94,6 +94,12 @@ class ResourceManager:
         else:
             provider_name = self.ctx.policy.provider_name
 
+        # incremental evaluation can't reuse verdicts of filters
+        # depending on other resources.
+        incremental = getattr(self.ctx, 'incremental', None)
+        if incremental is not None and incremental.evaluating:
+            incremental.related = True
+
         # check and load
         load_resources(('%s.%s' % (provider_name, resource_type),))
         provider_resources = clouds[provider_name].resources
@@ -107,12 +113,31 @@ class ResourceManager:
             return klass(self.ctx, {'source': self.source_type})
         return klass(self.ctx, data or {})
 
-    def filter_resources(self, resources, event=None):
+    def get_related_resources(self, resource_type, augment=True):
+        """Get the full population of another resource type.
+
+        Within a run, populations are fetched once and shared by all
+        policies, see :class:`c7n.planner.RelatedResources`.
+        """
+        manager = self.get_resource_manager(resource_type)
+        registry = getattr(self.ctx, 'related', None)
+        if registry is not None:
+            return registry.resources(manager, augment)
+        if augment:
+            return manager.resources()
+        return manager.resources(augment=False)
+
+    def filter_resources(self, resources, event=None, filters=None):
+        if filters is None:
+            incremental = getattr(self.ctx, 'incremental', None)
+            if incremental is not None and self.data == self.ctx.policy.data:
+                return incremental.filter(self, resources, event)
+            filters = self.filters
         original = len(resources)
         if event and event.get('debug', False):
             self.log.info(
-                "Filtering resources using %d filters", len(self.filters))
-        for idx, f in enumerate(self.filters, start=1):
+                "Filtering resources using %d filters", len(filters))
+        for idx, f in enumerate(filters, start=1):
             if not resources:
                 break
             rcount = len(resources)
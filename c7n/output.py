@@ -29,6 +29,7 @@ import time
 import uuid
 
 
+from c7n.columnar import HAVE_ARROW
 from c7n.exceptions import InvalidOutputConfig
 from c7n.registry import PluginRegistry
 from c7n.utils import parse_url_config
@@ -351,9 +352,17 @@ class LogOutput:
             return
         self.handler.setLevel(logging.DEBUG)
         self.handler.setFormatter(logging.Formatter(self.log_format))
+        self.handler.addFilter(self.filter_region)
         mlog = logging.getLogger('custodian')
         mlog.addHandler(self.handler)
 
+    def filter_region(self, record):
+        # skip records of policies executing concurrently in other regions,
+        # records logged outside of a region's execution aren't the policy's.
+        if not hasattr(record, 'c7n_region'):
+            return True
+        return record.c7n_region == self.ctx.options.region
+
     def leave_log(self):
         if self.handler is None:
             return
@@ -412,17 +421,36 @@ class NullBlobOutput:
         return
 
 
+RECORD_FORMATS = ('json', 'parquet')
+
+
+def get_record_format(config):
+    """The resource record format of a blob output, from its `format` url parameter."""
+    record_format = config.get('format', 'json')
+    if record_format not in RECORD_FORMATS:
+        raise InvalidOutputConfig(
+            "Invalid output format: %s, expected one of %s" % (
+                record_format, ", ".join(RECORD_FORMATS)))
+    if record_format == 'parquet' and not HAVE_ARROW:
+        raise InvalidOutputConfig("Parquet output requires pyarrow, install c7n[columnar]")
+    return record_format
+
+
 @blob_outputs.register('file')
 @blob_outputs.register('default')
 class DirectoryOutput:
 
     permissions = ()
 
+    # files whose format is already compressed
+    compressed_suffixes = ('.gz', '.parquet')
+
     def __init__(self, ctx, config):
         self.ctx = ctx
         self.config = config
+        self.format = get_record_format(config)
 
-        output_path = self.get_output_path(config['url'])
+        output_path = self.get_output_path(config['url'].split('?', 1)[0])
         if output_path.startswith('file://'):
             output_path = output_path[len('file://'):]
 
@@ -444,6 +472,8 @@ class DirectoryOutput:
         # downloading tar and extracting.
         for root, dirs, files in os.walk(self.root_dir):
             for f in files:
+                if f.endswith(self.compressed_suffixes):
+                    continue
                 fp = os.path.join(root, f)
                 with gzip.open(fp + ".gz", "wb", compresslevel=7) as zfh:
                     with open(fp, "rb") as sfh:
@@ -471,9 +501,11 @@ class BlobOutput(DirectoryOutput):
 
     def __init__(self, ctx, config):
         self.ctx = ctx
+        self.format = get_record_format(config)
         # we allow format strings in output urls so reparse config
         # post interpolation.
-        self.config = parse_url_config(self.get_output_path(config['url']))
+        self.config = parse_url_config(
+            self.get_output_path(config['url'].split('?', 1)[0]))
         self.bucket = self.config.netloc
         self.key_prefix = self.config.path.strip('/')
         self.root_dir = tempfile.mkdtemp()
@@ -0,0 +1,251 @@
+# Copyright 2020 Cloud Custodian Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Shared resource fetch planning across the policies of a run.
+
+Policies that target the same resource population (provider, account,
+region, resource type, source and query) are grouped, so the population
+is enumerated and augmented once and every policy in the group runs its
+filters over a private copy of that snapshot.
+
+Related resource populations, used by filters that look up resources of
+another type, are likewise fetched once per run and shared.
+"""
+from concurrent.futures import Future
+import copy
+import logging
+import pickle
+import threading
+
+from c7n.utils import dumps
+
+log = logging.getLogger('custodian.planner')
+
+
+class ResourceSnapshots:
+    """Execution scoped store of augmented resource populations.
+
+    Keyed by resource manager cache keys. Resources are copied on the way
+    in and out, as filters and actions annotate resources in place.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+
+    def get(self, key):
+        with self.lock:
+            resources = self.data.get(pickle.dumps(key))
+            if resources is None:
+                return None
+            self.hits += 1
+        return copy.deepcopy(resources)
+
+    def save(self, key, resources):
+        resources = copy.deepcopy(resources)
+        with self.lock:
+            self.data[pickle.dumps(key)] = resources
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def __len__(self):
+        return len(self.data)
+
+
+class RelatedResources:
+    """Execution scoped registry of related resource populations.
+
+    Filters that resolve related resources, such as the security groups
+    of an instance or the network interfaces using a security group,
+    fetch the full population of the related resource type here once per
+    run, keyed by the related manager's cache key (account, region,
+    resource type and source). Populations are shared rather than copied,
+    so callers must treat them as read only.
+
+    Concurrent requests for a population being fetched wait on that
+    fetch, while fetches of other populations proceed.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.indexes = {}
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+
+    def fetch(self, manager, augment):
+        if augment:
+            return manager.resources()
+        return manager.resources(augment=False)
+
+    def get_key(self, manager, augment=True):
+        return pickle.dumps((manager.get_cache_key(None), manager.data, augment))
+
+    def resources(self, manager, augment=True):
+        if not hasattr(manager, 'get_cache_key'):
+            return self.fetch(manager, augment)
+        key = self.get_key(manager, augment)
+        ident = threading.get_ident()
+        future = waiting = None
+        with self.lock:
+            resources = self.data.get(key)
+            if resources is not None:
+                self.hits += 1
+                return resources
+            fetching = self.pending.get(key)
+            if fetching is None:
+                future = Future()
+                self.pending[key] = (future, ident)
+            elif fetching[1] != ident:
+                self.hits += 1
+                waiting = fetching[0]
+        if waiting is not None:
+            return waiting.result()
+        if future is None:
+            # needed while fetching itself, fetched again uncached
+            return self.fetch(manager, augment)
+
+        try:
+            resources = self.fetch(manager, augment)
+        except Exception as e:
+            with self.lock:
+                self.pending.pop(key, None)
+            future.set_exception(e)
+            raise
+        with self.lock:
+            self.data[key] = resources
+            self.pending.pop(key, None)
+        future.set_result(resources)
+        return resources
+
+    def get(self, manager, ids):
+        """Get related resources by id from the full population."""
+        resources = self.resources(manager)
+        key = index = None
+        if hasattr(manager, 'get_cache_key'):
+            key = self.get_key(manager)
+            with self.lock:
+                index = self.indexes.get(key)
+        if index is None:
+            model = manager.get_model()
+            index = {r[model.id]: r for r in resources}
+            if key is not None:
+                with self.lock:
+                    index = self.indexes.setdefault(key, index)
+        return [index[i] for i in ids if i in index]
+
+    def __contains__(self, manager):
+        return hasattr(manager, 'get_cache_key') and self.get_key(manager) in self.data
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.indexes.clear()
+
+
+class FetchPlanner:
+    """Group policies by shared resource population.
+
+    Only policies that will query resources in this process (pull mode,
+    or any mode when running as a dryrun) are planned. Once every policy
+    in a group has executed, its snapshots are released. A policy that
+    executes actions invalidates its group's snapshots, so subsequent
+    policies observe any changes it made.
+
+    All planned policies also share a registry of related resources,
+    released when the run completes and invalidated likewise by actions.
+    """
+
+    def __init__(self, policies):
+        self.policies = policies
+        self.groups = {}
+        self.pending = {}
+        self.related = RelatedResources()
+        self.related_pending = 0
+        # policies of different regions may complete concurrently
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def is_local(policy):
+        from c7n.policy import ServerlessExecutionMode
+
+        mode = policy.get_execution_mode()
+        return not (isinstance(mode, ServerlessExecutionMode) and not policy.options.dryrun)
+
+    @classmethod
+    def get_group_key(cls, policy):
+        if not cls.is_local(policy):
+            return None
+        manager = policy.resource_manager
+        if not hasattr(manager, 'get_cache_key'):
+            return None
+        return (
+            policy.provider_name,
+            policy.options.account_id,
+            policy.options.region,
+            policy.resource_type,
+            getattr(manager, 'source_type', None),
+            dumps(manager.data.get('query'), indent=None))
+
+    def plan(self):
+        groups = {}
+        for p in self.policies:
+            if not self.is_local(p):
+                continue
+            p.ctx.related = self.related
+            self.related_pending += 1
+            key = self.get_group_key(p)
+            if key is None:
+                continue
+            groups.setdefault(key, []).append(p)
+
+        for key, policies in groups.items():
+            if len(policies) < 2:
+                continue
+            snapshots = ResourceSnapshots()
+            for p in policies:
+                p.ctx.snapshots = snapshots
+            self.groups[key] = snapshots
+            self.pending[key] = len(policies)
+
+        if self.groups:
+            log.debug(
+                "Planned %d shared resource fetches for %d policies",
+                len(self.groups), sum(self.pending.values()))
+        return self.groups
+
+    def complete(self, policy):
+        """Record a policy's execution, releasing snapshots no longer needed."""
+        with self.lock:
+            self._complete(policy)
+
+    def _complete(self, policy):
+        if policy.ctx.related is self.related:
+            self.related_pending -= 1
+            if (self.related_pending == 0 or
+                    policy.resource_manager.actions and not policy.options.dryrun):
+                self.related.clear()
+        key = self.get_group_key(policy)
+        if key not in self.groups:
+            return
+        snapshots = self.groups[key]
+        self.pending[key] -= 1
+        if self.pending[key] == 0:
+            snapshots.clear()
+            del self.groups[key]
+            del self.pending[key]
+        elif policy.resource_manager.actions and not policy.options.dryrun:
+            snapshots.clear()
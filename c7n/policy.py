@@ -24,6 +24,7 @@ import jmespath
 
 from c7n.cwe import CloudWatchEvents
 from c7n.ctx import ExecutionContext
+from c7n.incremental import ResourceState
 from c7n.exceptions import PolicyValidationError, ClientError, ResourceLimitExceeded
 from c7n.filters import FilterRegistry, And, Or, Not
 from c7n.manager import iter_filters
@@ -31,7 +32,7 @@ from c7n.output import DEFAULT_NAMESPACE, NullBlobOutput
 from c7n.resources import load_resources
 from c7n.registry import PluginRegistry
 from c7n.provider import clouds, get_resource_class
-from c7n import utils
+from c7n import columnar, utils
 from c7n.version import version
 
 log = logging.getLogger('c7n.policy')
@@ -306,8 +307,7 @@ class PullMode(PolicyExecutionMode):
                 "ResourceCount", len(resources), "Count", Scope="Policy")
             self.policy.ctx.metrics.put_metric(
                 "ResourceTime", rt, "Seconds", Scope="Policy")
-            self.policy._write_file(
-                'resources.json', utils.dumps(resources, indent=2))
+            self.policy._write_resources(resources)
 
             if not resources:
                 return []
@@ -316,17 +316,21 @@ class PullMode(PolicyExecutionMode):
                 self.policy.log.debug("dryrun: skipping actions")
                 return resources
 
+            action_resources = self.get_action_resources(resources)
+            if not action_resources:
+                return resources
+
             at = time.time()
             for a in self.policy.resource_manager.actions:
                 s = time.time()
                 with self.policy.ctx.tracer.subsegment('action:%s' % a.type):
-                    results = a.process(resources)
+                    results = a.process(action_resources)
                 self.policy.log.info(
                     "policy:%s action:%s"
                     " resources:%d"
                     " execution_time:%0.2f" % (
                         self.policy.name, a.name,
-                        len(resources), time.time() - s))
+                        len(action_resources), time.time() - s))
                 if results:
                     self.policy._write_file(
                         "action-%s" % a.name, utils.dumps(results))
@@ -334,6 +338,84 @@ class PullMode(PolicyExecutionMode):
                 "ActionTime", time.time() - at, "Seconds", Scope="Policy")
             return resources
 
+    def get_action_resources(self, resources):
+        return resources
+
+
+@execution.register('incremental-pull')
+class IncrementalPullMode(PullMode):
+    """Pull mode execution, evaluating only new or changed resources.
+
+    Fingerprints of each resource, along with the policy's filter
+    verdict, are kept in a local state file between runs. Filters are
+    only evaluated on resources that are new or changed since the prior
+    run, and actions only executed on those that match. All matched
+    resources are still returned and written to the output.
+
+    As filters may depend on time as well as the resource, all resources
+    are evaluated again once the state is older than
+    `full-evaluation-hours`, or when the policy changes. Filters looking
+    up other resources (ie. related resource filters, or security group
+    usage) are evaluated on all resources on each run. Filters on the
+    count of resources aren't supported. State is not recorded on dry
+    runs, and matches are only recorded once their actions succeed.
+
+    .. code-block:: yaml
+
+      policies:
+        - name: ec2-unencrypted-volumes
+          resource: aws.ebs
+          mode:
+            type: incremental-pull
+            full-evaluation-hours: 12
+          filters:
+            - Encrypted: false
+    """
+
+    schema = utils.type_schema(
+        'incremental-pull',
+        **{'state-dir': {'type': 'string'},
+           'full-evaluation-hours': {'type': 'number', 'minimum': 0}})
+
+    default_state_dir = '~/.cache/cloud-custodian/incremental'
+
+    def validate(self):
+        super(IncrementalPullMode, self).validate()
+        for f in iter_filters(self.policy.resource_manager.filters):
+            if f.data.get('value_type') == 'resource_count':
+                raise PolicyValidationError(
+                    "policy:%s incremental-pull mode doesn't support resource_count "
+                    "filters" % self.policy.name)
+
+    def get_state_path(self):
+        state_dir = self.policy.data['mode'].get('state-dir', self.default_state_dir)
+        return os.path.join(
+            os.path.expanduser(state_dir), "%s-%s-%s.json" % (
+                self.policy.options.account_id or 'default',
+                self.policy.options.region or 'default',
+                self.policy.name))
+
+    def run(self, *args, **kw):
+        state = ResourceState(
+            self.get_state_path(), self.policy.data,
+            self.policy.data['mode'].get('full-evaluation-hours', 24) * 3600)
+        state.load()
+        self.policy.ctx.incremental = state
+        try:
+            resources = super(IncrementalPullMode, self).run(*args, **kw)
+            state.commit()
+        finally:
+            self.policy.ctx.incremental = None
+            # on failure, the verdicts of resources not yet acted upon
+            # are still recorded
+            if state.filtered and not self.policy.options.dryrun:
+                state.save()
+        return resources
+
+    def get_action_resources(self, resources):
+        changed = self.policy.ctx.incremental.changed
+        return [r for r in resources if id(r) in changed]
+
 
 class LambdaMode(ServerlessExecutionMode):
     """A policy that runs/executes in lambda."""
@@ -477,8 +559,7 @@ class LambdaMode(ServerlessExecutionMode):
                 self.policy.log.info(
                     "Invoking actions %s", self.policy.resource_manager.actions)
 
-            self.policy._write_file(
-                'resources.json', utils.dumps(resources, indent=2))
+            self.policy._write_resources(resources)
 
             for action in self.policy.resource_manager.actions:
                 self.policy.log.info(
@@ -1186,6 +1267,22 @@ class Policy:
         with open(os.path.join(self.ctx.log_dir, rel_path), 'w') as fh:
             fh.write(value)
 
+    def _write_json(self, rel_path, value, indent=2):
+        # serialize directly to the file, rather than via an in memory string
+        if isinstance(self.ctx.output, NullBlobOutput):
+            return
+        with open(os.path.join(self.ctx.log_dir, rel_path), 'w') as fh:
+            utils.dumps(value, fh, indent=indent)
+
+    def _write_resources(self, resources):
+        if isinstance(self.ctx.output, NullBlobOutput):
+            return
+        if getattr(self.ctx.output, 'format', 'json') == 'parquet':
+            columnar.write_resources(
+                os.path.join(self.ctx.log_dir, 'resources.parquet'), resources)
+            return
+        self._write_json('resources.json', resources)
+
     def load_resource_manager(self):
         factory = get_resource_class(self.data.get('resource'))
         return factory(self.ctx, self.data)
@@ -25,9 +25,11 @@ import jmespath
 import os
 
 from c7n.actions import ActionRegistry
-from c7n.exceptions import ClientError, ResourceLimitExceeded, PolicyExecutionError
-from c7n.filters import FilterRegistry, MetricsFilter
-from c7n.manager import ResourceManager
+from c7n.exceptions import (
+    ClientError, ResourceLimitExceeded, PolicyExecutionError, PolicyValidationError)
+from c7n.filters import FilterRegistry, MetricsFilter, Or, ValueFilter
+from c7n.filters.core import SIMPLE_KEY
+from c7n.manager import ResourceManager, iter_filters
 from c7n.registry import PluginRegistry
 from c7n.tags import register_ec2_tags, register_universal_tags
 from c7n.utils import (
@@ -87,6 +89,33 @@ class ResourceQuery:
             client, enum_op, params, path,
             getattr(resource_manager, 'retry', None)) or []
 
+    def filter_pages(self, resource_manager, **params):
+        """Query a set of resources, yielding a page of resources at a time."""
+        if type(self).filter is not ResourceQuery.filter:
+            yield self.filter(resource_manager, **params)
+            return
+
+        m = self.resolve(resource_manager.resource_type)
+        client = local_session(self.session_factory).client(
+            m.service, resource_manager.config.region)
+        enum_op, path, extra_args = m.enum_spec
+        if extra_args:
+            params.update(extra_args)
+
+        if client.can_paginate(enum_op):
+            p = client.get_paginator(enum_op)
+            if getattr(resource_manager, 'retry', None):
+                p.PAGE_ITERATOR_CLS = RetryPageIterator
+            pages = p.paginate(**params)
+        else:
+            pages = [getattr(client, enum_op)(**params)]
+
+        path = path and jmespath.compile(path) or None
+        for data in pages:
+            if path:
+                data = path.search(data)
+            yield data or []
+
     def get(self, resource_manager, identities):
         """Get resources by identities
         """
@@ -232,6 +261,13 @@ class DescribeSource:
     def resources(self, query):
         return self.query.filter(self.manager, **query)
 
+    def resource_pages(self, query):
+        # sources that customize enumeration return a single page
+        if self.__class__.resources is not DescribeSource.resources:
+            yield self.resources(query)
+            return
+        yield from self.query.filter_pages(self.manager, **query)
+
     def get_query(self):
         return self.resource_query_factory(self.manager.session_factory)
 
@@ -283,6 +319,48 @@ class ChildDescribeSource(DescribeSource):
             self.manager.session_factory, self.manager)
 
 
+@sources.register('describe-async')
+class DescribeAsyncSource(DescribeSource):
+    """Describe source making detail calls concurrently.
+
+    Detail calls are made per resource (or per batch) on the manager's
+    executor, with up to the `describe_concurrency` config option (default
+    `concurrency`) in flight, sharing one client. Calls are paced by the
+    manager's retry, whose adaptive rate limits per operation are shared
+    across all sources in the process.
+
+    Resources with their own describe source don't support this source.
+    """
+
+    concurrency = 50
+
+    def get_concurrency(self):
+        return self.manager.config.get('describe_concurrency') or self.concurrency
+
+    def augment(self, resources):
+        model = self.manager.get_model()
+        if getattr(model, 'detail_spec', None):
+            detail_spec = model.detail_spec
+            _augment = _scalar_augment
+            resource_sets = [[r] for r in resources]
+        elif getattr(model, 'batch_detail_spec', None):
+            detail_spec = model.batch_detail_spec
+            _augment = _batch_augment
+            resource_sets = list(chunks(resources, self.manager.chunk_size))
+        else:
+            return resources
+        if not resource_sets:
+            return []
+        # botocore clients are thread safe, one is shared by the workers.
+        client = local_session(self.manager.session_factory).client(
+            model.service, region_name=self.manager.config.region)
+        _augment = functools.partial(
+            _augment, self.manager, model, detail_spec, client=client)
+        with self.manager.executor_factory(
+                max_workers=self.get_concurrency()) as w:
+            return list(itertools.chain(*w.map(_augment, resource_sets)))
+
+
 @sources.register('config')
 class ConfigSource:
 
@@ -440,7 +518,14 @@ class QueryResourceManager(ResourceManager, metaclass=QueryMeta):
     def source_type(self):
         return self.data.get('source', 'describe')
 
+    @classmethod
+    def supports_source(cls, source_type):
+        return source_type in cls.source_mapping
+
     def get_source(self, source_type):
+        if not self.supports_source(source_type):
+            raise PolicyValidationError(
+                "resource:%s does not support source:%s" % (self.type, source_type))
         return self.source_mapping.get(source_type)(self)
 
     @classmethod
@@ -484,35 +569,186 @@ class QueryResourceManager(ResourceManager, metaclass=QueryMeta):
         query = self.source.get_query_params(query)
         cache_key = self.get_cache_key(query)
         resources = None
+        snapshots = getattr(self.ctx, 'snapshots', None)
 
-        if self._cache.load():
+        if snapshots is not None:
+            resources = snapshots.get(cache_key)
+            if resources is not None:
+                self.log.debug("Using shared snapshot %s: %d" % (
+                    "%s.%s" % (self.__class__.__module__,
+                               self.__class__.__name__),
+                    len(resources)))
+
+        # populations pruned by prefilters are cached under their own key
+        prefilter_key = None
+        if snapshots is None and augment and not self.config.get('stream'):
+            prefilter_key = self.get_prefilter_cache_key(cache_key)
+
+        resource_count = None
+        if resources is None and self._cache.load():
             resources = self._cache.get(cache_key)
             if resources is not None:
                 self.log.debug("Using cached %s: %d" % (
                     "%s.%s" % (self.__class__.__module__,
                                self.__class__.__name__),
                     len(resources)))
-
-        if resources is None:
+                if snapshots is not None:
+                    snapshots.save(cache_key, resources)
+            elif prefilter_key is not None:
+                cached = self._cache.get(prefilter_key)
+                if cached is not None:
+                    resources, resource_count = cached['resources'], cached['count']
+                    self.log.debug("Using cached prefiltered %s: %d of %d" % (
+                        "%s.%s" % (self.__class__.__module__,
+                                   self.__class__.__name__),
+                        len(resources), resource_count))
+
+        filters = None
+        if resources is None and augment and self.config.get('stream'):
+            resources, filters, resource_count = self.stream_resources(query or {})
+        elif resources is None:
             if query is None:
                 query = {}
             with self.ctx.tracer.subsegment('resource-fetch'):
                 resources = self.source.resources(query)
+            resource_count = len(resources)
             if augment:
+                if snapshots is None:
+                    resources = self.prefilter_resources(resources)
+                prefiltered = len(resources) != resource_count
                 with self.ctx.tracer.subsegment('resource-augment'):
                     resources = self.augment(resources)
-                # Don't pollute cache with unaugmented resources.
-                self._cache.save(cache_key, resources)
+                # Don't pollute cache with unaugmented or partial resources.
+                if not prefiltered:
+                    self._cache.save(cache_key, resources)
+                    if snapshots is not None:
+                        snapshots.save(cache_key, resources)
+                elif prefilter_key is not None:
+                    self._cache.save(
+                        prefilter_key, {'resources': resources, 'count': resource_count})
+        elif resource_count is None:
+            resource_count = len(resources)
 
-        resource_count = len(resources)
         with self.ctx.tracer.subsegment('filter'):
-            resources = self.filter_resources(resources)
+            resources = self.filter_resources(resources, filters=filters)
 
         # Check if we're out of a policies execution limits.
         if self.data == self.ctx.policy.data:
             self.check_resource_limit(len(resources), resource_count)
         return resources
 
+    def stream_resources(self, query):
+        """Fetch, augment and filter resources a page at a time.
+
+        Enabled with the `stream` option. Rather than materializing the
+        full enumerated and augmented population, each page from the
+        source is augmented and run through the policy's filters, and
+        only matching resources are retained. Filters that operate on
+        the whole resource set, and those after them, can't be applied
+        per page and are returned for the caller to apply.
+
+        Streamed resources bypass the cache, as the full augmented
+        population is never held.
+
+        Returns the retained resources, the remaining filters, and the
+        population count.
+        """
+        page_filters, set_filters = self.get_stream_filters()
+        pages = getattr(self.source, 'resource_pages', None)
+        if pages is None:
+            pages = [self.source.resources(query)]
+        else:
+            pages = pages(query)
+
+        results = []
+        resource_count = 0
+        for page in pages:
+            resource_count += len(page)
+            page = self.prefilter_resources(page)
+            with self.ctx.tracer.subsegment('resource-augment'):
+                page = self.augment(page)
+            with self.ctx.tracer.subsegment('filter'):
+                results.extend(self.filter_resources(page, filters=page_filters))
+        self.log.debug("Streamed %d of %d %s" % (
+            len(results), resource_count, self.__class__.__name__.lower()))
+        return results, set_filters, resource_count
+
+    def get_stream_filters(self):
+        """Split filters into those applied per page and the remainder.
+
+        Filters from the first that needs the full resource set onwards,
+        an `or` block or a `resource_count` value filter, are applied
+        after streaming completes.
+        """
+        for idx, f in enumerate(self.filters):
+            if isinstance(f, Or) or any(
+                    isinstance(i, ValueFilter) and
+                    i.data.get('value_type') == 'resource_count'
+                    for i in iter_filters([f])):
+                return self.filters[:idx], self.filters[idx:]
+        return self.filters, []
+
+    def get_prefilters(self):
+        """Get the policy filters that can be applied prior to augmentation.
+
+        Resource types using the generic detail augmentation make an api
+        call per resource or batch to fetch details. The policy's leading
+        value filters, on keys that may already be present in the listed
+        resources, are used to drop resources before augmenting them.
+        """
+        m = self.get_model()
+        if not (getattr(m, 'detail_spec', None) or getattr(m, 'batch_detail_spec', None)):
+            return []
+        if (self.__class__.augment is not QueryResourceManager.augment or
+                self.source.__class__.augment not in (
+                    DescribeSource.augment, DescribeAsyncSource.augment)):
+            return []
+        if self.data != self.ctx.policy.data:
+            return []
+
+        prefilters = []
+        for f in self.filters:
+            if (type(f) is not ValueFilter or
+                    f.data.get('value_type') in ('resource_count', 'expr')):
+                break
+            key = f.data.get('key', len(f.data) == 1 and list(f.data)[0] or None)
+            if not isinstance(key, str) or not SIMPLE_KEY.match(key):
+                break
+            prefilters.append((key, f))
+        return prefilters
+
+    def get_prefilter_cache_key(self, cache_key):
+        """Get the cache key of a population pruned by the policy's prefilters.
+
+        Pruned populations are cached along with the full population
+        count, under a key including the prefilters, so they're only
+        served to policies with the same prefilters.
+        """
+        prefilters = self.get_prefilters()
+        if not prefilters:
+            return None
+        return dict(cache_key, prefilters=[f.data for k, f in prefilters])
+
+    def prefilter_resources(self, resources):
+        """Drop resources that fail a prefilter on their listed attributes.
+
+        A resource is only dropped when a prefilter's key has a value prior
+        to augmentation, the full filter chain still runs afterwards.
+        """
+        prefilters = self.get_prefilters()
+        if not prefilters or not all(isinstance(r, dict) for r in resources):
+            return resources
+        results = []
+        for r in resources:
+            for k, f in prefilters:
+                if f.get_resource_value(k, r) is not None and not f.match(r):
+                    break
+            else:
+                results.append(r)
+        self.log.debug("Prefiltered from %d to %d %s prior to augment" % (
+            len(resources), len(results), self.__class__.__name__.lower()))
+        return results
+
     def check_resource_limit(self, selection_count, population_count):
         """Check if policy's execution affects more resources then its limit.
 
@@ -674,13 +910,20 @@ class ChildResourceManager(QueryResourceManager):
             source = self.child_source
         return source
 
+    @classmethod
+    def supports_source(cls, source_type):
+        # the async source doesn't enumerate children per parent
+        if source_type == 'describe-async':
+            return False
+        return super().supports_source(source_type)
+
     def get_parent_manager(self):
         return self.get_resource_manager(self.resource_type.parent_spec[0])
 
 
-def _batch_augment(manager, model, detail_spec, resource_set):
+def _batch_augment(manager, model, detail_spec, resource_set, client=None):
     detail_op, param_name, param_key, detail_path, detail_args = detail_spec
-    client = local_session(manager.session_factory).client(
+    client = client or local_session(manager.session_factory).client(
         model.service, region_name=manager.config.region)
     op = getattr(client, detail_op)
     if manager.retry:
@@ -695,9 +938,9 @@ def _batch_augment(manager, model, detail_spec, resource_set):
     return response[detail_path]
 
 
-def _scalar_augment(manager, model, detail_spec, resource_set):
+def _scalar_augment(manager, model, detail_spec, resource_set, client=None):
     detail_op, param_name, param_key, detail_path = detail_spec
-    client = local_session(manager.session_factory).client(
+    client = client or local_session(manager.session_factory).client(
         model.service, region_name=manager.config.region)
     op = getattr(client, detail_op)
     if manager.retry:
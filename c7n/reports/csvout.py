@@ -39,29 +39,63 @@ CLI Usage
 
 
 """
-from concurrent.futures import as_completed
-
+from collections import deque
 import csv
 from datetime import datetime
 import gzip
+import hashlib
+import heapq
 import io
+from itertools import islice
 import json
 import jmespath
 import logging
+from operator import itemgetter
 import os
+import re
+import shutil
+import tempfile
+import textwrap
 from tabulate import tabulate
 
 from botocore.compat import OrderedDict
 from dateutil.parser import parse as date_parse
 
+from c7n import columnar
 from c7n.executor import ThreadPoolExecutor
 from c7n.utils import local_session, dumps
 
 log = logging.getLogger('custodian.reports')
 
+# objects larger than this are spooled to disk while awaiting decoding
+SPOOL_SIZE = 8 * 1024 * 1024
+
+# objects downloaded ahead of the records being consumed, across all
+# the policies of a report.
+PREFETCH = 20
+
+# record objects, as json or columnar output
+RECORD_SUFFIXES = ('resources.json.gz', 'resources.parquet')
+
+WHITESPACE = re.compile(r'\s*')
+SEPARATOR = re.compile(r'[\s,]*')
+STRING_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.S)
+# content of a container up to its next bracket, or an unterminated string
+CONTAINER_BODY = re.compile(r'[^\[\]{}"]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^\[\]{}"]*)*', re.S)
+SCALAR_BODY = re.compile(r'[^\s,\]]*')
+
 
 def report(policies, start_date, options, output_fh, raw_output_fh=None):
-    """Format a policy's extant records into a report."""
+    """Format a policy's extant records into a report.
+
+    Records are streamed newest first, merging the records of each
+    policy as they are fetched, and rows are written as they're produced.
+    All formats, including json, are written to `output_fh`.
+
+    Policies share a budget of `PREFETCH` objects downloaded ahead, held
+    in memory up to `SPOOL_SIZE` in total per each of them, so memory
+    doesn't grow with the number of policies reported on.
+    """
     regions = {p.options.region for p in policies}
     policy_names = {p.name for p in policies}
     formatter = Formatter(
@@ -72,41 +106,66 @@ def report(policies, start_date, options, output_fh, raw_output_fh=None):
         include_policy=len(policy_names) > 1
     )
 
-    records = []
+    # initialize policy execution context for output access
     for policy in policies:
-        # initialize policy execution context for output access
         policy.ctx.initialize()
-        if policy.ctx.output.type == 's3':
-            policy_records = record_set(
-                policy.session_factory,
-                policy.ctx.output.config['netloc'],
-                policy.ctx.output.config['path'].strip('/'),
-                start_date)
+    s3_count = len([p for p in policies if p.ctx.output.type == 's3'])
+    prefetch = max(1, PREFETCH // max(1, s3_count))
+    spool_size = min(SPOOL_SIZE, SPOOL_SIZE * PREFETCH // max(1, s3_count * prefetch))
+
+    with ThreadPoolExecutor(max_workers=20) as w:
+        streams = []
+        for policy in policies:
+            if policy.ctx.output.type == 's3':
+                policy_records = iter_record_set(
+                    policy.session_factory,
+                    policy.ctx.output.config['netloc'],
+                    policy.ctx.output.config['path'].strip('/'),
+                    start_date, w, prefetch=prefetch, spool_size=spool_size)
+            else:
+                policy_records = iter(fs_record_set(policy.ctx.log_dir, policy.name))
+            streams.append(annotate_records(
+                policy_records, policy.name, policy.options.region))
+
+        records = heapq.merge(
+            *streams, key=itemgetter('CustodianDate'), reverse=True)
+        if raw_output_fh is not None:
+            records = write_json(records, raw_output_fh)
+
+        if options.format == 'csv':
+            writer = csv.writer(output_fh)
+            writer.writerow(formatter.headers())
+            writer.writerows(formatter.iter_rows(records))
+        elif options.format == 'json':
+            for r in write_json(records, output_fh):
+                pass
         else:
-            policy_records = fs_record_set(policy.ctx.log_dir, policy.name)
+            # We special case CSV, and for other formats we pass to tabulate
+            # which needs all rows to size its columns.
+            rows = list(formatter.iter_rows(records))
+            print(tabulate(rows, formatter.headers(), tablefmt=options.format),
+                  file=output_fh)
 
-        log.debug("Found %d records for region %s", len(policy_records), policy.options.region)
 
-        for record in policy_records:
-            record['policy'] = policy.name
-            record['region'] = policy.options.region
+def annotate_records(records, policy_name, region):
+    for r in records:
+        r['policy'] = policy_name
+        r['region'] = region
+        yield r
 
-        records += policy_records
 
-    rows = formatter.to_csv(records)
+def write_json(records, fh):
+    """Write records to a file as a json array, yielding each as it is written.
 
-    if options.format == 'csv':
-        writer = csv.writer(output_fh, formatter.headers())
-        writer.writerow(formatter.headers())
-        writer.writerows(rows)
-    elif options.format == 'json':
-        print(dumps(records, indent=2))
-    else:
-        # We special case CSV, and for other formats we pass to tabulate
-        print(tabulate(rows, formatter.headers(), tablefmt=options.format))
-
-    if raw_output_fh is not None:
-        dumps(records, raw_output_fh, indent=2)
+    The output is the same as `dumps(list(records), fh, indent=2)`.
+    """
+    count = 0
+    for r in records:
+        fh.write(count and ",\n" or "[\n")
+        fh.write(textwrap.indent(dumps(r, indent=2), '  '))
+        count += 1
+        yield r
+    fh.write(count and "\n]\n" or "[]\n")
 
 
 def _get_values(record, field_list, tag_map):
@@ -197,6 +256,17 @@ class Formatter:
                 keys.add(rec_id)
         return uniq
 
+    def iter_rows(self, records, unique=True):
+        """Rows of records already in date order, first record per id only."""
+        count = 0
+        index = IdIndex()
+        for rec in records:
+            count += 1
+            if unique and not index.add(rec[self._id_field]):
+                continue
+            yield self.extract_csv(rec)
+        log.debug("Uniqued from %d to %d" % (count, len(index)))
+
     def to_csv(self, records, reverse=True, unique=True):
         if not records:
             return []
@@ -217,17 +287,45 @@ class Formatter:
         return rows
 
 
+class IdIndex:
+    """Set of record ids, kept as fixed size digests.
+
+    A long report period may see many records per id, and many ids, so
+    rather than the ids themselves we keep an eight byte hash of each.
+    """
+
+    def __init__(self):
+        self.digests = set()
+
+    def __len__(self):
+        return len(self.digests)
+
+    def add(self, rid):
+        """Add an id to the index, returning false if already present."""
+        digest = hashlib.blake2b(str(rid).encode('utf8'), digest_size=8).digest()
+        if digest in self.digests:
+            return False
+        self.digests.add(digest)
+        return True
+
+
 def fs_record_set(output_path, policy_name):
     record_path = os.path.join(output_path, 'resources.json')
+    columnar_path = os.path.join(output_path, 'resources.parquet')
 
     if not os.path.exists(record_path):
-        return []
+        if not os.path.exists(columnar_path):
+            return []
+        record_path = columnar_path
 
     mdate = datetime.fromtimestamp(
         os.stat(record_path).st_ctime)
 
-    with open(record_path) as fh:
-        records = json.load(fh)
+    with open(record_path, record_path == columnar_path and 'rb' or 'r') as fh:
+        if record_path == columnar_path:
+            records = list(columnar.iter_resources(fh))
+        else:
+            records = json.load(fh)
         [r.__setitem__('CustodianDate', mdate) for r in records]
         return records
 
@@ -237,11 +335,14 @@ def record_set(session_factory, bucket, key_prefix, start_date, specify_hour=Fal
 
     From the given start date.
     """
+    with ThreadPoolExecutor(max_workers=20) as w:
+        return list(iter_record_set(
+            session_factory, bucket, key_prefix, start_date, w, specify_hour))
 
-    s3 = local_session(session_factory).client('s3')
 
-    records = []
-    key_count = 0
+def list_record_keys(session_factory, bucket, key_prefix, start_date, specify_hour=False):
+    """The record object keys of a policy output url, newest first."""
+    s3 = local_session(session_factory).client('s3')
 
     date = start_date.strftime('%Y/%m/%d')
     if specify_hour:
@@ -256,39 +357,193 @@ def record_set(session_factory, bucket, key_prefix, start_date, specify_hour=Fal
         Prefix=key_prefix.strip('/') + '/',
         StartAfter=marker,
     )
-
-    with ThreadPoolExecutor(max_workers=20) as w:
-        for key_set in p:
-            if 'Contents' not in key_set:
-                continue
-            keys = [k for k in key_set['Contents']
-                    if k['Key'].endswith('resources.json.gz')]
-            key_count += len(keys)
-            futures = map(lambda k: w.submit(
-                get_records, bucket, k, session_factory), keys)
-
-            for f in as_completed(futures):
-                records.extend(f.result())
-
-    log.info("Fetched %d records across %d files" % (
-        len(records), key_count))
-    return records
+    keys = []
+    for key_set in p:
+        keys.extend(k['Key'] for k in key_set.get('Contents', ())
+                    if k['Key'].endswith(RECORD_SUFFIXES))
+    keys.sort(key=get_key_date, reverse=True)
+    return keys
 
 
-def get_records(bucket, key, session_factory):
-    # we're doing a lot of this in memory, worst case
-    # though we're talking about a 10k objects, else
-    # we should spool to temp files
+def iter_record_set(session_factory, bucket, key_prefix, start_date, executor,
+                    specify_hour=False, prefetch=PREFETCH, spool_size=SPOOL_SIZE):
+    """Iterate all s3 records for the given policy output url, newest first.
 
+    Keys are listed and objects downloaded on the executor, keeping up
+    to `prefetch` objects spooled ahead of the records being consumed.
+    """
+    keys = executor.submit(
+        list_record_keys, session_factory, bucket, key_prefix, start_date, specify_hour)
+    return _iter_record_set(session_factory, bucket, keys, executor, prefetch, spool_size)
+
+
+def _iter_record_set(session_factory, bucket, keys, executor, prefetch, spool_size):
+    keys = keys.result()
+    pending = deque()
+    remaining = iter(keys)
+    record_count = 0
+
+    def submit():
+        for k in islice(remaining, 1):
+            pending.append((k, executor.submit(
+                fetch_object, bucket, k, session_factory, spool_size)))
+
+    for i in range(prefetch):
+        submit()
+    try:
+        while pending:
+            key, f = pending.popleft()
+            submit()
+            with f.result() as blob:
+                custodian_date = get_key_date(key)
+                for r in iter_records(key, blob):
+                    r['CustodianDate'] = custodian_date
+                    record_count += 1
+                    yield r
+    finally:
+        for key, f in pending:
+            f.cancel()
+
+    log.info("Fetched %d records across %d files" % (record_count, len(keys)))
+
+
+def iter_records(key, blob):
+    if key.endswith('.parquet'):
+        return columnar.iter_resources(blob)
+    return iter_json_array(
+        io.TextIOWrapper(gzip.GzipFile(fileobj=blob, mode='rb'), encoding='utf8'))
+
+
+def get_key_date(key):
     # key ends with 'YYYY/mm/dd/HH/resources.json.gz'
     # so take the date parts only
-    date_str = '-'.join(key['Key'].rsplit('/', 5)[-5:-1])
-    custodian_date = date_parse(date_str)
+    return date_parse('-'.join(key.rsplit('/', 5)[-5:-1]))
+
+
+def fetch_object(bucket, key, session_factory, spool_size=SPOOL_SIZE):
+    """Download an object, spooling to disk if large."""
     s3 = local_session(session_factory).client('s3')
-    result = s3.get_object(Bucket=bucket, Key=key['Key'])
-    blob = io.BytesIO(result['Body'].read())
+    result = s3.get_object(Bucket=bucket, Key=key)
+    blob = tempfile.SpooledTemporaryFile(max_size=spool_size)
+    shutil.copyfileobj(result['Body'], blob)
+    blob.seek(0)
+    return blob
+
+
+class ValueScanner:
+    """Find the end of a json value, scanning it a chunk at a time.
 
-    records = json.load(gzip.GzipFile(fileobj=blob))
+    Containers are tracked by depth, skipping over strings, and scalars
+    end at the next separator, so a value is decoded once it's complete
+    rather than on each chunk read.
+    """
+
+    def __init__(self, start):
+        self.scalar = start not in '{["'
+        self.depth = start in '{[' and 1 or 0
+        self.in_string = start == '"'
+        self.escape = False
+
+    def scan(self, text, pos=0):
+        """Scan text from pos, returning the end of the value, or None if
+        the value continues past the text.
+        """
+        if self.scalar:
+            pos = SCALAR_BODY.match(text, pos).end()
+            return pos if pos < len(text) else None
+        if self.escape and pos < len(text):
+            self.escape = False
+            pos += 1
+        while pos < len(text):
+            if self.in_string:
+                pos = STRING_BODY.match(text, pos).end()
+                if pos == len(text):
+                    break
+                if text[pos] == '\\':
+                    # an escape at the end of the text
+                    self.escape = True
+                    break
+                self.in_string = False
+                pos += 1
+            else:
+                pos = CONTAINER_BODY.match(text, pos).end()
+                if pos == len(text):
+                    break
+                c = text[pos]
+                pos += 1
+                if c == '"':
+                    self.in_string = True
+                    continue
+                self.depth += c in '{[' and 1 or -1
+            if self.depth == 0:
+                return pos
+        return None
+
+
+def iter_json_array(fh, chunk_size=65536):
+    """Incrementally decode the items of a json array from a text stream."""
+    decoder = json.JSONDecoder()
+    buf, pos, eof = '', 0, False
+    started = False
+
+    while True:
+        pos = (started and SEPARATOR or WHITESPACE).match(buf, pos).end()
+        if pos == len(buf) and not eof:
+            buf, pos = fh.read(chunk_size), 0
+            eof = not buf
+            continue
+        if not started:
+            if buf[pos:pos + 1] != '[':
+                raise ValueError("Expected json array")
+            started = True
+            pos += 1
+            continue
+        if buf[pos:pos + 1] == ']':
+            return
+        if pos == len(buf):
+            raise ValueError("Truncated json array")
+
+        # most items are complete within the chunk, but a number or
+        # literal running to the chunk's end may continue in the next one,
+        # even if a prefix of it decodes (ie. `12.` of `12.5`).
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except ValueError:
+            end = None
+        if end is not None and not eof and buf[pos] not in '{["':
+            if SCALAR_BODY.match(buf, pos).end() == len(buf):
+                end = None
+        if end is not None:
+            pos = end
+            yield item
+            continue
+
+        # the item continues in following chunks, which are scanned for
+        # its end, and decoded once.
+        scanner = ValueScanner(buf[pos])
+        end = scanner.scan(buf, pos + 1)
+        if end is not None:
+            item, pos = decoder.raw_decode(buf, pos)
+            yield item
+            continue
+        parts = [buf[pos:]]
+        while end is None:
+            buf = fh.read(chunk_size)
+            if not buf:
+                if not scanner.scalar:
+                    raise ValueError("Truncated json array")
+                eof, end = True, 0
+                break
+            end = scanner.scan(buf)
+            parts.append(buf[:end])
+        pos = end
+        yield decoder.decode(''.join(parts))
+
+
+def get_records(bucket, key, session_factory):
+    custodian_date = get_key_date(key['Key'])
+    with fetch_object(bucket, key['Key'], session_factory) as blob:
+        records = json.load(gzip.GzipFile(fileobj=blob, mode='rb'))
     log.debug("bucket: %s key: %s records: %d",
               bucket, key['Key'], len(records))
     for r in records:
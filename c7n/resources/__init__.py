@@ -15,9 +15,20 @@
 #
 # AWS resources to manage
 #
+import importlib
+import itertools
+import json
+import logging
+import os
+import sys
+
 from c7n.provider import clouds
+from c7n.version import version
+
+log = logging.getLogger('custodian.resources')
 
 LOADED = set()
+INDEXES = {}
 
 
 def load_resources(resource_types=('*',)):
@@ -33,8 +44,10 @@ def load_resources(resource_types=('*',)):
     missing = []
     for pname, p in clouds.items():
         if '*' in pmap:
+            import_index_modules(pname, ('*',))
             p.get_resource_types(('*',))
         elif pname in pmap:
+            import_index_modules(pname, pmap[pname])
             _, not_found = p.get_resource_types(pmap[pname])
             missing.extend(not_found)
     return missing
@@ -77,9 +90,15 @@ def load_providers(provider_types):
     # Even though we're lazy loading resources we still need to import
     # those that are making available generic filters/actions
     if should_load_provider('aws', provider_types):
-        import c7n.resources.securityhub
-        import c7n.resources.sfn
-        import c7n.resources.ssm # NOQA
+        from c7n.resources.aws import AWS # noqa
+        # with an index, modules of generic filters and actions are
+        # imported along with the resources using them.
+        if load_index('aws') is None:
+            import c7n.resources.securityhub
+            import c7n.resources.sfn
+            import c7n.resources.ssm # NOQA
+        else:
+            import_index_modes('aws')
 
     if should_load_provider('azure', provider_types):
         from c7n_azure.entry import initialize_azure
@@ -97,3 +116,83 @@ def load_providers(provider_types):
         from c7n import data  # noqa
 
     LOADED.update(provider_types)
+
+
+def get_index_path(provider_name):
+    """The path of a provider's index, alongside its provider module."""
+    provider = clouds[provider_name]
+    return os.path.join(
+        os.path.dirname(sys.modules[provider.__module__].__file__),
+        '%s-index.json' % provider_name)
+
+
+def load_index(provider_name):
+    """Load a provider's resource index.
+
+    The index is generated when packaging, see tools/dev/schemaindex.py,
+    and records each resource's class, filters, actions and schema. Returns
+    None if the provider has no index for the running version.
+    """
+    if provider_name in INDEXES:
+        index = INDEXES[provider_name]
+        return index and json.loads(index)
+    index = None
+    path = get_index_path(provider_name)
+    if os.path.exists(path):
+        with open(path) as fh:
+            index = fh.read()
+        if json.loads(index).get('version') != version:
+            log.warning("Ignoring resource index %s of another version", path)
+            index = None
+    INDEXES[provider_name] = index
+    return index and json.loads(index)
+
+
+INDEX_MODULES = {}
+
+
+def reset_index(provider_name, ignore=False):
+    """Reload a provider's index on next use, or ignore the one it has."""
+    INDEX_MODULES.pop(provider_name, None)
+    if ignore:
+        INDEXES[provider_name] = None
+    else:
+        INDEXES.pop(provider_name, None)
+
+
+def get_index_modules(provider_name):
+    """Map a provider's indexed resources to their filter and action modules."""
+    if provider_name not in INDEX_MODULES:
+        index = load_index(provider_name)
+        INDEX_MODULES[provider_name] = index and {
+            'modes': index['modes'],
+            'resources': {
+                r_type_name: sorted({
+                    path.rsplit('.', 1)[0] for path in itertools.chain(
+                        rinfo['filters'].values(), rinfo['actions'].values())})
+                for r_type_name, rinfo in index['resources'].items()}}
+    return INDEX_MODULES[provider_name]
+
+
+def import_index_modes(provider_name):
+    """Import the modules of a provider's indexed execution modes."""
+    modules = get_index_modules(provider_name)
+    for m in modules and modules['modes'] or ():
+        importlib.import_module(m)
+
+
+def import_index_modules(provider_name, resource_types):
+    """Import the modules of indexed resources' filters and actions.
+
+    Modules may register filters and actions on resources of other
+    modules as they're loaded, so they're imported ahead of them.
+    """
+    modules = get_index_modules(provider_name)
+    if not modules:
+        return
+    resources = modules['resources']
+    if '*' not in resource_types:
+        resources = {r: resources[r] for r in resource_types if r in resources}
+    for m in sorted(set(itertools.chain(*resources.values()))):
+        if m not in sys.modules:
+            importlib.import_module(m)
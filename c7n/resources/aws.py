@@ -475,16 +475,19 @@ class ApiStats(DeltaStats):
 
         # With cached sessions, we need to unregister any events subscribers
         # on extant sessions to allow for the next registration.
-        utils.local_session(self.ctx.session_factory).events.unregister(
-            'after-call.*.*', self._record, unique_id='c7n-api-stats')
+        for events in credentials.get_event_emitters(
+                utils.local_session(self.ctx.session_factory)):
+            events.unregister(
+                'after-call.*.*', self._record, unique_id='c7n-api-stats')
 
         self.ctx.metrics.put_metric(
             "ApiCalls", sum(self.api_calls.values()), "Count")
         self.pop_snapshot()
 
     def __call__(self, s):
-        s.events.register(
-            'after-call.*.*', self._record, unique_id='c7n-api-stats')
+        for events in credentials.get_event_emitters(s):
+            events.register(
+                'after-call.*.*', self._record, unique_id='c7n-api-stats')
 
     def _record(self, http_response, parsed, model, **kwargs):
         self.api_calls["%s.%s" % (
@@ -40,12 +40,12 @@ Actions:
 import copy
 import functools
 import json
-import itertools
 import logging
 import math
 import os
 import time
 import ssl
+import threading
 
 from botocore.client import Config
 from botocore.exceptions import ClientError
@@ -66,6 +66,7 @@ from c7n.exceptions import PolicyValidationError
 from c7n.filters import (
     FilterRegistry, Filter, CrossAccountAccessFilter, MetricsFilter,
     ValueFilter)
+from c7n.filters.core import SIMPLE_KEY
 from c7n.manager import resources
 from c7n.output import NullBlobOutput
 from c7n import query
@@ -88,14 +89,23 @@ MAX_COPY_SIZE = 1024 * 1024 * 1024 * 2
 
 class DescribeS3(query.DescribeSource):
 
+    # concurrent bucket api calls
+    max_workers = 20
+
     def augment(self, buckets):
-        with self.manager.executor_factory(
-                max_workers=min((10, len(buckets) + 1))) as w:
-            results = w.map(
-                assemble_bucket,
-                zip(itertools.repeat(self.manager.session_factory), buckets))
-            results = list(filter(None, results))
-            return results
+        if not buckets:
+            return buckets
+        assembly = BucketAssembly(
+            self.manager.session_factory, self.manager.get_augment_table())
+        workers = min((self.max_workers, len(buckets) + 1))
+        with self.manager.executor_factory(max_workers=workers) as w:
+            # Locations first, they determine the regional client for the rest.
+            list(w.map(assembly.assemble_location, buckets))
+            calls = [(b, minfo) for b in buckets for minfo in assembly.methods]
+            results = w.map(lambda call: assembly.invoke(*call), calls)
+            for (b, minfo), v in zip(calls, results):
+                assembly.apply(b, minfo, v)
+        return buckets
 
 
 class ConfigS3(query.ConfigSource):
@@ -378,6 +388,75 @@ class S3(query.QueryResourceManager):
     def get_arns(self, resources):
         return ["arn:aws:s3:::{}".format(r["Name"]) for r in resources]
 
+    # filters that read bucket attributes besides those in their key
+    augment_filter_keys = {'marked-for-op': ('Tags',)}
+
+    # bucket attributes to fetch when enumerating, None for all
+    augment_keys = None
+
+    def resources(self, query=None, augment=True):
+        self.augment_keys = self.get_augment_keys()
+        try:
+            return super(S3, self).resources(query=query, augment=augment)
+        finally:
+            self.augment_keys = None
+
+    def get_augment_table(self):
+        """Get the bucket augment methods to invoke.
+
+        When enumerating buckets for a policy whose filters are all value
+        filters on simple keys and that has no actions, only the bucket
+        attributes those filters reference (and location) are fetched.
+        Otherwise, including buckets fetched by id, all are.
+        """
+        table = list(S3_AUGMENT_TABLE)
+        if self.augment_keys is None:
+            return table
+        return [m for m in table if m[1] == 'Location' or m[1] in self.augment_keys]
+
+    def get_augment_keys(self):
+        if (self.data != self.ctx.policy.data or self.actions or not self.filters or
+                self.data.get('source', 'describe') != 'describe'):
+            return None
+        keys = set()
+        for f in self.iter_filters():
+            if f.type in ('or', 'and', 'not'):
+                continue
+            elif f.type in self.augment_filter_keys:
+                keys.update(self.augment_filter_keys[f.type])
+                continue
+            elif type(f) is not ValueFilter:
+                return None
+            exprs = [f.data.get('key')]
+            if len(f.data) == 1:
+                exprs = list(f.data)
+            elif f.data.get('value_type') == 'expr':
+                exprs.append(f.data.get('value'))
+            for expr in exprs:
+                if expr is None:
+                    continue
+                elif not isinstance(expr, str) or not SIMPLE_KEY.match(expr):
+                    return None
+                elif expr.startswith('tag:'):
+                    keys.add('Tags')
+                else:
+                    keys.add(expr.split('.', 1)[0])
+        return keys
+
+    def get_cache_key(self, query):
+        """Cache key of bucket enumeration, including any augment subset.
+
+        Buckets fetched with only some attributes augmented are cached
+        under a key naming them, so they are never served to policies
+        needing other attributes. As the key is also that of shared run
+        snapshots, s3 policies fetching different augment subsets each
+        enumerate buckets, rather than sharing one snapshot.
+        """
+        key = super(S3, self).get_cache_key(query)
+        if self.augment_keys is not None:
+            key['augment'] = sorted(self.augment_keys)
+        return key
+
     @classmethod
     def get_permissions(cls):
         perms = ["s3:ListAllMyBuckets"]
@@ -418,40 +497,87 @@ S3_AUGMENT_TABLE = (
 
 def assemble_bucket(item):
     """Assemble a document representing all the config state around a bucket.
-
-    TODO: Refactor this, the logic here feels quite muddled.
     """
     factory, b = item
-    s = factory()
-    c = s.client('s3')
-    # Bucket Location, Current Client Location, Default Location
-    b_location = c_location = location = "us-east-1"
-    methods = list(S3_AUGMENT_TABLE)
-    for minfo in methods:
+    assembly = BucketAssembly(factory, list(S3_AUGMENT_TABLE))
+    assembly.assemble_location(b)
+    for minfo in assembly.methods:
+        assembly.apply(b, minfo, assembly.invoke(b, minfo))
+    return b
+
+
+class BucketAssembly:
+    """Fetch the config state of a set of buckets.
+
+    Bucket locations are resolved first, as they determine the regional
+    endpoint for the remaining calls. The remaining (bucket, method) calls
+    are then independent and can be fanned out concurrently, using a
+    shared client per region.
+    """
+
+    # marker for a call whose result should not be recorded on the bucket
+    skip = object()
+
+    def __init__(self, session_factory, methods):
+        self.session_factory = session_factory
+        self.location_methods = [m for m in methods if m[1] == 'Location']
+        self.methods = [m for m in methods if m[1] != 'Location']
+        self.clients = {}
+        self.lock = threading.Lock()
+
+    def get_client(self, region=None):
+        # botocore clients are thread safe, reuse one per region.
+        with self.lock:
+            if region not in self.clients:
+                s = local_session(self.session_factory)
+                if region is None:
+                    self.clients[region] = s.client('s3')
+                else:
+                    self.clients[region] = s.client('s3', region_name=region)
+            return self.clients[region]
+
+    def get_bucket_client(self, b):
+        if 'Location' not in b:
+            return self.get_client()
+        return self.get_client(get_region(b))
+
+    def assemble_location(self, b):
+        for minfo in self.location_methods:
+            v = self.invoke(b, minfo)
+            if v is not self.skip and v is not None:
+                # Location == region for all cases but EU
+                # https://docs.aws.amazon.com/AmazonS3/latest/API/RESTBucketGETlocation.html
+                if v.get('LocationConstraint') == 'EU':
+                    v['LocationConstraint'] = 'eu-west-1'
+            self.apply(b, minfo, v)
+        return b
+
+    def invoke(self, b, minfo):
         m, k, default, select = minfo[:4]
-        try:
-            method = getattr(c, m)
-            v = method(Bucket=b['Name'])
-            v.pop('ResponseMetadata')
-            if select is not None and select in v:
-                v = v[select]
-        except (ssl.SSLError, SSLError) as e:
-            # Proxy issues? i assume
-            log.warning("Bucket ssl error %s: %s %s",
-                        b['Name'], b.get('Location', 'unknown'),
-                        e)
-            continue
-        except ClientError as e:
-            code = e.response['Error']['Code']
-            if code.startswith("NoSuch") or "NotFound" in code:
-                v = default
-            elif code == 'PermanentRedirect':
-                s = factory()
-                c = bucket_client(s, b)
-                # Requeue with the correct region given location constraint
-                methods.append((m, k, default, select))
-                continue
-            else:
+        c = self.get_bucket_client(b)
+        redirected = False
+        while True:
+            try:
+                v = getattr(c, m)(Bucket=b['Name'])
+                v.pop('ResponseMetadata')
+                if select is not None and select in v:
+                    v = v[select]
+                return v
+            except (ssl.SSLError, SSLError) as e:
+                # Proxy issues? i assume
+                log.warning("Bucket ssl error %s: %s %s",
+                            b['Name'], b.get('Location', 'unknown'),
+                            e)
+                return self.skip
+            except ClientError as e:
+                code = e.response['Error']['Code']
+                if code.startswith("NoSuch") or "NotFound" in code:
+                    return default
+                elif code == 'PermanentRedirect' and not redirected:
+                    # Retry against the region given by the location constraint
+                    redirected = True
+                    c = bucket_client(local_session(self.session_factory), b)
+                    continue
                 log.warning(
                     "Bucket:%s unable to invoke method:%s error:%s ",
                     b['Name'], m, e.response['Error']['Message'])
@@ -465,26 +591,24 @@ def assemble_bucket(item):
                 # they won't have write access either.
 
                 # For other error types we raise and bail policy execution.
-                if e.response['Error']['Code'] == 'AccessDenied':
-                    b.setdefault('c7n:DeniedMethods', []).append(m)
-                    continue
+                if code == 'AccessDenied':
+                    return AccessDenied(m)
                 raise
-        # As soon as we learn location (which generally works)
-        if k == 'Location' and v is not None:
-            b_location = v.get('LocationConstraint')
-            # Location == region for all cases but EU
-            # https://docs.aws.amazon.com/AmazonS3/latest/API/RESTBucketGETlocation.html
-            if b_location is None:
-                b_location = "us-east-1"
-            elif b_location == 'EU':
-                b_location = "eu-west-1"
-                v['LocationConstraint'] = 'eu-west-1'
-            if v and v != c_location:
-                c = s.client('s3', region_name=b_location)
-            elif c_location != location:
-                c = s.client('s3', region_name=location)
-        b[k] = v
-    return b
+
+    def apply(self, b, minfo, v):
+        if v is self.skip:
+            return
+        elif isinstance(v, AccessDenied):
+            b.setdefault('c7n:DeniedMethods', []).append(v.method)
+            return
+        b[minfo[1]] = v
+
+
+class AccessDenied:
+    """Result of a bucket method the caller isn't permitted to invoke."""
+
+    def __init__(self, method):
+        self.method = method
 
 
 def bucket_client(session, b, kms=False):
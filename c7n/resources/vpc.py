@@ -11,6 +11,8 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import bisect
+import ipaddress
 import itertools
 import operator
 import zlib
@@ -200,7 +202,7 @@ class VpcSecurityGroupFilter(RelatedResourceFilter):
         vpc_ids = [vpc['VpcId'] for vpc in resources]
         vpc_group_ids = {
             g['GroupId'] for g in
-            self.manager.get_resource_manager('security-group').resources()
+            self.manager.get_related_resources('security-group')
             if g.get('VpcId', '') in vpc_ids
         }
         return vpc_group_ids
@@ -748,7 +750,7 @@ class SGUsage(Filter):
         # Note assuming we also have launch config garbage collection
         # enabled.
         sg_ids = set()
-        for cfg in self.manager.get_resource_manager('launch-config').resources():
+        for cfg in self.manager.get_related_resources('launch-config'):
             for g in cfg['SecurityGroups']:
                 sg_ids.add(g)
             for g in cfg['ClassicLinkVPCSecurityGroups']:
@@ -757,7 +759,7 @@ class SGUsage(Filter):
 
     def get_lambda_sgs(self):
         sg_ids = set()
-        for func in self.manager.get_resource_manager('lambda').resources(augment=False):
+        for func in self.manager.get_related_resources('lambda', augment=False):
             if 'VpcConfig' not in func:
                 continue
             for g in func['VpcConfig']['SecurityGroupIds']:
@@ -766,14 +768,14 @@ class SGUsage(Filter):
 
     def get_eni_sgs(self):
         sg_ids = set()
-        for nic in self.manager.get_resource_manager('eni').resources():
+        for nic in self.manager.get_related_resources('eni'):
             for g in nic['Groups']:
                 sg_ids.add(g['GroupId'])
         return sg_ids
 
     def get_sg_refs(self):
         sg_ids = set()
-        for sg in self.manager.get_resource_manager('security-group').resources():
+        for sg in self.manager.get_related_resources('security-group'):
             for perm_type in ('IpPermissions', 'IpPermissionsEgress'):
                 for p in sg.get(perm_type, []):
                     for g in p.get('UserIdGroupPairs', ()):
@@ -784,8 +786,7 @@ class SGUsage(Filter):
         sg_ids = set()
         expr = jmespath.compile(
             'EcsParameters.NetworkConfiguration.awsvpcConfiguration.SecurityGroups[]')
-        for rule in self.manager.get_resource_manager(
-                'event-rule-target').resources(augment=False):
+        for rule in self.manager.get_related_resources('event-rule-target', augment=False):
             ids = expr.search(rule)
             if ids:
                 sg_ids.update(ids)
@@ -928,6 +929,79 @@ class SGDefaultVpc(DefaultVpcBase):
         return self.match(resource['VpcId'])
 
 
+class CidrMatcher:
+    """Match the cidrs of permission ip ranges against a filter's cidr value.
+
+    Cidrs are parsed once per distinct value into an integer interval of
+    (version, first address, last address), so matching a fleet's ranges,
+    which largely repeat across groups, is a few integer comparisons per
+    range rather than a parse and network comparison. This applies to the
+    `cidr` value type with containment or equality operators, others are
+    evaluated with a value filter.
+    """
+
+    ops = {'in': 'in', 'ni': 'ni', 'not-in': 'ni', 'eq': 'eq',
+           'equal': 'eq', 'ne': 'ne', 'not-equal': 'ne'}
+
+    def __init__(self, data, key, manager):
+        if isinstance(data, dict):
+            data = dict(data, key=key)
+        else:
+            data = {key: data}
+        self.key = key
+        self.vf = ValueFilter(data, manager)
+        self.vf.annotate = False
+        self.op = self.sentinel = None
+        self.intervals = {}
+        if (data.get('value_type') == 'cidr' and data.get('op') in self.ops and
+                not set(data).difference(('key', 'value', 'op', 'value_type'))):
+            self.sentinel = self.get_interval(data.get('value'))
+            if self.sentinel is not None:
+                self.op = self.ops[data['op']]
+
+    def get_interval(self, value):
+        if value in self.intervals:
+            return self.intervals[value]
+        interval = None
+        try:
+            cidr = parse_cidr(value)
+        except TypeError:
+            cidr = None
+        if isinstance(cidr, ipaddress._BaseNetwork):
+            interval = (True, cidr.version,
+                        int(cidr.network_address), int(cidr.broadcast_address))
+        elif cidr is not None:
+            interval = (False, cidr.version, int(cidr), int(cidr))
+        if isinstance(value, str):
+            self.intervals[value] = interval
+        return interval
+
+    @staticmethod
+    def contains(outer, inner):
+        return (outer[1] == inner[1] and
+                outer[2] <= inner[2] and inner[3] <= outer[3])
+
+    def __call__(self, ip_range):
+        value = ip_range.get(self.key)
+        if self.op is None or not isinstance(value, str):
+            return self.vf(ip_range)
+        s, r = self.sentinel, self.get_interval(value)
+        if self.op in ('eq', 'ne'):
+            found = r is not None and s[0] == r[0] and s[1:] == r[1:]
+            return found if self.op == 'eq' else not found
+        # mirrors the cidr value type, a network sentinel contains the
+        # range, while an address sentinel must be within a network range.
+        if s[0]:
+            if r is None:
+                return self.op == 'ni'
+            found = self.contains(s, r)
+        elif r is not None and r[0]:
+            found = self.contains(r, s)
+        else:
+            return False
+        return found if self.op == 'in' else not found
+
+
 class SGPermission(Filter):
     """Filter for verifying security group ingress and egress permissions
 
@@ -1075,6 +1149,12 @@ class SGPermission(Filter):
         self.ports = 'Ports' in self.data and self.data['Ports'] or ()
         self.only_ports = (
             'OnlyPorts' in self.data and self.data['OnlyPorts'] or ())
+        self.port_table = sorted(self.ports)
+        self.only_port_set = set(self.only_ports)
+        self.cidr_matchers = {
+            cidr_key: CidrMatcher(self.data[cidr_key], cidr_type, self.manager)
+            for cidr_key, cidr_type in (('Cidr', 'CidrIp'), ('CidrV6', 'CidrIpv6'))
+            if cidr_key in self.data}
         for f in fattrs:
             fv = self.data.get(f)
             if isinstance(fv, dict):
@@ -1089,40 +1169,27 @@ class SGPermission(Filter):
     def process_ports(self, perm):
         found = None
         if 'FromPort' in perm and 'ToPort' in perm:
-            for port in self.ports:
-                if port >= perm['FromPort'] and port <= perm['ToPort']:
-                    found = True
-                    break
-                found = False
-            only_found = False
-            for port in self.only_ports:
-                if port == perm['FromPort'] and port == perm['ToPort']:
-                    only_found = True
+            from_port, to_port = perm['FromPort'], perm['ToPort']
+            if self.port_table:
+                idx = bisect.bisect_left(self.port_table, from_port)
+                found = (idx < len(self.port_table) and
+                         self.port_table[idx] <= to_port)
+            only_found = from_port == to_port and from_port in self.only_port_set
             if self.only_ports and not only_found:
                 found = found is None or found and True or False
             if self.only_ports and only_found:
                 found = False
         return found
 
-    def _process_cidr(self, cidr_key, cidr_type, range_type, perm):
-
+    def _process_cidr(self, cidr_key, range_type, perm):
         found = None
         ip_perms = perm.get(range_type, [])
         if not ip_perms:
             return False
 
-        match_range = self.data[cidr_key]
-
-        if isinstance(match_range, dict):
-            match_range['key'] = cidr_type
-        else:
-            match_range = {cidr_type: match_range}
-
-        vf = ValueFilter(match_range, self.manager)
-        vf.annotate = False
-
+        matcher = self.cidr_matchers[cidr_key]
         for ip_range in ip_perms:
-            found = vf(ip_range)
+            found = matcher(ip_range)
             if found:
                 break
             else:
@@ -1132,9 +1199,9 @@ class SGPermission(Filter):
     def process_cidrs(self, perm):
         found_v6 = found_v4 = None
         if 'CidrV6' in self.data:
-            found_v6 = self._process_cidr('CidrV6', 'CidrIpv6', 'Ipv6Ranges', perm)
+            found_v6 = self._process_cidr('CidrV6', 'Ipv6Ranges', perm)
         if 'Cidr' in self.data:
-            found_v4 = self._process_cidr('Cidr', 'CidrIp', 'IpRanges', perm)
+            found_v4 = self._process_cidr('Cidr', 'IpRanges', perm)
         match_op = self.data.get('match-operator', 'and') == 'and' and all or any
         cidr_match = [k for k in (found_v6, found_v4) if k is not None]
         if not cidr_match:
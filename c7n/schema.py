@@ -26,6 +26,7 @@ All filters and actions are annotated with schema typically using
 the utils.type_schema function.
 """
 from collections import Counter
+import functools
 import json
 import inspect
 import logging
@@ -33,20 +34,28 @@ import logging
 from jsonschema import Draft7Validator as JsonSchemaValidator
 from jsonschema.exceptions import best_match
 
+from c7n.executor import ProcessPoolExecutor
 from c7n.policy import execution
 from c7n.provider import clouds
-from c7n.resources import load_available
+from c7n.resources import (
+    load_available, load_resources, get_index_path, load_index, reset_index)
 from c7n.resolver import ValuesFrom
 from c7n.filters.core import ValueFilter, EventFilter, AgeFilter, OPERATORS, VALUE_TYPES
 from c7n.structure import StructureParser # noqa
+from c7n.utils import chunks
+from c7n.version import version
 
+log = logging.getLogger('custodian.schema')
 
-def validate(data, schema=None):
+
+def validate(data, schema=None, max_workers=1):
     if schema is None:
-        schema = generate()
-        JsonSchemaValidator.check_schema(schema)
+        validator = get_validator(generate())
+    else:
+        validator = JsonSchemaValidator(schema)
+    if is_valid(validator, data, max_workers):
+        return check_unique(data) or []
 
-    validator = JsonSchemaValidator(schema)
     errors = list(validator.iter_errors(data))
     if not errors:
         return check_unique(data) or []
@@ -68,6 +77,65 @@ def validate(data, schema=None):
     ]))
 
 
+def get_validator(schema):
+    """Get a validator for a generated schema, checking it's well formed."""
+    JsonSchemaValidator.check_schema(schema)
+    return JsonSchemaValidator(schema)
+
+
+def get_resource_refs(schema):
+    """Map resource types, and their aliases, to their policy schema."""
+    refs = {}
+    for type_name, rdef in schema['definitions']['resources'].items():
+        ref = '#/definitions/resources/%s/policy' % type_name
+        refs[type_name] = ref
+        for alias in rdef['policy']['allOf'][1]['properties']['resource']['enum']:
+            refs.setdefault(alias, ref)
+    return refs
+
+
+def is_valid(validator, data, max_workers=1):
+    """Check whether policy data is valid, validating a policy at a time.
+
+    Rather than trying each policy against the schema of every resource
+    type, a policy is validated only against that of its resource type,
+    and policies may be validated in parallel across processes.
+
+    An invalid policy, or one with an unknown resource type, returns False,
+    and the data should be validated as a whole to report errors.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('policies'), list):
+        return False
+    if not validator.is_valid(dict(data, policies=[])):
+        return False
+
+    refs = get_resource_refs(validator.schema)
+    checks = []
+    for p in data['policies']:
+        ref = isinstance(p, dict) and refs.get(p.get('resource'))
+        if not ref:
+            return False
+        checks.append((ref, p))
+
+    if max_workers < 2 or len(checks) < 2:
+        return check_policies(validator.schema, checks)
+    with ProcessPoolExecutor(max_workers) as w:
+        return all(w.map(
+            functools.partial(check_policies, validator.schema),
+            chunks(checks, -(-len(checks) // max_workers))))
+
+
+def check_policies(schema, checks):
+    validators = {}
+    for ref, p in checks:
+        if ref not in validators:
+            validators[ref] = JsonSchemaValidator(
+                {'$ref': ref, 'definitions': schema['definitions']})
+        if not validators[ref].is_valid(p):
+            return False
+    return True
+
+
 def check_unique(data):
     counter = Counter([p['name'] for p in data.get('policies', [])])
     for k, v in list(counter.items()):
@@ -262,7 +330,7 @@ def generate(resource_types=()):
                 'description': {'type': 'string'},
                 'tags': {'type': 'array', 'items': {'type': 'string'}},
                 'mode': {'$ref': '#/definitions/policy-mode'},
-                'source': {'enum': ['describe', 'config', 'inventory',
+                'source': {'enum': ['describe', 'describe-async', 'config', 'inventory',
                                     'resource-graph', 'disk', 'static']},
                 'actions': {
                     'type': 'array',
@@ -298,26 +366,19 @@ def generate(resource_types=()):
 
     resource_refs = []
     for cloud_name, cloud_type in sorted(clouds.items()):
+        # an index is built with all of a provider's resources loaded, and
+        # takes precedence over those loaded so far.
+        resource_refs.extend(process_index(
+            cloud_name, resource_defs, definitions, resource_types))
         for type_name, resource_type in sorted(cloud_type.resources.items()):
             r_type_name = "%s.%s" % (cloud_name, type_name)
-            if resource_types and r_type_name not in resource_types:
-                if not resource_type.type_aliases:
-                    continue
-                elif not {"%s.%s" % (cloud_name, ralias) for ralias
-                        in resource_type.type_aliases}.intersection(
-                        resource_types):
-                    continue
-
-            aliases = []
-            if resource_type.type_aliases:
-                aliases.extend(["%s.%s" % (cloud_name, a) for a in resource_type.type_aliases])
-                # aws gets legacy aliases with no cloud prefix
-                if cloud_name == 'aws':
-                    aliases.extend(resource_type.type_aliases)
-
-            # aws gets additional alias for default name
-            if cloud_name == 'aws':
-                aliases.append(type_name)
+            if r_type_name in resource_defs:
+                continue
+            aliases = get_resource_aliases(
+                cloud_name, type_name, resource_type.type_aliases)
+            if resource_types and not is_selected(
+                    cloud_name, r_type_name, resource_type.type_aliases, resource_types):
+                continue
 
             resource_refs.append(
                 process_resource(
@@ -352,6 +413,107 @@ def generate(resource_types=()):
     return schema
 
 
+def get_resource_aliases(cloud_name, type_name, type_aliases):
+    aliases = []
+    if type_aliases:
+        aliases.extend(["%s.%s" % (cloud_name, a) for a in type_aliases])
+        # aws gets legacy aliases with no cloud prefix
+        if cloud_name == 'aws':
+            aliases.extend(type_aliases)
+
+    # aws gets additional alias for default name
+    if cloud_name == 'aws':
+        aliases.append(type_name)
+    return aliases
+
+
+def is_selected(cloud_name, r_type_name, type_aliases, resource_types):
+    if r_type_name in resource_types:
+        return True
+    return bool(type_aliases and {
+        "%s.%s" % (cloud_name, ralias) for ralias in type_aliases}.intersection(
+            resource_types))
+
+
+def save_index(provider_name):
+    """Build and save the index of a provider's resources, for packaging."""
+    index = build_index(provider_name)
+    path = get_index_path(provider_name)
+    with open(path, 'w') as fh:
+        json.dump(index, fh, sort_keys=True)
+    reset_index(provider_name)
+    return index, path
+
+
+def build_index(provider_name):
+    """Build the schema index of a provider's resources.
+
+    The index records each resource's class, aliases, filters and actions,
+    along with their schema definitions, so the schema of resources can be
+    generated without importing their modules.
+    """
+    # an existing index is ignored, all of the provider's resources load.
+    reset_index(provider_name, ignore=True)
+    load_resources(('%s.*' % provider_name,))
+    definitions = {'actions': {}, 'filters': {}}
+    resources = {}
+    for type_name, resource_type in sorted(clouds[provider_name].resources.items()):
+        r_type_name = "%s.%s" % (provider_name, type_name)
+        resource_defs = {}
+        process_resource(
+            r_type_name, resource_type, resource_defs,
+            get_resource_aliases(provider_name, type_name, resource_type.type_aliases),
+            definitions, provider_name)
+        resources[r_type_name] = {
+            'class': get_class_path(resource_type),
+            'type_aliases': list(resource_type.type_aliases or ()),
+            'filters': {k: get_class_path(v)
+                        for k, v in sorted(resource_type.filter_registry.items())},
+            'actions': {k: get_class_path(v)
+                        for k, v in sorted(resource_type.action_registry.items())},
+            'definition': resource_defs[r_type_name]}
+    package = clouds[provider_name].__module__.rsplit('.', 1)[0]
+    modes = sorted({
+        m.__module__ for _, m in execution.items() if m.__module__.startswith(package + '.')})
+    return {'version': version, 'definitions': definitions, 'resources': resources,
+            'modes': modes}
+
+
+def get_class_path(cls):
+    return "%s.%s" % (cls.__module__, cls.__name__)
+
+
+def process_index(provider_name, resource_defs, definitions, resource_types=()):
+    """Add schema definitions of a provider's indexed resources."""
+    index = load_index(provider_name)
+    if index is None:
+        return []
+    for category in ('actions', 'filters'):
+        for k, v in index['definitions'][category].items():
+            definitions[category].setdefault(k, v)
+    refs = []
+    loaded = clouds[provider_name].resources
+    for r_type_name, rinfo in sorted(index['resources'].items()):
+        if resource_types and not is_selected(
+                provider_name, r_type_name, rinfo['type_aliases'], resource_types):
+            continue
+        resource_type = loaded.get(r_type_name.split('.', 1)[1])
+        if resource_type is not None and not (
+                set(resource_type.filter_registry.keys()).issubset(rinfo['filters']) and
+                set(resource_type.action_registry.keys()).issubset(rinfo['actions'])):
+            # plugins registered filters or actions missing from the
+            # index, the resource's schema is generated from its class.
+            continue
+        resource_defs[r_type_name] = rinfo['definition']
+        refs.append({'$ref': '#/definitions/resources/%s/policy' % r_type_name})
+    return refs
+
+
+def is_same_schema(a, b):
+    # schemas of an index have the json form of any tuples
+    return a == b or json.loads(json.dumps(a)) == json.loads(json.dumps(b))
+
+
 def process_resource(
         type_name, resource_type, resource_defs, aliases=None,
         definitions=None, provider_name=None):
@@ -365,7 +527,7 @@ def process_resource(
             action_alias = "%s.%s" % (provider_name, action_name)
             if action_alias in definitions['actions']:
 
-                if definitions['actions'][action_alias] != a.schema: # NOQA
+                if not is_same_schema(definitions['actions'][action_alias], a.schema):
                     msg = "Schema mismatch on type:{} action:{} w/ schema alias ".format(
                         type_name, action_name)
                     raise SyntaxError(msg)
@@ -393,7 +555,7 @@ def process_resource(
         elif f.schema_alias:
             filter_alias = "%s.%s" % (provider_name, filter_name)
             if filter_alias in definitions['filters']:
-                assert definitions['filters'][filter_alias] == f.schema, "Schema mismatch on filter w/ schema alias" # NOQA
+                assert is_same_schema(definitions['filters'][filter_alias], f.schema), "Schema mismatch on filter w/ schema alias" # NOQA
             else:
                 definitions['filters'][filter_alias] = f.schema
             filter_refs.append({'$ref': '#/definitions/filters/%s' % filter_alias})
@@ -439,6 +601,11 @@ def process_resource(
     if type_name == 'ec2':
         resource_policy['allOf'][1]['properties']['query'] = {}
 
+    supports_source = getattr(resource_type, 'supports_source', None)
+    if supports_source is not None and not supports_source('describe-async'):
+        resource_policy['allOf'][1]['properties']['source'] = {
+            'not': {'enum': ['describe-async']}}
+
     r['policy'] = resource_policy
     return {'$ref': '#/definitions/resources/%s/policy' % type_name}
 
@@ -449,6 +616,14 @@ def resource_outline(provider=None):
         if provider and provider != cname:
             continue
         cresources = outline[cname] = {}
+        index = load_index(cname)
+        if index is not None:
+            for rname, rinfo in sorted(index['resources'].items()):
+                cresources[rname] = {
+                    'filters': sorted(rinfo['filters']),
+                    'actions': sorted(rinfo['actions'])}
+            continue
+        load_resources(('%s.*' % cname,))
         for rname, rtype in sorted(ctype.resources.items()):
             cresources['%s.%s' % (cname, rname)] = rinfo = {}
             rinfo['filters'] = sorted(rtype.filter_registry.keys())
@@ -634,7 +809,8 @@ def pprint_schema_summary(vocabulary):
 
 
 def json_dump(resource=None):
-    load_available()
+    providers = load_available(resources=False)
+    load_resources(['%s.*' % p for p in providers if load_index(p) is None])
     print(json.dumps(generate(resource), indent=2))
 
 
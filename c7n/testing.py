@@ -30,7 +30,7 @@ import yaml
 from c7n import policy
 from c7n.loader import PolicyLoader
 from c7n.ctx import ExecutionContext
-from c7n.utils import reset_session_cache
+from c7n.utils import reset_rate_limiters, reset_session_cache
 from c7n.config import Bag, Config
 
 
@@ -235,6 +235,7 @@ class TestUtils(unittest.TestCase, CustodianTestCore):
     def cleanUp(self):
         # Clear out thread local session cache
         reset_session_cache()
+        reset_rate_limiters()
 
 
 class TextTestIO(io.StringIO):
@@ -345,6 +345,87 @@ def snapshot_identifier(prefix, db_identifier):
 
 retry_log = logging.getLogger('c7n.retry')
 
+THROTTLE_CODES = (
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottled',
+    'RequestThrottledException', 'RequestLimitExceeded', 'TooManyRequestsException',
+    'SlowDown')
+
+
+class RateLimiter:
+    """Adaptive token bucket rate limiter for an api operation.
+
+    Unlimited until a throttling error is observed, at which point the
+    rate is cut to half the observed call rate. Each success then raises
+    the rate additively, by roughly `increase` calls per second every
+    second.
+    """
+
+    beta = 0.5
+    increase = 1.0
+    min_rate = 0.5
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rate = None
+        self.slot = 0
+        self.window = (time.monotonic(), 0)
+        self.observed = 0
+
+    def acquire(self):
+        """Reserve a call, returning the delay to wait before making it."""
+        with self.lock:
+            now = time.monotonic()
+            start, count = self.window
+            if now - start >= 1:
+                self.observed = count / (now - start)
+                start, count = now, 0
+            self.window = (start, count + 1)
+            if self.rate is None:
+                return 0
+            slot = max(now, self.slot)
+            self.slot = slot + 1.0 / self.rate
+        return slot - now
+
+    def throttled(self):
+        with self.lock:
+            rate = self.rate or max(self.observed, self.window[1])
+            self.rate = max(self.min_rate, rate * self.beta)
+
+    def succeeded(self):
+        if self.rate is None:
+            return
+        with self.lock:
+            self.rate += self.increase / self.rate
+
+
+RATE_LIMITERS = {}
+RATE_LIMITERS_LOCK = threading.Lock()
+
+
+def get_rate_limiter(func):
+    """Get the process wide rate limiter for a boto3 client method.
+
+    Limiters are keyed by the client's credentials, region, service and
+    the operation, and are None for anything other than a client method.
+    """
+    client = getattr(func, '__self__', None)
+    meta = getattr(client, 'meta', None)
+    if not hasattr(meta, 'service_model'):
+        return None
+    credentials = getattr(getattr(client, '_request_signer', None), '_credentials', None)
+    key = (getattr(credentials, 'access_key', None), meta.region_name,
+           meta.service_model.service_name, func.__name__)
+    limiter = RATE_LIMITERS.get(key)
+    if limiter is None:
+        with RATE_LIMITERS_LOCK:
+            limiter = RATE_LIMITERS.setdefault(key, RateLimiter())
+    return limiter
+
+
+def reset_rate_limiters():
+    with RATE_LIMITERS_LOCK:
+        RATE_LIMITERS.clear()
+
 
 def get_retry(retry_codes=(), max_attempts=8, min_delay=1, log_retries=False):
     """Decorator for retry boto3 api call on transient errors.
@@ -363,15 +444,29 @@ def get_retry(retry_codes=(), max_attempts=8, min_delay=1, log_retries=False):
 
     Returns a function for invoking aws client calls that
     retries on retryable error codes.
+
+    Calls to boto3 client methods are paced by the process wide adaptive
+    rate limiter for the operation (see :func:`get_rate_limiter`), which
+    slows all callers of the operation when any of them is throttled.
     """
     max_delay = max(min_delay, 2) ** max_attempts
 
     def _retry(func, *args, ignore_err_codes=(), **kw):
+        limiter = get_rate_limiter(func)
         for idx, delay in enumerate(
                 backoff_delays(min_delay, max_delay, jitter=True)):
+            if limiter is not None:
+                wait = limiter.acquire()
+                if wait:
+                    time.sleep(wait)
             try:
-                return func(*args, **kw)
+                result = func(*args, **kw)
+                if limiter is not None:
+                    limiter.succeeded()
+                return result
             except ClientError as e:
+                if limiter is not None and e.response['Error']['Code'] in THROTTLE_CODES:
+                    limiter.throttled()
                 if e.response['Error']['Code'] in ignore_err_codes:
                     return
                 elif e.response['Error']['Code'] not in retry_codes:
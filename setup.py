@@ -23,6 +23,9 @@ install_requires = \
  'pyyaml>=5.3,<6.0',
  'tabulate>=0.8.6,<0.9.0']
 
+extras_require = \
+{'columnar': ['pyarrow>=1.0.1,<2.0.0']}
+
 entry_points = \
 {'console_scripts': ['custodian = c7n.cli:main']}
 
@@ -40,6 +43,7 @@ setup_kwargs = {
     'packages': packages,
     'package_data': package_data,
     'install_requires': install_requires,
+    'extras_require': extras_require,
     'entry_points': entry_points,
     'python_requires': '>=3.6,<4.0',
 }
@@ -15,7 +15,9 @@ from unittest import TestCase
 from c7n import cache, config
 from argparse import Namespace
 import pickle
+import shutil
 import tempfile
+import time
 import mock
 import os
 
@@ -77,6 +79,21 @@ class FileCacheManagerTest(TestCase):
         self.assertEqual(c2.get(k1), range(5))
         self.assertEqual(c2.get(k2), range(2))
 
+    def test_save_merges(self):
+        t = self.temporary_file_with_cleanup()
+        c1 = cache.FileCacheManager(Namespace(cache_period=60, cache=t.name))
+        c2 = cache.FileCacheManager(Namespace(cache_period=60, cache=t.name))
+        self.assertFalse(c1.load())
+        self.assertFalse(c2.load())
+        c1.save("k1", [1])
+        c2.save("k2", [2])
+
+        # saves don't drop the entries saved by other caches of the file
+        c3 = cache.FileCacheManager(Namespace(cache_period=60, cache=t.name))
+        self.assertTrue(c3.load())
+        self.assertEqual(c3.get("k1"), [1])
+        self.assertEqual(c3.get("k2"), [2])
+
     def test_get(self):
         # mock the pick and set it to the data variable
         test_pickle = pickle.dumps(
@@ -161,3 +178,73 @@ class FileCacheManagerTest(TestCase):
         self.addCleanup(os.unlink, t.name)
         self.addCleanup(t.close)
         return t
+
+
+class ShardedFileCacheTest(TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+    def test_factory(self):
+        # a sharded cache is opted into with a trailing separator
+        self.assertIsInstance(
+            cache.factory(Namespace(cache_period=60, cache=self.cache_dir)),
+            cache.FileCacheManager)
+        self.assertIsInstance(
+            cache.factory(Namespace(
+                cache_period=60, cache=os.path.join(self.cache_dir, "c7n", ""))),
+            cache.ShardedFileCache)
+
+    def test_get_set(self):
+        c = cache.ShardedFileCache(Namespace(cache_period=60, cache=self.cache_dir))
+        self.assertTrue(c.load())
+        k1 = {"account": "12345678901234", "region": "us-west-2", "resource": "ec2"}
+        k2 = {"account": "98765432101234", "region": "eu-west-1", "resource": "asg"}
+        c.save(k1, [1, 2, 3])
+        c.save(k2, [4])
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+        c2 = cache.ShardedFileCache(Namespace(cache_period=60, cache=self.cache_dir))
+        self.assertEqual(c2.get(k2), [4])
+        # only requested keys are loaded
+        self.assertEqual(len(c2.data), 1)
+        self.assertEqual(c2.get(k1), [1, 2, 3])
+        self.assertEqual(c2.get({"resource": "s3"}), None)
+        self.assertTrue(c2.size() > 0)
+
+    def test_entry_expiration(self):
+        c = cache.ShardedFileCache(Namespace(cache_period=1, cache=self.cache_dir))
+        c.save("old", [1])
+        c.save("new", [2])
+        past = time.time() - 120
+        os.utime(c.get_key_path("old"), (past, past))
+
+        c2 = cache.ShardedFileCache(Namespace(cache_period=1, cache=self.cache_dir))
+        self.assertEqual(c2.get("old"), None)
+        self.assertEqual(c2.get("new"), [2])
+
+        c2.evict()
+        self.assertFalse(os.path.exists(c.get_key_path("old")))
+
+    def test_size_cap_evicts_lru(self):
+        c = cache.ShardedFileCache(Namespace(cache_period=60, cache=self.cache_dir))
+        c.save("a", "x" * 1000)
+        c.save("b", "x" * 1000)
+        now = time.time()
+        os.utime(c.get_key_path("a"), (now - 30, now))
+        os.utime(c.get_key_path("b"), (now - 60, now))
+        c.max_size = 2500
+        c.save("c", "x" * 1000)
+        self.assertTrue(os.path.exists(c.get_key_path("a")))
+        self.assertFalse(os.path.exists(c.get_key_path("b")))
+        self.assertTrue(os.path.exists(c.get_key_path("c")))
+
+    def test_save_creates_directory(self):
+        path = os.path.join(self.cache_dir, "sub", "")
+        c = cache.ShardedFileCache(Namespace(cache_period=60, cache=path))
+        self.assertFalse(c.load())
+        c.save("k", {"hello": "world"})
+        self.assertTrue(c.load())
+        self.assertEqual(
+            [n for n in os.listdir(path) if n.endswith('.tmp')], [])
@@ -11,14 +11,19 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import io
 import json
+import logging
 import os
 import sys
+import threading
 
 from argparse import ArgumentTypeError
 from datetime import datetime, timedelta
 
 from c7n import cli, version, commands
+from c7n.config import Bag
+from c7n.executor import ThreadPoolExecutor
 from c7n.resolver import ValuesFrom
 from c7n.resources import aws
 from c7n.schema import ElementSchema, generate
@@ -547,6 +552,63 @@ class RunTest(CliTest):
         )
 
 
+class RunRegionsTest(BaseTest):
+
+    def test_run_regions(self):
+        output = io.StringIO()
+        handler = logging.StreamHandler(output)
+        logging.getLogger().addHandler(handler)
+        self.addCleanup(logging.getLogger().removeHandler, handler)
+        log = logging.getLogger('custodian.test-regions')
+        west_done = threading.Event()
+
+        class Policy:
+
+            def __init__(self, name, region):
+                self.name = name
+                self.options = Bag(region=region)
+
+            def __call__(self):
+                if self.options.region == 'us-east-1':
+                    # regions execute concurrently, with east completing last
+                    self.assertTrue(west_done.wait(5))
+                log.warning("%s %s", self.options.region, self.name)
+                if self.options.region == 'us-west-2':
+                    west_done.set()
+                    raise ValueError("west")
+
+        Policy.assertTrue = self.assertTrue
+
+        completed = []
+        planner = Bag(complete=completed.append)
+        policies = [Policy('a', 'us-east-1'), Policy('b', 'us-east-1'),
+                    Policy('a', 'us-west-2')]
+        errored = commands.run_regions(Bag(debug=False), planner, policies, 2)
+        self.assertEqual(errored, ['a'])
+        self.assertEqual(len(completed), 3)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[:3], ['us-east-1 a', 'us-east-1 b', 'us-west-2 a'])
+        self.assertIn('Error while executing policy a', lines[3])
+
+    def test_region_log_workers(self):
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        logging.getLogger().addHandler(handler)
+        self.addCleanup(logging.getLogger().removeHandler, handler)
+        log = logging.getLogger('custodian.test-regions')
+
+        def run():
+            with ThreadPoolExecutor(max_workers=1) as w:
+                w.submit(log.warning, "worker").result()
+
+        with commands.RegionLogBuffer(['us-east-1']) as logs:
+            logs.run('us-east-1', run)
+            # records of the region's worker threads are held back too
+            self.assertEqual(records, [])
+        self.assertEqual([r.c7n_region for r in records], ['us-east-1'])
+
+
 class MetricsTest(CliTest):
 
     def test_metrics(self):
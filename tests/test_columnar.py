@@ -0,0 +1,72 @@
+# Copyright 2020 Cloud Custodian Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from datetime import datetime
+import json
+import os
+
+from dateutil.tz import tzutc, tzoffset
+import pytest
+
+from c7n import columnar
+from c7n.reports.csvout import fs_record_set
+from c7n.utils import dumps
+
+from .common import BaseTest
+
+
+RESOURCES = [
+    {'InstanceId': 'i-1', 'Count': 1, 'Size': 1, 'Public': False,
+     'LaunchTime': datetime(2020, 1, 1, tzinfo=tzutc()),
+     'Tags': [{'Key': 'Env', 'Value': 'Dev'}], 'Kind': 'a', 'Extra': 1},
+    {'InstanceId': 'i-2', 'Count': None, 'Size': 2.5, 'Public': True,
+     'LaunchTime': datetime(2020, 1, 1, 2, tzinfo=tzoffset(None, 3600)),
+     'Tags': [], 'Kind': 1},
+]
+
+
+class ColumnarTest(BaseTest):
+
+    def test_column_types(self):
+        self.assertEqual(columnar.get_column_types([]), {})
+        self.assertEqual(
+            columnar.get_column_types(RESOURCES),
+            {'InstanceId': 'string', 'Count': 'int', 'Size': 'float',
+             'Public': 'bool', 'LaunchTime': 'timestamp'})
+        self.assertEqual(
+            columnar.get_column_types([{'a': None, 'b': 2 ** 64, 'c': datetime.now()}]),
+            {})
+
+    def test_columns(self):
+        types = columnar.get_column_types(RESOURCES)
+        columns = columnar.get_columns(RESOURCES, types)
+        self.assertEqual(columns['LaunchTime'], [datetime(2020, 1, 1), datetime(2020, 1, 1, 1)])
+        self.assertEqual(columns['Count'], [1, None])
+        self.assertEqual(
+            [json.loads(v) for v in columns[columnar.JSON_COLUMN]],
+            [{'Tags': [{'Key': 'Env', 'Value': 'Dev'}], 'Kind': 'a', 'Extra': 1},
+             {'Tags': [], 'Kind': 1}])
+
+
+@pytest.mark.skipif(not columnar.HAVE_ARROW, reason="pyarrow not installed")
+class ColumnarRoundTripTest(BaseTest):
+
+    def test_round_trip(self):
+        output_dir = self.get_temp_dir()
+        columnar.write_resources(os.path.join(output_dir, 'resources.parquet'), RESOURCES)
+        records = fs_record_set(output_dir, 'xyz')
+        for r in records:
+            r.pop('CustodianDate')
+        expected = json.loads(dumps(RESOURCES))
+        expected[1]['LaunchTime'] = '2020-01-01T01:00:00+00:00'
+        self.assertEqual(records, expected)
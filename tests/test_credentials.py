@@ -16,7 +16,8 @@ from botocore.exceptions import ClientError
 import placebo
 
 from c7n import credentials
-from c7n.credentials import SessionFactory, assumed_session, get_sts_client
+from c7n.credentials import (
+    SessionFactory, assumed_session, get_event_emitters, get_sts_client)
 from c7n.version import version
 from c7n.utils import local_session
 
@@ -93,3 +94,34 @@ class Credential(BaseTest):
         client = local_session(factory).client('ec2')
         self.assertTrue(
             'check-ec2' in client._client_config.user_agent)
+
+    def test_reuse_sessions(self):
+        factory = SessionFactory('us-east-1')
+        self.assertIsNot(factory(), factory())
+
+        factory.reuse_sessions()
+        session = factory()
+        self.assertIs(factory(), session)
+        self.assertIsNot(factory(region='us-west-2'), session)
+
+        client = session.client('ec2')
+        self.assertIs(session.client('ec2'), client)
+        self.assertIsNot(session.client('ec2', region_name='us-west-2'), client)
+        emitters = get_event_emitters(session)
+        self.assertEqual(len(emitters), 3)
+        self.assertIn(client.meta.events, emitters)
+
+        # handlers registered after client creation reach reused clients
+        calls = []
+
+        def record(**kw):
+            calls.append(kw['event_name'])
+
+        for events in emitters:
+            events.register('c7n-test.*', record, unique_id='test-record')
+        session.client('ec2').meta.events.emit('c7n-test.ec2')
+        self.assertEqual(calls, ['c7n-test.ec2'])
+
+        # reused sessions serve a single policy
+        factory.policy_name = 'other'
+        self.assertRaises(RuntimeError, factory)
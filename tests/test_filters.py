@@ -18,14 +18,17 @@ from dateutil.parser import parse as parse_date
 import unittest
 import os
 
+import mock
+
 from c7n.exceptions import PolicyValidationError
 from c7n.executor import MainThreadExecutor
 from c7n import filters as base_filters
 from c7n.resources.ec2 import filters
 from c7n.resources.elb import ELB
-from c7n.utils import annotation
+from c7n.utils import annotation, parse_cidr
 from .common import instance, event_data, Bag, BaseTest
 from c7n.filters.core import ValueRegex, parse_date as core_parse_date
+from c7n.filters.metrics import MetricsFilter
 
 
 class BaseFilterTest(unittest.TestCase):
@@ -239,6 +242,40 @@ class TestValueFilter(unittest.TestCase):
         self.assertEqual(vf.v, None)
         self.assertFalse(res)
 
+    def test_value_match_compiled(self):
+        vf = filters.factory({
+            "type": "value", "key": "tag:Version", "value_type": "version",
+            "value_regex": "^v(.*)$", "op": "gte", "value": "1.10"})
+        with mock.patch('c7n.filters.core.ValueRegex', wraps=ValueRegex) as regex:
+            self.assertTrue(vf.match({"Tags": [{"Key": "Version", "Value": "v1.12"}]}))
+            matcher = vf.matcher
+            self.assertFalse(vf.match({"Tags": [{"Key": "Version", "Value": "v1.9"}]}))
+        self.assertIs(vf.matcher, matcher)
+        self.assertEqual(regex.call_count, 1)
+
+        vf = filters.factory({
+            "type": "value", "key": "Cidr", "value_type": "cidr",
+            "op": "in", "value": "10.0.0.0/16"})
+        with mock.patch('c7n.filters.core.parse_cidr', wraps=parse_cidr) as cidr:
+            self.assertTrue(vf.match({"Cidr": "10.0.1.1"}))
+            self.assertFalse(vf.match({"Cidr": "10.1.1.1"}))
+        self.assertEqual(
+            [c[0][0] for c in cidr.call_args_list],
+            ["10.0.0.0/16", "10.0.1.1", "10.1.1.1"])
+
+    def test_value_match_age(self):
+        vf = filters.factory({
+            "type": "value", "key": "LaunchTime", "value_type": "age",
+            "op": "greater-than", "value": 30})
+        now = datetime.now(tz=tz.tzutc())
+        self.assertTrue(vf.match({"LaunchTime": (now - timedelta(40)).isoformat()}))
+        self.assertFalse(vf.match({"LaunchTime": (now - timedelta(20)).isoformat()}))
+        vf = filters.factory({
+            "type": "value", "key": "Expires", "value_type": "expiration",
+            "op": "less-than", "value": 30})
+        self.assertTrue(vf.match({"Expires": (now + timedelta(20)).isoformat()}))
+        self.assertFalse(vf.match({"Expires": (now + timedelta(40)).isoformat()}))
+
 
 class TestAgeFilter(unittest.TestCase):
 
@@ -1064,6 +1101,60 @@ class TestMissingMetrics(BaseTest):
                 for res in resources)
         )
 
+    def test_missing_metrics_batched(self):
+        self.patch(MetricsFilter, "BatchThreshold", 1)
+        session_factory = self.replay_flight_data("test_missing_metrics_batched")
+
+        p = self.load_policy(
+            {
+                "name": "elb-metrics-batched",
+                "resource": "elb",
+                "filters": [
+                    {
+                        "type": "metrics",
+                        "value": 0,
+                        "name": "RequestCount",
+                        "op": "eq",
+                        "statistics": "Sum",
+                        "missing-value": 0.0,
+                    },
+                    {
+                        "type": "metrics",
+                        "value": 1,
+                        "name": "RequestCount",
+                        "op": "lt",
+                        "statistics": "Sum",
+                    },
+                ],
+            },
+            config={"account_id": "644160558196"},
+            session_factory=session_factory,
+        )
+        get_metric_data = MetricsFilter.get_metric_data
+        calls = []
+
+        def counted(self, client, queries):
+            calls.append(self)
+            return get_metric_data(self, client, queries)
+
+        self.patch(MetricsFilter, "get_metric_data", counted)
+        resources = p.run()
+        self.assertEqual(
+            sorted(r["LoadBalancerName"] for r in resources),
+            ["test-elb-missing-metrics", "test-elb-zero-metrics"])
+        # one request for all resources, the second filter reads the
+        # first's annotations
+        self.assertEqual(len(calls), 1)
+        series = calls[0].get_series_cache()
+        self.assertEqual(
+            sorted(k[3] for k in series),
+            [(("LoadBalancerName", n),) for n in (
+                "test-elb-missing-metrics", "test-elb-nonzero-metrics",
+                "test-elb-zero-metrics")])
+        self.assertEqual(
+            [r["c7n.metrics"]["AWS/ELB.RequestCount.Sum"][0]["Sum"] for r in resources],
+            [0.0, 0.0])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -72,6 +72,7 @@ class HandleTest(BaseTest):
         work_dir = self.change_cwd()
         self.patch(handler, 'policy_data', None)
         self.patch(handler, 'policy_config', None)
+        self.patch(handler, 'policies', None)
 
         # don't require api creds to resolve account id
         if 'execution-options' not in policy_data:
@@ -145,6 +146,47 @@ class HandleTest(BaseTest):
         handler.dispatch_event({'detail': {'xyz': 'oui'}}, None)
         self.assertEqual(output.getvalue().count('error during'), 2)
 
+    def test_dispatch_reuses_policies(self):
+        output, executions = self.setupLambdaEnv(
+            {'policies': [{'resource': 'ec2', 'name': 'xyz'}]},
+            log_level=logging.DEBUG)
+        self.assertTrue(handler.dispatch_event({'detail': {}}, None))
+        policy = list(handler.policies)[0]
+        manager = policy.resource_manager
+        self.assertIn('metric:InitTime', policy.ctx.metrics.render_metric(
+            policy.ctx.metrics.buf[0]))
+        self.assertIs(policy.session_factory(), policy.session_factory())
+
+        self.assertTrue(handler.dispatch_event({'detail': {}}, None))
+        self.assertIs(list(handler.policies)[0], policy)
+        self.assertIsNot(policy.resource_manager, manager)
+        self.assertEqual(len(executions), 2)
+        self.assertIn('Invocation cold-start:True', output.getvalue())
+        self.assertIn('Invocation cold-start:False', output.getvalue())
+
+    def test_dispatch_init_retry(self):
+        output, executions = self.setupLambdaEnv(
+            {'policies': [{'resource': 'ec2', 'name': 'xyz'}]})
+        init_policies = handler.init_policies
+        self.patch(handler, 'init_policies', mock.MagicMock(
+            side_effect=ValueError("init failed")))
+        self.assertRaises(ValueError, handler.dispatch_event, {'detail': {}}, None)
+        self.assertIsNone(handler.policy_config)
+        self.assertIsNone(handler.policies)
+
+        # the next invocation initializes again
+        handler.init_policies.side_effect = init_policies
+        self.assertTrue(handler.dispatch_event({'detail': {}}, None))
+        self.assertEqual(len(executions), 1)
+
+    def test_dispatch_init_time_once(self):
+        self.setupLambdaEnv({'policies': [
+            {'resource': 'ec2', 'name': 'xyz'}, {'resource': 'ec2', 'name': 'abc'}]})
+        self.assertTrue(handler.dispatch_event({'detail': {}}, None))
+        metrics = [
+            m['MetricName'] for p in handler.policies for m in p.ctx.metrics.buf]
+        self.assertEqual(metrics.count('InitTime'), 1)
+
     def test_handler(self):
         output, executions = self.setupLambdaEnv({
             'policies': [{
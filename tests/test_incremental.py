@@ -0,0 +1,152 @@
+# Copyright 2020 Cloud Custodian Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import os
+import shutil
+import tempfile
+
+from c7n.exceptions import PolicyValidationError
+from c7n.filters import ValueFilter
+from c7n.incremental import ResourceState
+from c7n.policy import IncrementalPullMode
+
+from .common import BaseTest
+
+
+class IncrementalPullModeTest(BaseTest):
+
+    def get_policy(self, state_dir, filters, **config):
+        return self.load_policy(
+            {"name": "ec2-env", "resource": "ec2",
+             "mode": {"type": "incremental-pull", "state-dir": state_dir},
+             "filters": filters},
+            session_factory=self.replay_flight_data("test_ec2_augment_tags"),
+            config=config)
+
+    def test_incremental_run(self):
+        state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, state_dir)
+
+        evaluated = []
+        action_resources = []
+        state_filter = ResourceState.filter
+        get_action_resources = IncrementalPullMode.get_action_resources
+
+        def counted_filter(self, manager, resources, event=None):
+            results = state_filter(self, manager, resources, event)
+            evaluated.append(len(self.changed))
+            return results
+
+        def recorded_action_resources(self, resources):
+            results = get_action_resources(self, resources)
+            action_resources.append(len(results))
+            return results
+
+        self.patch(ResourceState, 'filter', counted_filter)
+        self.patch(IncrementalPullMode, 'get_action_resources', recorded_action_resources)
+
+        filters = [{"tag:Env": "Production"}, {"type": "value", "key": "InstanceId",
+                                               "value": "present"}]
+        resources = self.get_policy(state_dir, filters).run()
+        self.assertEqual(len(resources), 1)
+        self.assertEqual(os.listdir(state_dir), ['644160558196-us-east-1-ec2-env.json'])
+        with open(os.path.join(state_dir, '644160558196-us-east-1-ec2-env.json')) as fh:
+            state = json.load(fh)
+        self.assertEqual(list(state['resources']), ['i-0dc224bad2cb08740'])
+        self.assertTrue(state['resources']['i-0dc224bad2cb08740']['matched'])
+
+        # an unchanged resource isn't evaluated again, nor are actions taken.
+        resources = self.get_policy(state_dir, filters).run()
+        self.assertEqual(len(resources), 1)
+        self.assertEqual(resources[0]['InstanceId'], 'i-0dc224bad2cb08740')
+        self.assertEqual(evaluated, [1, 0])
+        self.assertEqual(action_resources, [1, 0])
+
+        # a policy change evaluates all resources.
+        resources = self.get_policy(state_dir, filters[:1]).run()
+        self.assertEqual(len(resources), 1)
+        self.assertEqual(evaluated, [1, 0, 1])
+
+    def test_failed_actions_not_recorded(self):
+        state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, state_dir)
+        filters = [{"tag:Env": "Production"}]
+        get_action_resources = IncrementalPullMode.get_action_resources
+
+        def failed_actions(self, resources):
+            raise ValueError("action failed")
+
+        self.patch(IncrementalPullMode, 'get_action_resources', failed_actions)
+        with self.assertRaises(ValueError):
+            self.get_policy(state_dir, filters).run()
+        with open(os.path.join(state_dir, '644160558196-us-east-1-ec2-env.json')) as fh:
+            self.assertEqual(json.load(fh)['resources'], {})
+
+        # the match is acted upon again by the next run
+        self.patch(IncrementalPullMode, 'get_action_resources', get_action_resources)
+        resources = self.get_policy(state_dir, filters).run()
+        self.assertEqual(len(resources), 1)
+        with open(os.path.join(state_dir, '644160558196-us-east-1-ec2-env.json')) as fh:
+            self.assertTrue(json.load(fh)['resources']['i-0dc224bad2cb08740']['matched'])
+
+    def test_related_filters_evaluate_all(self):
+        state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, state_dir)
+        filters = [{"tag:Env": "Production"}]
+        evaluated = []
+        evaluate = ResourceState.evaluate
+        process = ValueFilter.process
+
+        def counted_evaluate(self, manager, resources, event):
+            evaluated.append(len(resources))
+            return evaluate(self, manager, resources, event)
+
+        def related_process(self, resources, event=None):
+            # as a filter on related resources would
+            self.manager.get_resource_manager('aws.security-group')
+            return process(self, resources, event)
+
+        self.patch(ResourceState, 'evaluate', counted_evaluate)
+        self.patch(ValueFilter, 'process', related_process)
+        self.assertEqual(len(self.get_policy(state_dir, filters).run()), 1)
+        self.assertEqual(len(self.get_policy(state_dir, filters).run()), 1)
+        self.assertEqual(evaluated, [1, 1])
+
+    def test_resource_count_invalid(self):
+        self.assertRaises(
+            PolicyValidationError, self.load_policy,
+            {"name": "ec2-env", "resource": "ec2",
+             "mode": {"type": "incremental-pull"},
+             "filters": [{"type": "value", "value_type": "resource_count",
+                          "op": "gt", "value": 1}]})
+
+    def test_state_expiry(self):
+        state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, state_dir)
+        path = os.path.join(state_dir, 'state.json')
+        state = ResourceState(path, {'name': 'xyz'}, 60)
+        state.created -= 120
+        state.save()
+
+        self.assertFalse(ResourceState(path, {'name': 'xyz'}, 60).load())
+        self.assertTrue(ResourceState(path, {'name': 'xyz'}, 180).load())
+        self.assertFalse(ResourceState(path, {'name': 'abc'}, 180).load())
+
+    def test_dryrun_skips_state(self):
+        state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, state_dir)
+        resources = self.get_policy(
+            state_dir, [{"tag:Env": "Production"}], dryrun=True).run()
+        self.assertEqual(len(resources), 1)
+        self.assertEqual(os.listdir(state_dir), [])
@@ -20,11 +20,14 @@ import os
 
 from dateutil.parser import parse as date_parse
 
+from c7n.columnar import HAVE_ARROW
 from c7n.ctx import ExecutionContext
 from c7n.config import Config
+from c7n.exceptions import InvalidOutputConfig
 from c7n.output import DirectoryOutput, BlobOutput, LogFile, metrics_outputs
 from c7n.resources.aws import S3Output, MetricsOutput
 from c7n.testing import mock_datetime_now, TestUtils
+from c7n.utils import parse_url_config
 
 from .common import Bag, BaseTest
 
@@ -45,7 +48,7 @@ class DirOutputTest(BaseTest):
                 None,
                 Bag(name="xyz", provider_name="ostack"),
                 Config.empty(output_dir=location)),
-            {'url': location},
+            parse_url_config(location),
         )
 
     def test_dir_output(self):
@@ -53,6 +56,16 @@ class DirOutputTest(BaseTest):
         self.assertEqual(os.listdir(work_dir), ["myoutput"])
         self.assertTrue(os.path.isdir(os.path.join(work_dir, "myoutput")))
 
+    def test_dir_output_format(self):
+        work_dir, output = self.get_dir_output("file://myoutput?format=json")
+        self.assertEqual(output.format, "json")
+        self.assertEqual(os.listdir(work_dir), ["myoutput"])
+        self.assertRaises(
+            InvalidOutputConfig, self.get_dir_output, "file://myoutput?format=xml")
+        if not HAVE_ARROW:
+            self.assertRaises(
+                InvalidOutputConfig, self.get_dir_output, "file://myoutput?format=parquet")
+
 
 class S3OutputTest(TestUtils):
 
@@ -64,7 +77,7 @@ class S3OutputTest(TestUtils):
                 lambda assume=False: mock.MagicMock(),
                 Bag(name="xyz", provider_name="ostack"),
                 Config.empty(output_dir=output_url, account_id='112233445566')),
-            {'url': output_url, 'test': True})
+            dict(parse_url_config(output_url), test=True))
 
         if cleanup:
             self.addCleanup(shutil.rmtree, output.root_dir)
@@ -87,6 +100,13 @@ class S3OutputTest(TestUtils):
                 's3://prefix/us-east-1/112233445566/xyz/2020'
             )
 
+    def test_s3_output_format(self):
+        with mock_datetime_now(date_parse('2020/06/10 13:00'), datetime):
+            output = self.get_s3_output(
+                output_url='s3://cloud-custodian/policies?format=json')
+        self.assertEqual(output.format, 'json')
+        self.assertEqual(output.key_prefix, 'policies/xyz/2020/06/10/13')
+
     def test_s3_output(self):
         output = self.get_s3_output()
         self.assertEqual(output.type, "s3")
@@ -128,11 +148,25 @@ class S3OutputTest(TestUtils):
             content = fh.read().strip()
             self.assertTrue(content.endswith("hello world"))
 
+    def test_filter_region(self):
+        output = LogFile(Bag(options=Bag(region='us-east-1')), {})
+        record = logging.LogRecord('custodian', logging.INFO, __file__, 1, 'x', (), None)
+        self.assertTrue(output.filter_region(record))
+        record.c7n_region = 'us-east-1'
+        self.assertTrue(output.filter_region(record))
+        # records of other regions, or logged outside of a region, are skipped
+        record.c7n_region = 'us-west-2'
+        self.assertFalse(output.filter_region(record))
+        record.c7n_region = None
+        self.assertFalse(output.filter_region(record))
+
     def test_compress(self):
         output = self.get_s3_output()
 
         with open(os.path.join(output.root_dir, "foo.txt"), "w") as fh:
             fh.write("abc")
+        with open(os.path.join(output.root_dir, "resources.parquet"), "w") as fh:
+            fh.write("abc")
 
         os.mkdir(os.path.join(output.root_dir, "bucket"))
         with open(os.path.join(output.root_dir, "bucket", "here.log"), "w") as fh:
@@ -141,6 +175,8 @@ class S3OutputTest(TestUtils):
         output.compress()
         for root, dirs, files in os.walk(output.root_dir):
             for f in files:
+                if f == "resources.parquet":
+                    continue
                 self.assertTrue(f.endswith(".gz"))
 
                 with gzip.open(os.path.join(root, f)) as fh:
@@ -0,0 +1,210 @@
+# Copyright 2020 Cloud Custodian Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import threading
+
+from c7n.planner import FetchPlanner, RelatedResources, ResourceSnapshots
+
+from .common import BaseTest
+
+
+class ResourceSnapshotsTest(BaseTest):
+
+    def test_snapshot_copies(self):
+        snapshots = ResourceSnapshots()
+        key = {'region': 'us-east-1', 'resource': 'ec2'}
+        resources = [{'InstanceId': 'i-1'}]
+        snapshots.save(key, resources)
+        resources[0]['c7n:annotation'] = True
+
+        fetched = snapshots.get(key)
+        self.assertEqual(fetched, [{'InstanceId': 'i-1'}])
+        fetched[0]['c7n:annotation'] = True
+        self.assertEqual(snapshots.get(key), [{'InstanceId': 'i-1'}])
+        self.assertEqual(snapshots.hits, 2)
+        self.assertEqual(snapshots.get({'region': 'us-west-2'}), None)
+
+        snapshots.clear()
+        self.assertEqual(len(snapshots), 0)
+
+
+class FetchPlannerTest(BaseTest):
+
+    def test_plan_groups(self):
+        factory = self.replay_flight_data("test_ec2_augment_tags")
+        p1 = self.load_policy(
+            {"name": "ec2-env", "resource": "ec2",
+             "filters": [{"tag:Env": "Production"}]},
+            session_factory=factory)
+        p2 = self.load_policy(
+            {"name": "ec2-all", "resource": "ec2"},
+            session_factory=factory)
+        p3 = self.load_policy(
+            {"name": "ec2-running", "resource": "ec2",
+             "query": [{"instance-state-name": "running"}]},
+            session_factory=factory)
+        p4 = self.load_policy(
+            {"name": "ec2-lambda", "resource": "ec2",
+             "mode": {"type": "periodic", "schedule": "rate(1 day)",
+                      "role": "arn:aws:iam::644160558196:role/custodian"}},
+            session_factory=factory)
+
+        planner = FetchPlanner([p1, p2, p3, p4])
+        groups = planner.plan()
+        self.assertEqual(len(groups), 1)
+        self.assertIs(p1.ctx.snapshots, p2.ctx.snapshots)
+        self.assertIsNone(p3.ctx.snapshots)
+        self.assertIsNone(p4.ctx.snapshots)
+
+        planner.complete(p1)
+        self.assertEqual(len(planner.groups), 1)
+        planner.complete(p2)
+        self.assertEqual(len(planner.groups), 0)
+
+    def test_shared_fetch(self):
+        factory = self.replay_flight_data("test_ec2_augment_tags")
+        p1 = self.load_policy(
+            {"name": "ec2-env", "resource": "ec2",
+             "filters": [{"tag:Env": "Production"}]},
+            session_factory=factory)
+        p2 = self.load_policy(
+            {"name": "ec2-all", "resource": "ec2"},
+            session_factory=factory)
+        planner = FetchPlanner([p1, p2])
+        planner.plan()
+
+        fetches = []
+        source = p1.resource_manager.source.__class__
+        resources = source.resources
+
+        def counted_resources(self, query):
+            fetches.append(query)
+            return resources(self, query)
+
+        self.patch(source, 'resources', counted_resources)
+
+        self.assertEqual(len(p1.run()), 1)
+        planner.complete(p1)
+        self.assertEqual(len(p2.run()), 1)
+        planner.complete(p2)
+        self.assertEqual(len(fetches), 1)
+        # filter annotations from the first policy don't leak
+        self.assertNotIn('c7n:MatchedFilters', p2.resource_manager.resources()[0])
+
+    def test_actions_invalidate(self):
+        factory = self.replay_flight_data("test_ec2_augment_tags")
+        p1 = self.load_policy(
+            {"name": "ec2-tag", "resource": "ec2",
+             "actions": [{"type": "tag", "key": "x", "value": "y"}]},
+            session_factory=factory)
+        p2 = self.load_policy(
+            {"name": "ec2-all", "resource": "ec2"},
+            session_factory=factory)
+        p3 = self.load_policy(
+            {"name": "ec2-all-2", "resource": "ec2"},
+            session_factory=factory)
+        planner = FetchPlanner([p1, p2, p3])
+        planner.plan()
+        snapshots = p1.ctx.snapshots
+        snapshots.save(p1.resource_manager.get_cache_key(None), [{'InstanceId': 'i-1'}])
+        planner.complete(p1)
+        self.assertEqual(len(snapshots), 0)
+
+    def test_shared_related(self):
+        factory = self.replay_flight_data("test_security_group_unused")
+        p1 = self.load_policy(
+            {"name": "sg-unused", "resource": "security-group", "filters": ["unused"]},
+            session_factory=factory)
+        p2 = self.load_policy(
+            {"name": "sg-used", "resource": "security-group", "filters": ["used"]},
+            session_factory=factory)
+        planner = FetchPlanner([p1, p2])
+        planner.plan()
+        self.assertIs(p1.ctx.related, p2.ctx.related)
+
+        fetches = []
+        fetch = RelatedResources.fetch
+
+        def counted_fetch(self, manager, augment):
+            fetches.append(manager.type)
+            return fetch(self, manager, augment)
+
+        self.patch(RelatedResources, 'fetch', counted_fetch)
+        unused = p1.run()
+        planner.complete(p1)
+        used = p2.run()
+        planner.complete(p2)
+        self.assertEqual(len(unused), 1)
+        self.assertNotIn(unused[0]['GroupId'], [r['GroupId'] for r in used])
+        self.assertEqual(
+            sorted(fetches),
+            ['eni', 'event-rule-target', 'lambda', 'launch-config', 'security-group'])
+        self.assertEqual(p1.ctx.related.hits, 5)
+        self.assertEqual(len(p1.ctx.related.data), 0)
+
+
+class RelatedResourcesTest(BaseTest):
+
+    def test_related_get(self):
+        factory = self.replay_flight_data("test_ec2_augment_tags")
+        p = self.load_policy(
+            {"name": "ec2-all", "resource": "ec2"}, session_factory=factory)
+        related = RelatedResources()
+        manager = p.resource_manager.get_resource_manager('ec2')
+        self.assertNotIn(manager, related)
+        resources = related.get(manager, ['i-xyz'])
+        self.assertEqual(resources, [])
+        self.assertIn(manager, related)
+        instance_id = related.resources(manager)[0]['InstanceId']
+        self.assertEqual(
+            [r['InstanceId'] for r in related.get(manager, [instance_id, 'i-xyz'])],
+            [instance_id])
+        self.assertEqual(related.hits, 2)
+        related.clear()
+        self.assertNotIn(manager, related)
+
+    def test_related_concurrent_fetch(self):
+        related = RelatedResources()
+        started = {'a': threading.Event(), 'b': threading.Event()}
+        release = threading.Event()
+        fetched = []
+
+        class Manager:
+            def __init__(self, name):
+                self.name = name
+                self.data = {}
+
+            def get_cache_key(self, query):
+                return {'resource': self.name}
+
+            def resources(self):
+                fetched.append(self.name)
+                started[self.name].set()
+                release.wait(5)
+                return [{'id': self.name}]
+
+        a, b = Manager('a'), Manager('b')
+        results = []
+        threads = [threading.Thread(target=lambda m=m: results.append(related.resources(m)))
+                   for m in (a, a, b)]
+        for t in threads:
+            t.start()
+        # a fetch of another population doesn't wait on the first
+        self.assertTrue(started['a'].wait(5))
+        self.assertTrue(started['b'].wait(5))
+        release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(sorted(fetched), ['a', 'b'])
+        self.assertEqual(sorted(r[0]['id'] for r in results), ['a', 'a', 'b'])
+        self.assertEqual(related.hits, 1)
@@ -16,7 +16,11 @@ import logging
 import os
 
 
-from c7n.query import ResourceQuery, RetryPageIterator
+from c7n.exceptions import PolicyValidationError
+from c7n.executor import MainThreadExecutor
+from c7n import query
+from c7n.query import (
+    DescribeAsyncSource, QueryResourceManager, ResourceQuery, RetryPageIterator)
 from c7n.resources.vpc import InternetGateway
 
 from botocore.config import Config
@@ -172,3 +176,194 @@ class QueryResourceManagerTest(BaseTest):
         self.assertEqual(len(resources), 1)
         resources = p.resource_manager.get_resources(["igw-5bce113f"])
         self.assertEqual(resources, [])
+
+
+class StreamTest(BaseTest):
+
+    def test_query_filter_pages(self):
+        factory = self.replay_flight_data('test_query_pagination_retry')
+        p = self.load_policy(
+            {'name': 'log-groups', 'resource': 'log-group'},
+            session_factory=factory)
+        q = ResourceQuery(p.session_factory)
+        pages = list(q.filter_pages(p.resource_manager))
+        self.assertEqual([len(page) for page in pages], [8, 3])
+
+    def run_policy(self, factory, **config):
+        p = self.load_policy(
+            {'name': 'log-groups', 'resource': 'log-group',
+             'filters': [{'type': 'value', 'key': 'storedBytes',
+                          'op': 'gt', 'value': 5000}]},
+            config=config, session_factory=factory)
+        pages = []
+
+        def augment(resources):
+            pages.append(len(resources))
+            return resources
+
+        self.patch(p.resource_manager, 'augment', augment)
+        return p.run(), pages
+
+    def test_stream_resources(self):
+        factory = self.replay_flight_data('test_query_pagination_retry')
+        resources, pages = self.run_policy(factory)
+        self.assertEqual(pages, [11])
+        streamed, pages = self.run_policy(factory, stream=True)
+        self.assertEqual(pages, [8, 3])
+        self.assertEqual(len(resources), 4)
+        self.assertEqual(resources, streamed)
+
+    def test_stream_set_filters(self):
+        p = self.load_policy({
+            'name': 'log-groups', 'resource': 'log-group',
+            'filters': [
+                {'logGroupName': 'present'},
+                {'or': [{'retentionInDays': 'absent'}, {'tag:App': 'present'}]},
+                {'storedBytes': 'present'}]})
+        page_filters, set_filters = p.resource_manager.get_stream_filters()
+        self.assertEqual(len(page_filters), 1)
+        self.assertEqual(len(set_filters), 2)
+
+        p = self.load_policy({
+            'name': 'log-groups', 'resource': 'log-group',
+            'filters': [
+                {'logGroupName': 'present'},
+                {'not': [{'type': 'value', 'value_type': 'resource_count',
+                          'op': 'lt', 'value': 2}]}]})
+        page_filters, set_filters = p.resource_manager.get_stream_filters()
+        self.assertEqual((len(page_filters), len(set_filters)), (1, 1))
+
+
+class DescribeAsyncTest(BaseTest):
+
+    def test_describe_async_augment(self):
+        factory = self.replay_flight_data('test_cognito-user-pool')
+        workers = []
+
+        def executor_factory(*args, **kw):
+            workers.append(kw['max_workers'])
+            return MainThreadExecutor(*args, **kw)
+
+        clients = []
+        scalar_augment = query._scalar_augment
+
+        def record_augment(*args, client=None):
+            clients.append(client)
+            return scalar_augment(*args, client=client)
+
+        self.patch(QueryResourceManager, 'executor_factory', staticmethod(executor_factory))
+        self.patch(query, '_scalar_augment', record_augment)
+        p = self.load_policy(
+            {'name': 'user-pools', 'resource': 'aws.user-pool',
+             'source': 'describe-async',
+             'filters': [{'MfaConfiguration': 'OFF'}]},
+            config={'describe_concurrency': 5},
+            session_factory=factory)
+        self.assertIsInstance(p.resource_manager.source, DescribeAsyncSource)
+        resources = p.run()
+        self.assertEqual(len(resources), 2)
+        self.assertTrue(all('LambdaConfig' in r for r in resources))
+        # a call per resource, sharing a client
+        self.assertIn(5, workers)
+        self.assertEqual(len(clients), 2)
+        self.assertIs(clients[0], clients[1])
+        self.assertEqual(p.resource_manager.source.augment([]), [])
+
+    def test_unsupported_source(self):
+        for rtype in ('aws.ec2', 'aws.rest-stage'):
+            with self.assertRaises(PolicyValidationError) as e:
+                self.load_policy(
+                    {'name': 'async', 'resource': rtype, 'source': 'describe-async'},
+                    validate=False)
+            self.assertIn('does not support source:describe-async', str(e.exception))
+
+
+class PrefilterTest(BaseTest):
+
+    def get_augmented(self, policy):
+        augmented = []
+        source = policy.resource_manager.source.__class__
+        augment = source.augment
+
+        def record_augment(self, resources):
+            augmented.extend(resources)
+            return augment(self, resources)
+
+        self.patch(source, 'augment', record_augment)
+        return augmented
+
+    def test_prefilter_before_augment(self):
+        factory = self.replay_flight_data("test_cognito-user-pool_delete")
+        p = self.load_policy({
+            'name': 'user-pool-name',
+            'resource': 'aws.user-pool',
+            'filters': [
+                {'Name': 'test-delete-user-pool'},
+                {'type': 'value', 'key': 'MfaConfiguration', 'value': 'present'}]},
+            session_factory=factory)
+        self.assertEqual(
+            [k for k, f in p.resource_manager.get_prefilters()],
+            ['Name', 'MfaConfiguration'])
+        augmented = self.get_augmented(p)
+        resources = p.run()
+        self.assertEqual([r['Name'] for r in resources], ['test-delete-user-pool'])
+        self.assertEqual([r['Name'] for r in augmented], ['test-delete-user-pool'])
+
+    def test_prefilter_cache(self):
+        factory = self.replay_flight_data("test_cognito-user-pool_delete")
+        policy = {
+            'name': 'user-pool-name',
+            'resource': 'aws.user-pool',
+            'filters': [{'Name': 'test-delete-user-pool'}]}
+        p = self.load_policy(policy, session_factory=factory, cache=True)
+        self.assertEqual(len(p.run()), 1)
+
+        # a subsequent run is served the cached pruned population
+        cached = self.load_policy(
+            policy, config=p.options, session_factory=factory)
+        augmented = self.get_augmented(cached)
+        limits = []
+        self.patch(
+            cached.resource_manager.__class__, 'check_resource_limit',
+            lambda self, selection, population: limits.append((selection, population)))
+        self.assertEqual(
+            [r['Name'] for r in cached.run()], ['test-delete-user-pool'])
+        self.assertEqual(augmented, [])
+        self.assertEqual(limits, [(1, 2)])
+
+        # but not to policies with other prefilters
+        cache_key = cached.resource_manager.get_cache_key(
+            cached.resource_manager.source.get_query_params(None))
+        other = self.load_policy(
+            dict(policy, filters=[{'Name': 'c7nusers'}]),
+            config=p.options, session_factory=factory)
+        self.assertIsNone(other.resource_manager._cache.get(
+            other.resource_manager.get_prefilter_cache_key(cache_key)))
+
+    def test_prefilter_undecided(self):
+        factory = self.replay_flight_data("test_cognito-user-pool")
+        p = self.load_policy({
+            'name': 'user-pool-mfa',
+            'resource': 'aws.user-pool',
+            'filters': [
+                {'type': 'value', 'key': 'MfaConfiguration', 'value': 'OFF'}]},
+            session_factory=factory)
+        augmented = self.get_augmented(p)
+        resources = p.run()
+        self.assertEqual(len(resources), 2)
+        self.assertEqual(len(augmented), 2)
+
+    def test_prefilter_chain(self):
+        p = self.load_policy({
+            'name': 'user-pool-chain',
+            'resource': 'aws.user-pool',
+            'filters': [
+                {'tag:App': 'Users'},
+                {'type': 'value', 'key': 'length(SchemaAttributes)', 'value': 1},
+                {'Name': 'c7nusers'}]})
+        self.assertEqual(
+            [k for k, f in p.resource_manager.get_prefilters()], ['tag:App'])
+        p = self.load_policy({
+            'name': 'ec2-chain', 'resource': 'aws.ec2',
+            'filters': [{'State.Name': 'running'}]})
+        self.assertEqual(p.resource_manager.get_prefilters(), [])
@@ -11,10 +11,135 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-from c7n.reports.csvout import Formatter
+from datetime import datetime
+import gzip
+import io
+import json
+import mock
+
+from c7n.executor import MainThreadExecutor
+from c7n.reports.csvout import (
+    Formatter, PREFETCH, SPOOL_SIZE, iter_json_array, iter_record_set, report, write_json)
+from c7n.utils import dumps, reset_session_cache
 from .common import BaseTest, load_data
 
 
+class FakeS3:
+
+    def __init__(self, objects):
+        self.objects = objects
+
+    def get_paginator(self, op):
+        return self
+
+    def paginate(self, Bucket, Prefix, StartAfter):
+        keys = sorted(k for k in self.objects if k > StartAfter)
+        return [{'Contents': [{'Key': k} for k in keys[:2]]},
+                {'Contents': [{'Key': k} for k in keys[2:]]}]
+
+    def get_object(self, Bucket, Key):
+        return {'Body': io.BytesIO(
+            gzip.compress(json.dumps(self.objects[Key]).encode('utf8')))}
+
+
+class RecordStreamTest(BaseTest):
+
+    def test_iter_json_array(self):
+        records = [{'InstanceId': 'i-%d' % i, 'Size': i * 1000, 'Tags': [], 'On': True}
+                   for i in range(20)]
+        for doc in (json.dumps(records), json.dumps(records, indent=2)):
+            for chunk_size in (1, 7, 4096):
+                self.assertEqual(
+                    list(iter_json_array(io.StringIO(doc), chunk_size)), records)
+        self.assertEqual(list(iter_json_array(io.StringIO(' [ ] '), 1)), [])
+        self.assertEqual(list(iter_json_array(io.StringIO('[1, 23]'), 5)), [1, 23])
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('[{"a": 1}, {"b"'), 4))
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('[1, 23'), 2))
+
+    def test_iter_json_array_strings(self):
+        # brackets and escapes within strings, split across chunks
+        records = [{'a': '}]{["\\', 'b': ['"x\\"', {'c': '\\\\'}]}, 'x]', 12.5e3, None]
+        doc = json.dumps(records)
+        for chunk_size in (1, 2, 3, 7, 4096):
+            self.assertEqual(list(iter_json_array(io.StringIO(doc), chunk_size)), records)
+
+    def test_iter_json_array_split_scalars(self):
+        # numbers and literals cut at every possible chunk boundary
+        records = [774185.25, -1.5e-07, 12, True, None, 'x', 3.0, [0.125, 1e+20], {'v': 99.5}]
+        for doc in (json.dumps(records), json.dumps(records, indent=1)):
+            for chunk_size in range(1, len(doc) + 1):
+                self.assertEqual(
+                    list(iter_json_array(io.StringIO(doc), chunk_size)), records)
+
+    def test_iter_json_array_decodes_once(self):
+        # an item spanning many chunks is decoded once it's complete
+        records = [{'Tags': [{'Key': 'k%d' % i} for i in range(1000)]}]
+        decoder = json.JSONDecoder()
+        with mock.patch('json.JSONDecoder', return_value=decoder):
+            with mock.patch.object(decoder, 'decode', wraps=decoder.decode) as decode:
+                self.assertEqual(
+                    list(iter_json_array(io.StringIO(json.dumps(records)), 64)), records)
+        self.assertEqual(decode.call_count, 1)
+
+    def test_write_json(self):
+        for records in ([], [{'InstanceId': 'i-1', 'Tags': [{'Key': 'x'}]}, {'d': datetime.now()}]):
+            fh = io.StringIO()
+            self.assertEqual(list(write_json(iter(records), fh)), records)
+            self.assertEqual(fh.getvalue(), dumps(records, indent=2) + "\n")
+
+    def test_iter_record_set(self):
+        objects = {
+            'policies/ec2/2020/01/01/03/resources.json.gz': [
+                {'InstanceId': 'i-1', 'v': 1}],
+            'policies/ec2/2020/01/02/05/resources.json.gz': [
+                {'InstanceId': 'i-1', 'v': 2}, {'InstanceId': 'i-2', 'v': 2}],
+            'policies/ec2/2020/01/02/10/resources.json.gz': [
+                {'InstanceId': 'i-2', 'v': 3}],
+            'policies/ec2/2020/01/02/10/other.json': [],
+        }
+        client = FakeS3(objects)
+
+        def session_factory():
+            return self
+
+        session_factory.region = 'report-test'
+        self.client = lambda service: client
+        self.addCleanup(reset_session_cache)
+
+        records = list(iter_record_set(
+            session_factory, 'bucket', 'policies/ec2', datetime(2020, 1, 1),
+            MainThreadExecutor(), prefetch=1))
+        self.assertEqual(
+            [(r['InstanceId'], r['v']) for r in records],
+            [('i-2', 3), ('i-1', 2), ('i-2', 2), ('i-1', 1)])
+        self.assertEqual(records[0]['CustodianDate'], datetime(2020, 1, 2, 10))
+
+        p = self.load_policy({"name": "report-test-ec2", "resource": "ec2"})
+        formatter = Formatter(
+            p.resource_manager.resource_type, include_default_fields=False,
+            extra_fields=['id=InstanceId', 'v=v'])
+        self.assertEqual(
+            list(formatter.iter_rows(iter(records))), [['i-2', '3'], ['i-1', '2']])
+
+    def test_report_prefetch_budget(self):
+        policies = []
+        for i in range(40):
+            p = self.load_policy({'name': 'report-%d' % i, 'resource': 'ec2'})
+            p.ctx.initialize = lambda: None
+            p.ctx.output = mock.Mock(type='s3', config={'netloc': 'bucket', 'path': '/p'})
+            policies.append(p)
+        options = mock.Mock(field=(), no_default_fields=False, format='json')
+        with mock.patch('c7n.reports.csvout.iter_record_set', return_value=iter(())) as irs:
+            report(policies, datetime(2020, 1, 1), options, io.StringIO())
+        # the objects held ahead are bounded in total, not per policy
+        self.assertEqual(irs.call_count, 40)
+        self.assertEqual(
+            {(kw['prefetch'], kw['spool_size']) for a, kw in irs.call_args_list},
+            {(1, SPOOL_SIZE * PREFETCH // 40)})
+
+
 class TestEC2Report(BaseTest):
 
     def setUp(self):
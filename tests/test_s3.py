@@ -22,6 +22,8 @@ import time  # NOQA needed for some recordings
 
 from unittest import TestCase
 
+import mock
+
 from botocore.exceptions import ClientError
 from dateutil.tz import tzutc
 
@@ -1274,6 +1276,87 @@ class S3Test(BaseTest):
                 'Retention': '2', 'Retention2': '3', 'test': 'test'})
         self.assertTrue("CreationDate" in resources[0])
 
+    def test_bucket_augment_keys(self):
+        p = self.load_policy({
+            "name": "bucket-keys", "resource": "s3",
+            "filters": [
+                {"tag:Env": "Dev"},
+                {"or": [
+                    {"type": "value", "key": "Versioning.Status", "value": "Enabled"},
+                    {"type": "marked-for-op", "op": "delete"}]}]})
+        self.assertEqual(
+            p.resource_manager.get_augment_keys(), {"Tags", "Versioning"})
+
+        for data in (
+                {"filters": [{"type": "global-grants"}]},
+                {"filters": [{"type": "value", "key": "length(Tags)", "value": 1}]},
+                {"filters": [{"Name": "abc"}], "actions": ["delete"]},
+                {}):
+            data.update({"name": "bucket-keys", "resource": "s3"})
+            p = self.load_policy(data)
+            self.assertEqual(p.resource_manager.get_augment_keys(), None)
+
+    def test_bucket_augment_filter_keys_only(self):
+        self.patch(s3.S3, "executor_factory", MainThreadExecutor)
+        # the recording only has a tagging response, other augment
+        # calls would fail on replay.
+        self.patch(s3, "S3_AUGMENT_TABLE", [
+            m for m in s3.S3_AUGMENT_TABLE if m[1] != 'Location'])
+        augments = []
+        get_augment_table = s3.S3.get_augment_table
+
+        def spy_augment_table(manager):
+            table = get_augment_table(manager)
+            augments.append(([m[1] for m in table], manager.get_cache_key(None)))
+            return table
+
+        self.patch(s3.S3, "get_augment_table", spy_augment_table)
+        session_factory = self.replay_flight_data("test_s3_get_resources")
+        p = self.load_policy(
+            {"name": "bucket-tags", "resource": "s3",
+             "filters": [{"tag:Env": "Dev"}]},
+            session_factory=session_factory)
+        resources = p.run()
+        self.assertEqual(len(resources), 1)
+        self.assertNotIn('Policy', resources[0])
+
+        # only the tags augment ran, cached under the augment subset
+        self.assertEqual(len(augments), 1)
+        methods, cache_key = augments[0]
+        self.assertEqual(methods, ['Tags'])
+        self.assertEqual(cache_key['augment'], ['Tags'])
+
+        # and the subset is reset after the run
+        self.assertIsNone(p.resource_manager.augment_keys)
+        self.assertNotIn('augment', p.resource_manager.get_cache_key(None))
+
+    def test_bucket_assembly_errors(self):
+        client = mock.MagicMock()
+        error = functools.partial(
+            ClientError, operation_name='GetBucketPolicy')
+        client.get_bucket_policy.side_effect = error(
+            {'Error': {'Code': 'NoSuchBucketPolicy', 'Message': ''}})
+        client.get_bucket_acl.side_effect = error(
+            {'Error': {'Code': 'AccessDenied', 'Message': 'denied'}})
+        client.get_bucket_logging.side_effect = error(
+            {'Error': {'Code': 'InternalError', 'Message': 'boom'}})
+        client.get_bucket_location.return_value = {
+            'LocationConstraint': 'EU', 'ResponseMetadata': {}}
+
+        assembly = s3.BucketAssembly(None, [
+            m for m in s3.S3_AUGMENT_TABLE if m[1] in ('Location', 'Policy', 'Acl')])
+        assembly.clients[None] = assembly.clients['eu-west-1'] = client
+        b = assembly.assemble_location({'Name': 'xyz'})
+        self.assertEqual(s3.get_region(b), 'eu-west-1')
+        for minfo in assembly.methods:
+            assembly.apply(b, minfo, assembly.invoke(b, minfo))
+        self.assertEqual(b['Policy'], None)
+        self.assertEqual(b['c7n:DeniedMethods'], ['get_bucket_acl'])
+        self.assertNotIn('Acl', b)
+
+        with self.assertRaises(ClientError):
+            assembly.invoke(b, ('get_bucket_logging', 'Logging', None, 'LoggingEnabled'))
+
     def test_multipart_large_file(self):
         self.patch(s3.S3, "executor_factory", MainThreadExecutor)
         self.patch(s3.EncryptExtantKeys, "executor_factory", MainThreadExecutor)
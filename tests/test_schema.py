@@ -11,12 +11,18 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import json
+import os
+import shutil
+import tempfile
+
 import mock
-from jsonschema.exceptions import best_match
+from jsonschema.exceptions import best_match, SchemaError
 
 from c7n.exceptions import PolicyValidationError
-from c7n.filters import ValueFilter
+from c7n.filters import Filter, ValueFilter
 from c7n.registry import PluginRegistry
+from c7n import resources
 from c7n.resources import load_resources
 from c7n.schema import (
     StructureParser, ElementSchema, resource_vocabulary,
@@ -326,6 +332,19 @@ class SchemaTest(BaseTest):
         self.assertTrue("Additional properties are not allowed " in error.message)
         self.assertTrue("'skipped_devices' was unexpected" in error.message)
 
+    def test_describe_async_source(self):
+        load_resources(('aws.ec2', 'aws.rest-stage', 'aws.user-pool'))
+        validator = JsonSchemaValidator(generate())
+
+        def errors(rtype):
+            return list(validator.iter_errors({'policies': [{
+                'name': 'async', 'resource': rtype, 'source': 'describe-async'}]}))
+
+        self.assertEqual(errors('aws.user-pool'), [])
+        # resources with their own describe source, and child resources
+        self.assertTrue(errors('aws.ec2'))
+        self.assertTrue(errors('aws.rest-stage'))
+
     def test_invalid_resource_type(self):
         data = {
             "policies": [{"name": "instance-policy",
@@ -560,3 +579,120 @@ class SchemaTest(BaseTest):
         self.assertEqual(ElementSchema.doc(F), "")
         self.assertEqual(
             ElementSchema.doc(B), "Hello World\n\nxyz")
+
+
+class SchemaValidatorTest(BaseTest):
+
+    def test_get_validator(self):
+        load_resources(('aws.ec2',))
+        validator = schema.get_validator(generate(['aws.ec2']))
+        self.assertIn('aws.ec2', validator.schema['definitions']['resources'])
+        self.assertRaises(SchemaError, schema.get_validator, {'type': 'nothing'})
+
+    def test_is_valid(self):
+        load_resources(('aws.ec2', 'aws.ebs'))
+        validator = JsonSchemaValidator(generate(['aws.ec2', 'aws.ebs']))
+        data = {'vars': {'x': 1}, 'policies': [
+            {'name': 'ec2-stop', 'resource': 'ec2',
+             'filters': [{'tag:App': 'absent'}], 'actions': ['stop']},
+            {'name': 'ebs-delete', 'resource': 'aws.ebs',
+             'filters': [{'type': 'value', 'key': 'Encrypted', 'value': False}],
+             'actions': ['delete']}]}
+        self.assertTrue(schema.is_valid(validator, data))
+        self.assertTrue(schema.is_valid(validator, data, max_workers=2))
+
+        data['policies'][1]['actions'] = ['stop']
+        self.assertFalse(schema.is_valid(validator, data))
+        self.assertFalse(schema.is_valid(validator, data, max_workers=2))
+        self.assertEqual(len(validate(data, validator.schema)), 2)
+
+        data['policies'][1]['resource'] = 'aws.sqs'
+        self.assertFalse(schema.is_valid(validator, data))
+        self.assertFalse(schema.is_valid(validator, {'policies': [], 'bad': 1}))
+        self.assertFalse(schema.is_valid(validator, []))
+
+
+class SchemaIndexTest(BaseTest):
+
+    def setUp(self):
+        load_resources(('aws.*',))
+        self.index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.index_dir)
+        self.patch(resources, 'INDEXES', {})
+        self.patch(resources, 'INDEX_MODULES', {})
+        for m in (resources, schema):
+            self.patch(m, 'get_index_path', self.get_index_path)
+
+    def get_index_path(self, provider_name):
+        return os.path.join(self.index_dir, '%s-index.json' % provider_name)
+
+    def write_index(self, index):
+        with open(self.get_index_path('aws'), 'w') as fh:
+            json.dump(index, fh)
+        resources.reset_index('aws')
+
+    def test_index_generate(self):
+        # schemas may have tuples, the index has their json form
+        expected = json.loads(json.dumps(generate()))
+        index = schema.build_index('aws')
+        self.assertEqual(
+            index['resources']['aws.ec2']['class'], 'c7n.resources.ec2.EC2')
+        self.assertEqual(
+            index['resources']['aws.ec2']['filters']['image'],
+            'c7n.resources.ec2.InstanceImage')
+        self.write_index(index)
+
+        # without resources loaded the schema is generated from the index
+        self.patch(schema.clouds['aws'], 'resources', PluginRegistry('resources'))
+        self.assertEqual(generate(), expected)
+        subset = generate(['aws.ec2', 'aws.app-elb'])
+        self.assertEqual(
+            sorted(subset['definitions']['resources']), ['aws.app-elb', 'aws.ec2'])
+        self.assertEqual(
+            subset['definitions']['resources']['aws.ec2'],
+            expected['definitions']['resources']['aws.ec2'])
+        self.assertEqual(
+            schema.resource_outline('aws')['aws']['aws.ec2']['filters'],
+            sorted(index['resources']['aws.ec2']['filters']))
+
+    def test_index_version(self):
+        self.assertIsNone(resources.load_index('aws'))
+        index, path = schema.save_index('aws')
+        self.assertEqual(path, self.get_index_path('aws'))
+        self.assertEqual(resources.load_index('aws'), json.loads(json.dumps(index)))
+
+        # an index of another version isn't used
+        self.write_index(dict(index, version='0.0.1'))
+        self.assertIsNone(resources.load_index('aws'))
+
+    def test_index_modules(self):
+        index = schema.build_index('aws')
+        self.assertEqual(index['modes'], ['c7n.resources.securityhub'])
+        index['resources']['aws.ec2']['filters']['plugin'] = 'c7n_plugin.filters.Plugin'
+        self.write_index(index)
+        modules = resources.get_index_modules('aws')
+        self.assertTrue({'c7n.resources.ec2', 'c7n.resources.securityhub',
+                         'c7n.resources.sfn', 'c7n.resources.ssm'}.issubset(
+                             modules['resources']['aws.ec2']))
+
+        # modules registering filters and actions are imported ahead of
+        # the resources using them.
+        imported = []
+        self.patch(resources.importlib, 'import_module', imported.append)
+        resources.import_index_modules('aws', ['aws.sqs'])
+        self.assertEqual(imported, [])
+        resources.import_index_modules('aws', ['aws.ec2', 'aws.unknown'])
+        self.assertEqual(imported, ['c7n_plugin.filters'])
+
+    def test_index_merges_plugins(self):
+        self.write_index(schema.build_index('aws'))
+        from c7n.resources.sqs import SQS
+
+        class PluginFilter(Filter):
+            schema = {'type': 'object', 'properties': {'type': {'enum': ['plugin']}}}
+
+        SQS.filter_registry.register('plugin', PluginFilter)
+        self.addCleanup(SQS.filter_registry.unregister, 'plugin')
+        definitions = generate(['aws.sqs', 'aws.ec2'])['definitions']['resources']
+        self.assertIn('plugin', definitions['aws.sqs']['filters'])
+        self.assertNotIn('plugin', definitions['aws.ec2']['filters'])
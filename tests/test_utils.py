@@ -17,6 +17,7 @@ import os
 import tempfile
 import time
 
+from botocore.config import Config as BotoConfig
 from botocore.exceptions import ClientError
 from dateutil.parser import parse as parse_date
 import mock
@@ -62,6 +63,42 @@ class Backoff(BaseTest):
         else:
             self.fail("should have raised")
 
+    def test_rate_limiter(self):
+        limiter = utils.RateLimiter()
+        self.assertEqual(limiter.acquire(), 0)
+        self.assertEqual(limiter.acquire(), 0)
+        limiter.succeeded()
+        self.assertEqual(limiter.rate, None)
+
+        limiter.throttled()
+        self.assertEqual(limiter.rate, 1)
+        self.assertEqual(limiter.acquire(), 0)
+        self.assertAlmostEqual(limiter.acquire(), 1, places=1)
+        limiter.succeeded()
+        self.assertEqual(limiter.rate, 2)
+        limiter.throttled()
+        self.assertEqual(limiter.rate, 1)
+        limiter.throttled()
+        self.assertEqual(limiter.rate, limiter.min_rate)
+
+    def test_retry_rate_limiter(self):
+        self.patch(time, "sleep", lambda x: x)
+        factory = self.replay_flight_data('test_query_pagination_retry')
+        client = factory().client(
+            'logs', config=BotoConfig(retries={'max_attempts': 0}))
+        self.assertIs(
+            utils.get_rate_limiter(client.describe_log_groups),
+            utils.get_rate_limiter(client.describe_log_groups))
+        self.assertIsNone(utils.get_rate_limiter(lambda: 42))
+
+        retry = utils.get_retry(('ThrottlingException',))
+        retry(client.describe_log_groups)
+        limiter = utils.get_rate_limiter(client.describe_log_groups)
+        self.assertIsNone(limiter.rate)
+        retry(client.describe_log_groups)
+        # throttled at two calls per second, then halved and raised on success
+        self.assertEqual(limiter.rate, 2)
+
     def test_delays(self):
         self.assertEqual(
             list(utils.backoff_delays(1, 256)),
@@ -17,7 +17,9 @@ from unittest.mock import MagicMock
 
 from botocore.exceptions import ClientError as BotoClientError
 from c7n.exceptions import PolicyValidationError
+from c7n.filters import ValueFilter
 from c7n.resources.aws import shape_validate
+from c7n.resources.vpc import CidrMatcher
 
 
 class VpcTest(BaseTest):
@@ -2427,6 +2429,31 @@ class SecurityGroupTest(BaseTest):
             ],
         )
 
+    def test_cidr_matcher(self):
+        p = self.load_policy({"name": "sg", "resource": "security-group"})
+        sentinels = ["0.0.0.0/0", "10.42.0.0/16", "10.42.1.1", "::/0", "fe80::1"]
+        values = ["10.42.0.0/16", "10.42.1.0/24", "10.42.1.1", "10.0.0.0/8",
+                  "192.168.1.1", "::/0", "fe80::1", "bad", None]
+        for op in ("in", "ni", "not-in", "eq", "ne", "lt"):
+            for sentinel in sentinels:
+                data = {"value": sentinel, "op": op, "value_type": "cidr"}
+                matcher = CidrMatcher(data, "CidrIp", p.resource_manager)
+                vf = ValueFilter(dict(data, key="CidrIp"), p.resource_manager)
+                for v in values:
+                    if v is None and op not in ("in", "not-in"):
+                        continue
+                    ip_range = v is not None and {"CidrIp": v} or {}
+                    self.assertEqual(
+                        bool(matcher(ip_range)), bool(vf(ip_range)), (op, sentinel, v))
+        matcher = CidrMatcher(
+            {"value": "10.0.0.0/8", "op": "in", "value_type": "cidr"},
+            "CidrIp", p.resource_manager)
+        self.assertTrue(matcher({"CidrIp": "10.42.0.0/16"}))
+        self.assertEqual(
+            matcher.intervals,
+            {"10.0.0.0/8": (True, 4, 167772160, 184549375),
+             "10.42.0.0/16": (True, 4, 170524672, 170590207)})
+
     def test_egress_validation_error(self):
         self.assertRaises(
             Exception,
@@ -130,13 +130,18 @@ class AutoTagBase(AzureEventAction):
     default_value = "Unknown"
     query_select = "eventTimestamp, operationName"
     max_query_days = 90
+    # Minimum number of resources to look up from a prefetch of the
+    # subscription's activity log, rather than a query per resource,
+    # overridden with the action's prefetch-min.
+    prefetch_min = 20
 
     schema = utils.type_schema(
         'auto-tag-base',
         required=['tag'],
         **{'update': {'type': 'boolean'},
            'tag': {'type': 'string'},
-           'days': {'type': 'integer'}})
+           'days': {'type': 'integer'},
+           'prefetch-min': {'type': 'integer', 'minimum': 1}})
     schema_alias = True
 
     def __init__(self, data=None, manager=None, log_dir=None):
@@ -183,21 +188,78 @@ class AutoTagBase(AzureEventAction):
 
         TagHelper.add_tags(self, resource, {self.tag_key: tag_value})
 
+    def process(self, resources, event=None):
+        if event is None:
+            self._prefetch_first_events(resources)
+        return super(AutoTagBase, self).process(resources, event)
+
+    def _prefetch_first_events(self, resources):
+        """Annotate resources with their first write event.
+
+        Rather than querying the activity log of each resource, the log of
+        operations in the subscription is queried once per resource
+        provider, and write events of the resources' types are indexed by
+        resource.
+        """
+        tag_key = self.data['tag']
+        should_update = self.data.get('update', False)
+        resources = [r for r in resources if 'c7n:first_iam_event' not in r and (
+            should_update or not r.get('tags', {}).get(tag_key))]
+        if len(resources) < self.data.get('prefetch-min', self.prefetch_min):
+            return
+
+        client = self.manager.get_client('azure.mgmt.monitor.MonitorManagementClient')
+        start_time = self._get_start_time()
+        providers = {}
+        for r in resources:
+            provider = self._get_resource_type(r).split('/', 1)[0]
+            providers.setdefault(provider.lower(), []).append(r)
+
+        for provider_resources in providers.values():
+            resource_types = {self._get_resource_type(r) for r in provider_resources}
+            provider = self._get_resource_type(provider_resources[0]).split('/', 1)[0]
+            try:
+                first_events = self._get_first_events(client, start_time, provider, resource_types)
+            except Exception as e:
+                # resources not annotated are queried individually
+                self.log.warning("Could not prefetch activity logs of %s resources: %s" % (
+                    provider, e))
+                continue
+
+            self.log.debug("Found first write events of %d of %d %s resources" % (
+                len(first_events), len(provider_resources), provider))
+            for r in provider_resources:
+                r['c7n:first_iam_event'] = first_events.get(self._get_resource_key(r))
+
+    def _get_first_events(self, client, start_time, provider, resource_types):
+        # the activity log can't be filtered by resource type, so events of
+        # the provider are matched to the resource types by operation.
+        logs = client.activity_logs.list(
+            filter=" and ".join([
+                "eventTimestamp ge '%s'" % start_time,
+                "eventChannels eq 'Operation'",
+                "resourceProvider eq '%s'" % provider
+            ]),
+            select="%s, resourceId, resourceGroupName" % self.query_select
+        )
+
+        # logs are newest first, so the last write of a resource is its first
+        first_events = {}
+        for l in logs:
+            if any(self._is_write_event(l, t) for t in resource_types):
+                first_events[self._get_event_key(l)] = l
+        return first_events
+
     def _get_first_event(self, resource):
 
         if 'c7n:first_iam_event' in resource:
             return resource['c7n:first_iam_event']
 
-        # Makes patching this easier
-        from c7n_azure.utils import utcnow
-
-        # Calculate start time
-        delta_days = self.data.get('days', self.max_query_days)
-        start_time = utcnow() - datetime.timedelta(days=delta_days)
+        start_time = self._get_start_time()
+        resource_type = self._get_resource_type(resource)
 
         # resource group type
         if self.manager.type == 'resourcegroup':
-            resource_type = "Microsoft.Resources/subscriptions/resourcegroups"
             query_filter = " and ".join([
                 "eventTimestamp ge '%s'" % start_time,
                 "resourceGroupName eq '%s'" % resource['name'],
@@ -206,7 +268,6 @@ class AutoTagBase(AzureEventAction):
             ])
         # other Azure resources
         else:
-            resource_type = resource['type']
             query_filter = " and ".join([
                 "eventTimestamp ge '%s'" % start_time,
                 "resourceUri eq '%s'" % resource['id'],
@@ -221,15 +282,41 @@ class AutoTagBase(AzureEventAction):
         )
 
         # get the user who issued the first operation
-        operation_name = "%s/write" % resource_type
         first_event = None
         for l in logs:
-            if l.operation_name.value and l.operation_name.value.lower() == operation_name.lower():
+            if self._is_write_event(l, resource_type):
                 first_event = l
 
         resource['c7n:first_iam_event'] = first_event
         return first_event
 
+    def _get_start_time(self):
+        # Makes patching this easier
+        from c7n_azure.utils import utcnow
+
+        delta_days = self.data.get('days', self.max_query_days)
+        return utcnow() - datetime.timedelta(days=delta_days)
+
+    def _get_resource_type(self, resource):
+        if self.manager.type == 'resourcegroup':
+            return "Microsoft.Resources/subscriptions/resourcegroups"
+        return resource['type']
+
+    def _get_resource_key(self, resource):
+        if self.manager.type == 'resourcegroup':
+            return resource['name'].lower()
+        return resource['id'].lower()
+
+    def _get_event_key(self, event):
+        if self.manager.type == 'resourcegroup':
+            return (event.resource_group_name or '').lower()
+        return (event.resource_id or '').lower()
+
+    def _is_write_event(self, event, resource_type):
+        operation_name = event.operation_name.value
+        return bool(operation_name) and \
+            operation_name.lower() == ("%s/write" % resource_type).lower()
+
 
 class AutoTagUser(AutoTagBase):
     """Attempts to tag a resource with the first user who created/modified it.
@@ -37,6 +37,7 @@ ENV_CONTAINER_POLICY_URI = 'AZURE_CONTAINER_POLICY_URI'
 ENV_CONTAINER_OPTION_LOG_GROUP = 'AZURE_CONTAINER_LOG_GROUP'
 ENV_CONTAINER_OPTION_METRICS = 'AZURE_CONTAINER_METRICS'
 ENV_CONTAINER_OPTION_OUTPUT_DIR = 'AZURE_CONTAINER_OUTPUT_DIR'
+ENV_CONTAINER_POLICY_WORKERS = 'AZURE_CONTAINER_POLICY_WORKERS'
 
 
 """
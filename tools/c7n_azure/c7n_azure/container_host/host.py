@@ -17,15 +17,20 @@ import json
 import logging
 import os
 import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import click
 import yaml
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_MISSED
 from apscheduler.schedulers.blocking import BlockingScheduler
 from apscheduler.triggers.cron import CronTrigger
 from azure.common import AzureHttpError
 from azure.mgmt.eventgrid.models import (
     EventSubscriptionFilter, StorageQueueEventSubscriptionDestination)
+from dateutil.tz import tzutc
 
 from c7n.config import Config
 from c7n.policy import PolicyCollection
@@ -39,6 +44,7 @@ from c7n_azure.constants import (CONTAINER_EVENT_TRIGGER_MODE,
                                  ENV_CONTAINER_OPTION_METRICS,
                                  ENV_CONTAINER_OPTION_OUTPUT_DIR,
                                  ENV_CONTAINER_POLICY_URI,
+                                 ENV_CONTAINER_POLICY_WORKERS,
                                  ENV_CONTAINER_QUEUE_NAME,
                                  ENV_CONTAINER_STORAGE_RESOURCE_ID)
 from c7n_azure.provider import Azure
@@ -51,13 +57,16 @@ max_dequeue_count = 2
 policy_update_seconds = 60
 queue_poll_seconds = 15
 queue_timeout_seconds = 5 * 60
-queue_message_count = 5
+queue_message_count = 32
+queue_workers = 8
+policy_workers = 8
+event_dedup_seconds = 30
 
 
 class Host:
 
     def __init__(self, storage_id, queue_name, policy_uri,
-                 log_group=None, metrics=None, output_dir=None):
+                 log_group=None, metrics=None, output_dir=None, policy_workers=None):
         logging.basicConfig(level=logging.INFO, format='%(message)s')
         log.info("Running Azure Cloud Custodian Self-Host")
 
@@ -95,8 +104,17 @@ class Host:
         self.policy_cache = tempfile.mkdtemp()
         self.policies = {}
 
+        # Recently processed events by resource and operation
+        self.recent_events = {}
+        self.recent_events_lock = threading.Lock()
+
+        # Insertion time of the events of scheduled policy jobs, by job id
+        self.pending_events = {}
+
         # Configure scheduler
-        self.scheduler = BlockingScheduler(Host.get_scheduler_config())
+        self.scheduler = BlockingScheduler(Host.get_scheduler_config(policy_workers))
+        self.scheduler.add_listener(
+            self.job_finished, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED)
         logging.getLogger('apscheduler.executors.default').setLevel(logging.ERROR)
 
         # Schedule recurring policy updates
@@ -328,37 +346,111 @@ class Host:
                 self.queue_storage_account,
                 self.storage_session)
 
-        while True:
-            try:
-                messages = Storage.get_queue_messages(
-                    self.queue_service,
-                    self.event_queue_name,
-                    num_messages=queue_message_count,
-                    visibility_timeout=queue_timeout_seconds)
-            except AzureHttpError:
-                self.queue_service = None
-                raise
-
-            if len(messages) == 0:
-                break
-
-            log.info('Pulled %s events to process while polling queue.' % len(messages))
-
-            for message in messages:
-                if message.dequeue_count > max_dequeue_count:
-                    Storage.delete_queue_message(self.queue_service,
-                                                 self.event_queue_name,
-                                                 message=message)
-                    log.warning("Event deleted due to reaching maximum retry count.")
-                else:
-                    # Run matching policies
-                    self.run_policies_for_event(message)
-
-                    # We delete events regardless of policy result
-                    Storage.delete_queue_message(
+        with ThreadPoolExecutor(max_workers=queue_workers) as w:
+            while True:
+                try:
+                    messages = Storage.get_queue_messages(
                         self.queue_service,
                         self.event_queue_name,
-                        message=message)
+                        num_messages=queue_message_count,
+                        visibility_timeout=queue_timeout_seconds)
+                except AzureHttpError:
+                    self.queue_service = None
+                    raise
+
+                if len(messages) == 0:
+                    break
+
+                log.info('Pulled %s events to process while polling queue.' % len(messages))
+                self.process_messages(w, messages)
+
+    def process_messages(self, executor, messages):
+        """
+        Process a batch of queue messages concurrently, then
+        delete the batch's processed messages together.
+        Messages failing to process are left on the queue
+        to be retried.
+        """
+        pulled = datetime.now(tz=tzutc())
+        st = time.time()
+        processed = [m for m in executor.map(self.process_message, messages) if m]
+        list(executor.map(self.delete_message, processed))
+
+        lag = [(pulled - m.insertion_time).total_seconds()
+               for m in messages if m.insertion_time]
+        stats = {
+            'events': len(messages),
+            'failed': len(messages) - len(processed),
+            'duration': time.time() - st,
+            'queue_lag_max': max(lag) if lag else 0}
+        log.info(
+            'Processed %(events)d events, %(failed)d failed, in %(duration)0.2fs '
+            'queue lag max:%(queue_lag_max)0.2fs' % stats,
+            extra={'properties': stats})
+        return stats
+
+    def job_finished(self, job_event):
+        """
+        Log the latency of an event's policy execution,
+        from the event's enqueue to the policy finishing.
+        """
+        insertion_time = self.pending_events.pop(job_event.job_id, None)
+        if insertion_time is None or job_event.code == EVENT_JOB_MISSED:
+            return
+        stats = {
+            'job': job_event.job_id,
+            'event_latency': (datetime.now(tz=tzutc()) - insertion_time).total_seconds()}
+        log.info('Policy job %(job)s finished, event latency:%(event_latency)0.2fs' % stats,
+                 extra={'properties': stats})
+
+    def process_message(self, message):
+        if message.dequeue_count > max_dequeue_count:
+            log.warning("Event deleted due to reaching maximum retry count.")
+            return message
+        try:
+            # Run matching policies
+            self.run_policies_for_event(message)
+        except Exception:
+            log.exception("Failed to process event %s" % message.id)
+            return None
+        # We delete events regardless of policy result
+        return message
+
+    def delete_message(self, message):
+        try:
+            Storage.delete_queue_message(
+                self.queue_service,
+                self.event_queue_name,
+                message=message)
+        except AzureHttpError as e:
+            log.warning("Failed to delete event %s %s" % (message.id, e))
+
+    def get_event_key(self, event):
+        return (event.get('subject', '').lower(), event['data']['operationName'].lower())
+
+    def is_duplicate_event(self, event):
+        """
+        Check if an event for the same resource and operation
+        was processed within the deduplication window, as
+        deployments emit several events for each resource.
+        Otherwise the event is recorded, until forgotten
+        when its policies fail to schedule.
+        """
+        key = self.get_event_key(event)
+        now = time.time()
+        with self.recent_events_lock:
+            if len(self.recent_events) > 1000:
+                self.recent_events = {k: t for k, t in self.recent_events.items()
+                                      if now - t < event_dedup_seconds}
+            last = self.recent_events.get(key)
+            if last is not None and now - last < event_dedup_seconds:
+                return True
+            self.recent_events[key] = now
+        return False
+
+    def forget_event(self, event):
+        with self.recent_events_lock:
+            self.recent_events.pop(self.get_event_key(event), None)
 
     def run_policies_for_event(self, message):
         """
@@ -369,20 +461,33 @@ class Host:
         event = json.loads(base64.b64decode(message.content).decode('utf-8'))
         operation_name = event['data']['operationName']
 
+        if self.is_duplicate_event(event):
+            log.debug("Skipping duplicate event %s for %s" % (
+                operation_name, event.get('subject')))
+            return
+
         # Execute all policies matching the event type
-        for k, v in self.policies.items():
-            events = v['policy'].data.get('mode', {}).get('events')
-            if not events:
-                continue
-            events = AzureEvents.get_event_operations(events)
-            if operation_name in events:
-                self.scheduler.add_job(Host.run_policy,
-                                       id=k + event['id'],
-                                       name=k,
-                                       args=[v['policy'],
-                                             event,
-                                             None],
-                                       misfire_grace_time=60 * 3)
+        try:
+            for k, v in self.policies.items():
+                events = v['policy'].data.get('mode', {}).get('events')
+                if not events:
+                    continue
+                events = AzureEvents.get_event_operations(events)
+                if operation_name in events:
+                    job_id = k + event['id']
+                    self.scheduler.add_job(Host.run_policy,
+                                           id=job_id,
+                                           name=k,
+                                           args=[v['policy'],
+                                                 event,
+                                                 None],
+                                           misfire_grace_time=60 * 3)
+                    if getattr(message, 'insertion_time', None):
+                        self.pending_events[job_id] = message.insertion_time
+        except Exception:
+            # the message is retried, and isn't a duplicate of itself
+            self.forget_event(event)
+            raise
 
     def prepare_queue_storage(self, queue_resource_id, queue_name):
         """
@@ -429,14 +534,14 @@ class Host:
         return Azure().initialize(config)
 
     @staticmethod
-    def get_scheduler_config():
+    def get_scheduler_config(workers=None):
         return {
             'apscheduler.jobstores.default': {
                 'type': 'memory'
             },
             'apscheduler.executors.default': {
                 'class': 'apscheduler.executors.pool:ProcessPoolExecutor',
-                'max_workers': '4'
+                'max_workers': str(workers or policy_workers)
             },
             'apscheduler.executors.threadpool': {
                 'type': 'threadpool',
@@ -467,6 +572,9 @@ class Host:
                   help="The resource name or instrumentation key for uploading metrics")
     @click.option("--output-dir", "-d", envvar=ENV_CONTAINER_OPTION_OUTPUT_DIR,
                   help="The directory for policy output")
+    @click.option("--policy-workers", "-w", envvar=ENV_CONTAINER_POLICY_WORKERS, type=int,
+                  help="The number of processes executing policies, %d by default"
+                       % policy_workers)
     def cli(**kwargs):
         Host(**kwargs)
 
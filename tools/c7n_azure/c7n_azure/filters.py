@@ -24,6 +24,8 @@ from azure.mgmt.costmanagement.models import (QueryAggregation,
                                               QueryFilter, QueryGrouping,
                                               QueryTimePeriod, TimeframeType)
 from azure.mgmt.policyinsights import PolicyInsightsClient
+from c7n_azure.metrics import (AdaptiveLimit, MetricsCache, get_series_resource_id,
+                               list_metrics_batch, supports_metrics_batch)
 from c7n_azure.tags import TagHelper
 from c7n_azure.utils import (IpRangeHelper, Math, ResourceIdParser,
                              StringUtils, ThreadHelper, now, utcnow, is_resource_group)
@@ -60,6 +62,10 @@ class MetricFilter(Filter):
     <https://docs.microsoft.com/en-us/azure/monitoring-and-diagnostics/monitoring-supported-metrics/>`_
     for a full list of metrics supported by Azure resources.
 
+    Metrics of resources of the same subscription, type and region are
+    queried in batches, and measurements are cached for the cache period,
+    so policies filtering on the same metric share them.
+
     :example:
 
     Find all VMs with an average Percentage CPU greater than 75% over last 2 hours
@@ -119,6 +125,16 @@ class MetricFilter(Filter):
     DEFAULT_INTERVAL = 'P1D'
     DEFAULT_AGGREGATION = 'average'
 
+    # Concurrent metric requests, adapting between the initial and maximum
+    # number as requests are throttled.
+    initial_workers = 3
+    max_workers = 8
+    # Resources of a subscription, type and region are queried together in
+    # batches, when there are at least batch_min of them.
+    batch_metrics = True
+    batch_size = 20
+    batch_min = 5
+
     aggregation_funcs = {
         'average': Math.mean,
         'total': Math.sum,
@@ -178,18 +194,107 @@ class MetricFilter(Filter):
 
         # Create Azure Monitor client
         self.client = self.manager.get_client('azure.mgmt.monitor.MonitorManagementClient')
+        self.limit = AdaptiveLimit(self.max_workers, self.initial_workers)
+
+        # Annotate resources with cached and batch queried metrics
+        cache = MetricsCache(self.manager.config, self._get_metrics_query_key())
+        uncached = self.get_cached_metrics(cache, resources)
+        self.get_batch_metrics(uncached)
 
         # Process each resource in a separate thread, returning all that pass filter
-        with self.executor_factory(max_workers=3) as w:
+        with self.executor_factory(max_workers=self.max_workers) as w:
             processed = list(w.map(self.process_resource, resources))
-            return [item for item in processed if item is not None]
+
+        for r in uncached:
+            data = self._get_cached_metric_data(r)
+            if data:
+                cache.set(*self._get_resource_cache_key(r), data=data)
+        cache.save()
+        return [item for item in processed if item is not None]
+
+    def get_cached_metrics(self, cache, resources):
+        """Annotate resources with cached metrics, returning those not cached."""
+        fetch = []
+        for r in resources:
+            if self._get_cached_metric_data(r):
+                continue
+            data = cache.get(*self._get_resource_cache_key(r))
+            if data is None:
+                fetch.append(r)
+            else:
+                r.setdefault(get_annotation_prefix('metrics'), {})[
+                    self._get_metrics_cache_key()] = data
+        return fetch
+
+    def get_batch_metrics(self, resources):
+        """Annotate resources with metrics queried in batches.
+
+        Resources of the same subscription, type and region are queried
+        together, resources without data in a batch are left to be
+        queried individually.
+        """
+        if (not self.batch_metrics or self.filter is not None or
+                not supports_metrics_batch(self.client)):
+            return
+        groups = {}
+        for r in resources:
+            rid = self.get_resource_id(r)
+            if not r.get('location') or not ResourceIdParser.get_namespace(rid):
+                continue
+            groups.setdefault((
+                ResourceIdParser.get_subscription_id(rid),
+                ResourceIdParser.get_full_type(rid).lower(),
+                r['location'].lower()), []).append(r)
+
+        batches = []
+        for key, group in groups.items():
+            if len(group) < self.batch_min:
+                continue
+            batches.extend((key, b) for b in chunks(group, self.batch_size))
+        if not batches:
+            return
+
+        with self.executor_factory(max_workers=self.max_workers) as w:
+            futures = {w.submit(self.get_batch_metric_data, key, batch): key
+                       for key, batch in batches}
+            for f in as_completed(futures):
+                if f.exception():
+                    self.log.warning(
+                        "Could not get metric: %s in batch %s error: %s" % (
+                            self.metric, "/".join(futures[f]), f.exception()))
+
+    def get_batch_metric_data(self, key, resources):
+        subscription_id, namespace, region = key
+        resource_ids = [self.get_resource_id(r) for r in resources]
+        metrics_data = self.limit.call(
+            list_metrics_batch, self.client, subscription_id, region, namespace,
+            resource_ids, timespan=self.timespan, interval=self.interval,
+            metricnames=self.metric, aggregation=self.aggregation)
+
+        if not metrics_data.value:
+            return
+        series = {}
+        for ts in metrics_data.value[0].timeseries:
+            rid = get_series_resource_id(ts)
+            if rid:
+                series[rid.lower()] = ts
+
+        data = metrics_data.as_dict()
+        for r, rid in zip(resources, resource_ids):
+            ts = series.get(rid.lower())
+            if ts is None:
+                continue
+            m = [getattr(item, self.aggregation) for item in ts.data]
+            self._write_measurement_to_resource(
+                r, dict(data, value=[dict(data['value'][0], timeseries=[ts.as_dict()])]), m)
 
     def get_metric_data(self, resource):
         cached_metric_data = self._get_cached_metric_data(resource)
         if cached_metric_data:
             return cached_metric_data['measurement']
         try:
-            metrics_data = self.client.metrics.list(
+            metrics_data = self.limit.call(
+                self.client.metrics.list,
                 self.get_resource_id(resource),
                 timespan=self.timespan,
                 interval=self.interval,
@@ -219,9 +324,12 @@ class MetricFilter(Filter):
         return self.filter
 
     def _write_metric_to_resource(self, resource, metrics_data, m):
+        self._write_measurement_to_resource(resource, metrics_data.as_dict(), m)
+
+    def _write_measurement_to_resource(self, resource, metrics_data, m):
         resource_metrics = resource.setdefault(get_annotation_prefix('metrics'), {})
         resource_metrics[self._get_metrics_cache_key()] = {
-            'metrics_data': metrics_data.as_dict(),
+            'metrics_data': metrics_data,
             'measurement': m,
         }
 
@@ -234,6 +342,18 @@ class MetricFilter(Filter):
             self.filter,
         )
 
+    def _get_metrics_query_key(self):
+        return {'metric': self.metric,
+                'aggregation': self.aggregation,
+                'timeframe': self.timeframe,
+                'interval': self.data.get('interval', self.DEFAULT_INTERVAL),
+                'filter': self.filter}
+
+    def _get_resource_cache_key(self, resource):
+        rid = self.get_resource_id(resource)
+        return (ResourceIdParser.get_subscription_id(rid),
+                "%s %s" % (rid.lower(), self.get_filter(resource)))
+
     def _get_cached_metric_data(self, resource):
         metrics = resource.get(get_annotation_prefix('metrics'))
         if not metrics:
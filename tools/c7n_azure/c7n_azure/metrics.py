@@ -0,0 +1,219 @@
+# Copyright 2020 Microsoft Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Azure Monitor metric retrieval.
+
+Metrics of many resources of one subscription, type and region are
+queried together with Azure Monitor's multi resource metrics api,
+requests are bounded by a concurrency limit that backs off when
+throttled, and measurements are cached on disk so that policies of a
+run filtering on the same metric share them.
+"""
+import logging
+import os
+import threading
+import time
+
+import isodate
+from azure.mgmt.monitor.models import ErrorResponseException
+from msrest.exceptions import HttpOperationError
+
+from c7n.cache import NullCache, ShardedFileCache
+
+log = logging.getLogger('custodian.azure.metrics')
+
+# The api version introducing subscription scoped, multi resource metric queries.
+BATCH_API_VERSION = '2021-05-01'
+RESOURCE_ID_DIMENSION = 'Microsoft.ResourceId'
+METRICS_CACHE_DIR = 'azure-metrics'
+
+# Serializes metrics cache saves of the process's policies.
+CACHE_LOCK = threading.Lock()
+
+
+def is_throttled(error):
+    response = getattr(error, 'response', None)
+    return response is not None and response.status_code == 429
+
+
+class AdaptiveLimit:
+    """Bound the number of concurrent requests, backing off when throttled.
+
+    The limit halves each time a request is throttled, and grows by one
+    after as many consecutive successes as the current limit, up to the
+    maximum. Throttled requests are retried after a delay.
+    """
+
+    attempts = 3
+    backoff = 2
+
+    def __init__(self, maximum, initial=None):
+        self.maximum = maximum
+        self.limit = min(initial or maximum, maximum)
+        self.active = 0
+        self.successes = 0
+        self.cond = threading.Condition()
+
+    def __enter__(self):
+        with self.cond:
+            while self.active >= self.limit:
+                self.cond.wait()
+            self.active += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify()
+
+    def throttled(self):
+        with self.cond:
+            self.limit = max(1, self.limit // 2)
+            self.successes = 0
+        log.debug("Throttled, reducing metric request concurrency to %d", self.limit)
+
+    def succeeded(self):
+        with self.cond:
+            self.successes += 1
+            if self.successes >= self.limit and self.limit < self.maximum:
+                self.limit += 1
+                self.successes = 0
+                self.cond.notify()
+
+    def call(self, func, *args, **kw):
+        for attempt in range(1, self.attempts + 1):
+            with self:
+                try:
+                    result = func(*args, **kw)
+                except HttpOperationError as e:
+                    if not is_throttled(e) or attempt == self.attempts:
+                        raise
+                    self.throttled()
+                else:
+                    self.succeeded()
+                    return result
+            time.sleep(self.backoff * attempt)
+
+
+def get_metrics_cache(config):
+    """Get the cache of metric measurements for a run's configuration.
+
+    Measurements are stored in a directory alongside the run's cache, and
+    are not cached when the run's cache is disabled.
+    """
+    path = getattr(config, 'metrics_cache', None)
+    if not path or path == 'memory' or not getattr(config, 'cache_period', None):
+        return NullCache(config)
+    path = os.path.expanduser(os.path.expandvars(path))
+    if not (path.endswith(('/', os.sep)) or os.path.isdir(path)):
+        path = os.path.dirname(path)
+    return ShardedFileCache(config.copy(cache=os.path.join(path, METRICS_CACHE_DIR)))
+
+
+class MetricsCache:
+    """Measurements of a metric query, by resource.
+
+    Measurements of a subscription are stored together under the query's
+    key, and each expires individually after the cache period.
+    """
+
+    def __init__(self, config, query_key):
+        self.config = config
+        self.cache = get_metrics_cache(config)
+        self.period = (getattr(config, 'cache_period', None) or 0) * 60
+        self.query_key = query_key
+        self.entries = {}
+        self.updates = {}
+
+    def get_key(self, subscription_id):
+        return dict(self.query_key, subscription=subscription_id)
+
+    def get(self, subscription_id, key):
+        if not self.period:
+            return None
+        if subscription_id not in self.entries:
+            self.entries[subscription_id] = (
+                self.cache.load() and self.cache.get(self.get_key(subscription_id)) or {})
+        entry = self.entries[subscription_id].get(key)
+        if entry is None or time.time() - entry['time'] > self.period:
+            return None
+        return entry['data']
+
+    def set(self, subscription_id, key, data):
+        if self.period:
+            self.updates.setdefault(subscription_id, {})[key] = {
+                'time': time.time(), 'data': data}
+
+    def save(self):
+        if not self.updates:
+            return
+        with CACHE_LOCK:
+            # entries saved by other policies since ours were loaded are
+            # merged, reading them again right before saving.
+            cache = get_metrics_cache(self.config)
+            for subscription_id, updates in self.updates.items():
+                key = self.get_key(subscription_id)
+                entries = cache.load() and cache.get(key) or {}
+                now = time.time()
+                entries = {k: e for k, e in entries.items() if now - e['time'] <= self.period}
+                entries.update(updates)
+                self.cache.save(key, entries)
+                self.entries[subscription_id] = entries
+        self.updates = {}
+
+
+def supports_metrics_batch(client):
+    """Check the monitor client exposes what batch queries are built with.
+
+    Batch queries use the client's service client and deserializer, which
+    aren't part of its public api, other clients query each resource.
+    """
+    service_client = getattr(client, '_client', None)
+    return (all(hasattr(service_client, a) for a in ('format_url', 'get', 'send')) and
+            hasattr(getattr(client, 'metrics', None), '_deserialize'))
+
+
+def list_metrics_batch(client, subscription_id, region, namespace, resource_ids,
+                       timespan, interval, metricnames, aggregation):
+    """Query a metric of resources of one type and region of a subscription.
+
+    Returns the metrics response, with a time series per resource having
+    data, identified by its resource id dimension.
+    """
+    operations = client.metrics
+    service_client = client._client
+    url = service_client.format_url(
+        '/subscriptions/{subscriptionId}/providers/Microsoft.Insights/metrics',
+        subscriptionId=subscription_id)
+    params = {
+        'api-version': BATCH_API_VERSION,
+        'region': region,
+        'metricnamespace': namespace,
+        'metricnames': metricnames,
+        'timespan': timespan,
+        'interval': isodate.duration_isoformat(interval),
+        'aggregation': aggregation,
+        'top': len(resource_ids),
+        '$filter': ' or '.join(
+            "%s eq '%s'" % (RESOURCE_ID_DIMENSION, rid) for rid in resource_ids)}
+    request = service_client.get(url, params, {'Accept': 'application/json'})
+    response = service_client.send(request, stream=False)
+    if response.status_code != 200:
+        raise ErrorResponseException(operations._deserialize, response)
+    return operations._deserialize('Response', response)
+
+
+def get_series_resource_id(timeseries):
+    for m in timeseries.metadatavalues or ():
+        if m.name and (m.name.value or '').lower() == RESOURCE_ID_DIMENSION.lower():
+            return m.value
@@ -34,6 +34,11 @@ class Azure(Provider):
         if options['account_id'] is None:
             session = local_session(self.get_session_factory(options))
             options['account_id'] = session.get_subscription_id()
+        # Resources are cached in memory, as their cache keys aren't specific to
+        # a subscription, metrics are keyed by resource id and cached alongside
+        # the configured cache.
+        if options['cache'] != 'memory':
+            options['metrics_cache'] = options['cache']
         options['cache'] = 'memory'
         return options
 
@@ -13,6 +13,9 @@
 # limitations under the License.
 
 import logging
+import re
+import threading
+import time
 try:
     from collections.abc import Iterable
 except ImportError:
@@ -20,17 +23,18 @@ except ImportError:
 
 from c7n_azure import constants
 from c7n_azure.actions.logic_app import LogicAppAction
-from azure.mgmt.resourcegraph.models import QueryRequest
+from azure.mgmt.resourcegraph.models import QueryRequest, QueryRequestOptions
 from c7n_azure.actions.notify import Notify
 from c7n_azure.filters import ParentFilter
 from c7n_azure.provider import resources
+from c7n_azure.utils import ThreadHelper
 
 from c7n.actions import ActionRegistry
 from c7n.exceptions import PolicyValidationError
-from c7n.filters import FilterRegistry
+from c7n.filters import FilterRegistry, ValueFilter
 from c7n.manager import ResourceManager
 from c7n.query import sources, MaxResourceLimit
-from c7n.utils import local_session
+from c7n.utils import chunks, local_session
 
 log = logging.getLogger('custodian.azure.query')
 
@@ -98,6 +102,40 @@ class DescribeSource:
 
 @sources.register('resource-graph')
 class ResourceGraphSource:
+    """Query resources with Azure Resource Graph.
+
+    Results are paged with skip tokens, and simple value filters of the
+    policy are pushed down into the query, which projects only the
+    columns of an ARM resource document and those the filters reference.
+    The client side filters still apply, so pushed down conditions only
+    need to select a superset of the matching resources.
+
+    When the `resource_graph_subscriptions` option lists subscriptions, as
+    c7n-org does for a batch of subscriptions run by one worker, they are
+    queried together, and the results of the others held for their own
+    executions of the policy in this process, for up to `batch_ttl`
+    seconds.
+    """
+
+    page_size = 1000
+    # the resource graph api's limit on subscriptions per query
+    batch_size = 1000
+    batch_ttl = 15 * 60
+
+    # columns of an arm resource document
+    columns = (
+        'id', 'name', 'type', 'kind', 'location', 'tags', 'sku', 'plan',
+        'identity', 'zones', 'managedBy', 'properties', 'subscriptionId')
+    # additional columns filters can reference
+    extra_columns = ('resourceGroup', 'tenantId', 'extendedLocation')
+    # columns with string values
+    string_columns = (
+        'id', 'name', 'type', 'kind', 'location', 'managedBy',
+        'subscriptionId', 'resourceGroup', 'tenantId')
+
+    # batched results by (query, subscription id)
+    batch_results = {}
+    batch_lock = threading.Lock()
 
     def __init__(self, manager):
         self.manager = manager
@@ -109,25 +147,142 @@ class ResourceGraphSource:
                 % self.manager.data['resource'])
 
     def get_resources(self, _):
-        log.warning('The Azure Resource Graph source '
-                    'should not be used in production scenarios at this time.')
+        query = self.get_query()
+        if not self.manager.config.get('resource_graph_subscriptions'):
+            return self.query_resources(query)
+        return self.get_batch_resources(query)
+
+    def get_batch_resources(self, query):
+        """Query the resources of the batch's subscriptions, split per subscription."""
+        subscription_id = self.manager.get_session().get_subscription_id().lower()
+        with self.batch_lock:
+            t = time.time()
+            for k in [k for k, v in self.batch_results.items() if t - v[0] > self.batch_ttl]:
+                del self.batch_results[k]
+            cached = self.batch_results.pop((query, subscription_id), None)
+            if cached:
+                log.debug("Using batched resource graph results for %s", subscription_id)
+                return cached[1]
+
+            subscriptions = [subscription_id]
+            for s in self.manager.config['resource_graph_subscriptions']:
+                s = s.lower()
+                if s not in subscriptions:
+                    subscriptions.append(s)
+            results = {s: [] for s in subscriptions}
+            for batch in chunks(subscriptions, self.batch_size):
+                for r in self.query_resources(query, batch):
+                    results.setdefault(r['subscriptionId'].lower(), []).append(r)
+
+            resources = results.pop(subscription_id)
+            for s, s_resources in results.items():
+                self.batch_results[(query, s)] = (t, s_resources)
+        return resources
 
+    def get_population_count(self, count):
+        """The number of resources of the type, before any pushed down filter."""
+        if not self.get_filter_conditions():
+            return count
+        return self.query_resources(self.get_count_query())[0]['Count']
+
+    def query_resources(self, query, subscriptions=None):
+        """Page through the results of a query.
+
+        :param subscriptions: the subscriptions to query, by default the session's.
+        """
         session = self.manager.get_session()
         client = session.client('azure.mgmt.resourcegraph.ResourceGraphClient')
-
+        subscriptions = subscriptions or [session.get_subscription_id()]
+        results = []
+        skip_token = None
+        while True:
+            options = QueryRequestOptions(
+                top=self.page_size, skip_token=skip_token, result_format='objectArray')
+            res = client.resources(
+                QueryRequest(query=query, subscriptions=subscriptions, options=options))
+            results.extend(res.data)
+            skip_token = res.skip_token
+            if not skip_token:
+                return results
+
+    def get_type_clauses(self):
+        clauses = ['Resources']
         # empty scope will return all resource
-        query_scope = ""
         if self.manager.resource_type.resource_type != 'armresource':
-            query_scope = "where type =~ '%s'" % self.manager.resource_type.resource_type
-
-        query = QueryRequest(
-            query=query_scope,
-            subscriptions=[session.get_subscription_id()]
-        )
-        res = client.resources(query)
-        cols = [c['name'] for c in res.data['columns']]
-        data = [dict(zip(cols, r)) for r in res.data['rows']]
-        return data
+            clauses.append("where type =~ %s" % kql_literal(
+                self.manager.resource_type.resource_type))
+        return clauses
+
+    def get_query(self):
+        clauses = self.get_type_clauses()
+        clauses.extend("where %s" % c for c in self.get_filter_conditions())
+
+        columns = list(self.columns)
+        for f in self.manager.filters:
+            column = self.get_filter_column(f)
+            if column in self.extra_columns and column not in columns:
+                columns.append(column)
+        clauses.append("project %s" % ", ".join(columns))
+        return "\n| ".join(clauses)
+
+    def get_count_query(self):
+        return "\n| ".join(self.get_type_clauses() + ['count'])
+
+    def get_filter_conditions(self):
+        return [c for c in map(self.get_filter_condition, self.manager.filters) if c]
+
+    def get_filter_column(self, f):
+        if not isinstance(f, ValueFilter):
+            return None
+        key = f.data.get('key', len(f.data) == 1 and list(f.data)[0] or None)
+        if not isinstance(key, str):
+            return None
+        return key.split('.', 1)[0]
+
+    def get_filter_condition(self, f):
+        """Translate a value filter into an equivalent or looser kql condition.
+
+        Only equality and membership tests of string values on simple
+        keys are translated, anything else returns None.
+        """
+        if not isinstance(f, ValueFilter) or f.type != 'value':
+            return None
+        data = f.data
+        if len(data) == 1 and 'key' not in data and 'type' not in data:
+            # shorthand {key: value} filters
+            data = dict(zip(('key', 'value'), list(data.items())[0]))
+        if (data.get('value_type') or data.get('value_from') or data.get('value_regex') or
+                data.get('value_path')):
+            return None
+        key, value, op = data.get('key'), data.get('value'), data.get('op', 'eq')
+
+        path = isinstance(key, str) and key.split('.') or ()
+        if (not path or path[0] not in self.columns + self.extra_columns or
+                not all(KQL_IDENTIFIER.match(p) for p in path)):
+            return None
+        expr = path[0]
+        if len(path) > 1 or path[0] not in self.string_columns:
+            expr = "tostring(%s%s)" % (path[0], ''.join("['%s']" % p for p in path[1:]))
+
+        if op in ('in', 'ni', 'not-in'):
+            if (not isinstance(value, list) or not value or
+                    not all(isinstance(v, str) and v for v in value)):
+                return None
+            literals = ", ".join(kql_literal(v) for v in value)
+            # in~ is case insensitive, and so looser than the filter, while
+            # a negated test must match exactly.
+            if op == 'in':
+                return "%s in~ (%s)" % (expr, literals)
+            return "%s !in (%s)" % (expr, literals)
+
+        if (not isinstance(value, str) or not value or
+                value in ('absent', 'present', 'not-null', 'empty')):
+            return None
+        if op in ('eq', 'equal'):
+            return "%s =~ %s" % (expr, kql_literal(value))
+        if op in ('ne', 'not-equal'):
+            return "%s != %s" % (expr, kql_literal(value))
+        return None
 
     def get_permissions(self):
         return ()
@@ -136,39 +291,82 @@ class ResourceGraphSource:
         return resources
 
 
+KQL_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def kql_literal(value):
+    return "'%s'" % value.replace('\\', '\\\\').replace("'", "\\'")
+
+
 class ChildResourceQuery(ResourceQuery):
     """A resource query for resources that must be queried with parent information.
     Several resource types can only be queried in the context of their
     parents identifiers. ie. SQL and Cosmos databases
+
+    Parents' children are enumerated concurrently. Within a run, the
+    parent resources are fetched once and shared by sibling child
+    resource types.
     """
 
+    max_workers = 10
+
     def filter(self, resource_manager, **params):
         """Query a set of resources."""
         m = self.resolve(resource_manager.resource_type)  # type: ChildTypeInfo
 
         parents = resource_manager.get_parent_manager()
+        related = getattr(resource_manager.ctx, 'related', None)
+        if related is not None:
+            parent_resources = related.resources(parents)
+        else:
+            parent_resources = parents.resources()
 
         # Have to query separately for each parent's children.
+        parent_key = parents.resource_type.id
         results = []
-        for parent in parents.resources():
-            try:
-                subset = resource_manager.enumerate_resources(parent, m, **params)
+        for parent, subset in self.enumerate_children(
+                resource_manager, parent_resources, parent_key, m, params):
+            if subset:
+                # If required, append parent resource ID to all child resources
+                if m.annotate_parent:
+                    for r in subset:
+                        r[m.parent_key] = parent[parent_key]
 
-                if subset:
-                    # If required, append parent resource ID to all child resources
-                    if m.annotate_parent:
-                        for r in subset:
-                            r[m.parent_key] = parent[parents.resource_type.id]
+                results.extend(subset)
 
-                    results.extend(subset)
+        return results
 
-            except Exception as e:
-                log.warning('Child enumeration failed for {0}. {1}'
-                            .format(parent[parents.resource_type.id], e))
-                if m.raise_on_exception:
-                    raise e
+    def enumerate_children(self, resource_manager, parents, parent_key, type_info, params):
+        """Yield each parent and its children, in parent order."""
+        if ThreadHelper.disable_multi_threading or len(parents) < 2:
+            for parent in parents:
+                yield parent, self.enumerate_parent(
+                    resource_manager, parent, parent_key, type_info, params)
+            return
 
-        return results
+        # share the session with the workers, rather than each authenticating
+        resource_manager.get_session()
+        with resource_manager.executor_factory(max_workers=self.max_workers) as w:
+            futures = [
+                w.submit(self.enumerate_parent,
+                         resource_manager, parent, parent_key, type_info, params)
+                for parent in parents]
+            try:
+                for parent, f in zip(parents, futures):
+                    yield parent, f.result()
+            finally:
+                for f in futures:
+                    f.cancel()
+
+    def enumerate_parent(self, resource_manager, parent, parent_key, type_info, params):
+        parent_id = parent[parent_key]
+        try:
+            return resource_manager.enumerate_resources(parent, type_info, **params)
+        except Exception as e:
+            log.warning('Child enumeration failed for {0}. {1}'.format(parent_id, e))
+            if type_info.raise_on_exception:
+                raise e
+        return None
 
 
 @sources.register('describe-child-azure')
@@ -257,9 +455,13 @@ class QueryResourceManager(ResourceManager, metaclass=QueryMeta):
         return self.get_session().client(service)
 
     def get_cache_key(self, query):
-        return {'source_type': self.source_type,
-                'query': query,
-                'resource': str(self.__class__.__name__)}
+        key = {'source_type': self.source_type,
+               'query': query,
+               'resource': str(self.__class__.__name__)}
+        # sources pushing filters down select a subset of the resources
+        if isinstance(self.source, ResourceGraphSource):
+            key['source_query'] = self.source.get_query()
+        return key
 
     @classmethod
     def get_model(cls):
@@ -298,6 +500,11 @@ class QueryResourceManager(ResourceManager, metaclass=QueryMeta):
         """
         p = self.ctx.policy
         max_resource_limits = MaxResourceLimit(p, selection_count, population_count)
+        if max_resource_limits.percent and isinstance(self.source, ResourceGraphSource):
+            # the population of a query with pushed down filters is a
+            # subset, percentages are of all resources of the type.
+            max_resource_limits = MaxResourceLimit(
+                p, selection_count, self.source.get_population_count(population_count))
         return max_resource_limits.check_resource_limits()
 
     def get_resources(self, resource_ids, **params):
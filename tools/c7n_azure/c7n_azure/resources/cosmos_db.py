@@ -255,6 +255,9 @@ class CosmosDBDatabaseMetricFilter(MetricFilter):
                 timeframe: 72
 
     """
+    # metrics are of the parent account, filtered to the resource
+    batch_metrics = False
+
     def get_resource_id(self, resource):
         return resource['c7n:parent-id']
 
@@ -342,6 +345,9 @@ class CosmosDBCollectionMetricFilter(MetricFilter):
                 timeframe: 72
 
     """
+    # metrics are of the parent account, filtered to the resource
+    batch_metrics = False
+
     def get_resource_id(self, resource):
         return resource['c7n:parent-id']
 
@@ -80,3 +80,112 @@ class ActionsAutotagBaseTest(BaseTest):
 
         client_mock.activity_logs.list.assert_called_once()
         self.assertEqual(result, self.events[-1])
+
+    def test_prefetch_first_events(self):
+        vm_ids = [self.vm_id + str(i) for i in range(3)]
+        # newest first, as returned by the activity log
+        events = []
+        for i, rid in enumerate([vm_ids[0], vm_ids[1].upper(), vm_ids[0], vm_ids[2]]):
+            event = EventData.from_dict(dict(self.event_dict, resourceId=rid))
+            event.id = event.id + str(i)
+            events.append(event)
+        events[3].operation_name.value = 'Microsoft.Compute/virtualMachines/delete'
+        disk_id = self.vm_id.replace('virtualMachines', 'disks')
+        events.append(EventData.from_dict(dict(
+            self.event_dict, resourceId=disk_id,
+            operationName={'value': 'Microsoft.Compute/disks/write'})))
+
+        client_mock = Mock()
+        client_mock.activity_logs.list.return_value = events
+
+        manager = Mock()
+        manager.type = 'vm'
+        manager.get_client.return_value = client_mock
+
+        resources = []
+        for rid in vm_ids + [self.vm_id + 'tagged']:
+            resource = tools.get_resource({'test': 'value'} if 'tagged' in rid else {})
+            resource['id'] = rid
+            resources.append(resource)
+        disk = tools.get_resource({})
+        disk.update(id=disk_id, type='Microsoft.Compute/disks')
+        resources.append(disk)
+
+        base = AutoTagDate(data={'tag': 'test', 'prefetch-min': 2}, manager=manager)
+        base._prefetch_first_events(resources)
+        base._prepare_processing()
+
+        # a single query of the resources' provider
+        client_mock.activity_logs.list.assert_called_once()
+        query_filter = client_mock.activity_logs.list.call_args[1]['filter']
+        self.assertIn("resourceProvider eq 'Microsoft.Compute'", query_filter)
+        self.assertNotIn('resourceType', query_filter)
+        self.assertNotIn('resourceUri', query_filter)
+        self.assertEqual(base._get_first_event(disk), events[4])
+
+        self.assertEqual(base._get_first_event(resources[0]), events[2])
+        self.assertEqual(base._get_first_event(resources[1]), events[1])
+        self.assertIsNone(base._get_first_event(resources[2]))
+        self.assertNotIn('c7n:first_iam_event', resources[3])
+        client_mock.activity_logs.list.assert_called_once()
+
+    def test_prefetch_first_events_resource_group(self):
+        events = []
+        for i, name in enumerate(['test_rg', 'other_rg', 'TEST_RG']):
+            event = EventData.from_dict(dict(
+                self.event_dict, resourceGroupName=name, operationName={
+                    'value': 'Microsoft.Resources/subscriptions/resourcegroups/write'}))
+            event.id = event.id + str(i)
+            events.append(event)
+
+        client_mock = Mock()
+        client_mock.activity_logs.list.return_value = events
+
+        manager = Mock()
+        manager.type = 'resourcegroup'
+        manager.get_client.return_value = client_mock
+
+        resource_groups = [tools.get_resource_group_resource({}) for i in range(2)]
+        resource_groups[1]['name'] = 'other_rg'
+
+        base = AutoTagDate(data={'tag': 'test', 'prefetch-min': 2}, manager=manager)
+        base._prefetch_first_events(resource_groups)
+
+        client_mock.activity_logs.list.assert_called_once()
+        self.assertEqual(resource_groups[0]['c7n:first_iam_event'], events[2])
+        self.assertEqual(resource_groups[1]['c7n:first_iam_event'], events[1])
+
+    def test_prefetch_first_events_error(self):
+        client_mock = Mock()
+        client_mock.activity_logs.list.side_effect = [
+            ValueError('throttled'), [EventData.from_dict(self.event_dict)]]
+
+        manager = Mock()
+        manager.type = 'vm'
+        manager.get_client.return_value = client_mock
+
+        resources = []
+        for i in range(2):
+            resource = tools.get_resource({})
+            resource['id'] = self.vm_id + str(i)
+            resources.append(resource)
+
+        base = AutoTagDate(data={'tag': 'test', 'prefetch-min': 2}, manager=manager)
+        base._prefetch_first_events(resources)
+        base._prepare_processing()
+
+        # resources are left to be queried individually
+        self.assertNotIn('c7n:first_iam_event', resources[0])
+        base._get_first_event(resources[0])
+        self.assertIn(
+            'resourceUri', client_mock.activity_logs.list.call_args[1]['filter'])
+
+    def test_prefetch_min(self):
+        client_mock = Mock()
+        manager = Mock()
+        manager.type = 'vm'
+        manager.get_client.return_value = client_mock
+
+        base = AutoTagDate(data={'tag': 'test'}, manager=manager)
+        base._prefetch_first_events([tools.get_resource({}) for i in range(3)])
+        client_mock.activity_logs.list.assert_not_called()
@@ -16,9 +16,11 @@ import logging
 from .azure_common import BaseTest, arm_template
 from .azure_common import cassette_name
 from c7n_azure.session import Session
+from c7n_azure.utils import ThreadHelper
 from mock import mock, patch
 
 from c7n.exceptions import ResourceLimitExceeded
+from c7n.planner import RelatedResources
 from c7n.utils import local_session
 
 
@@ -94,3 +96,55 @@ class QueryResourceManagerTest(BaseTest):
         return local_session(Session) \
             .client('azure.mgmt.resource.ResourceManagementClient') \
             .DEFAULT_API_VERSION.replace("-", "_")
+
+
+class ChildResourceQueryTest(BaseTest):
+
+    def get_children(self, parents, failures=()):
+        p = self.load_policy({'name': 'sql-databases', 'resource': 'azure.sql-database'})
+        p.ctx.related = RelatedResources()
+        manager = p.resource_manager
+        parent_manager = manager.get_parent_manager()
+        fetches = []
+
+        def resources():
+            fetches.append(True)
+            return [dict(r) for r in parents]
+
+        def enumerate_resources(parent, type_info, **params):
+            if parent['id'] in failures:
+                raise ValueError(parent['id'])
+            return [{'id': '%s/databases/%d' % (parent['id'], i)} for i in range(2)]
+
+        self.patch(ThreadHelper, 'disable_multi_threading', False)
+        self.patch(parent_manager, 'resources', resources)
+        self.patch(manager, 'enumerate_resources', enumerate_resources)
+        self.patch(manager, '_session', mock.MagicMock())
+        return manager, fetches
+
+    def test_child_enumeration_parallel(self):
+        parents = [{'id': 'server-%d' % i} for i in range(5)]
+        manager, fetches = self.get_children(parents)
+        children = manager.source.get_resources(None)
+        self.assertEqual(
+            [(r['id'], r['c7n:parent-id']) for r in children[:3]],
+            [('server-0/databases/0', 'server-0'),
+             ('server-0/databases/1', 'server-0'),
+             ('server-1/databases/0', 'server-1')])
+        self.assertEqual(len(children), 10)
+
+        # sibling child types share the run's parent snapshot
+        manager.source.get_resources(None)
+        self.assertEqual(len(fetches), 1)
+
+    def test_child_enumeration_errors(self):
+        parents = [{'id': 'server-%d' % i} for i in range(4)]
+        manager, fetches = self.get_children(parents, failures=('server-1',))
+        with self.assertRaises(ValueError):
+            manager.source.get_resources(None)
+
+        self.patch(manager.resource_type, 'raise_on_exception', False)
+        children = manager.source.get_resources(None)
+        self.assertEqual(
+            sorted({r['c7n:parent-id'] for r in children}),
+            ['server-0', 'server-2', 'server-3'])
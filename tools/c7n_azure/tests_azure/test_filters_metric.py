@@ -0,0 +1,176 @@
+# Copyright 2020 Microsoft Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from azure.mgmt.monitor.models import (LocalizableString, MetadataValue, Metric, MetricValue,
+                                       Response, TimeSeriesElement)
+from mock import Mock, patch
+from msrest.exceptions import HttpOperationError
+from requests import Response as HttpResponse
+
+from .azure_common import BaseTest
+from c7n.config import Config
+from c7n_azure.filters import MetricFilter
+from c7n_azure.metrics import AdaptiveLimit, MetricsCache
+
+SUBSCRIPTION_ID = 'ea42f556-5106-4743-99b0-c129bfa71a47'
+
+
+class MetricFilterTest(BaseTest):
+
+    def test_batch_metrics(self):
+        resources = [self._get_resource('vm%d' % i) for i in range(6)]
+        f = self._get_filter({'op': 'gt', 'threshold': 50})
+        f.manager.get_client.return_value.metrics.list.return_value = self._get_response(
+            [(None, [70])])
+
+        with patch('c7n_azure.filters.list_metrics_batch') as list_batch:
+            list_batch.return_value = self._get_response(
+                [(r['id'].upper(), [i * 20]) for i, r in enumerate(resources[:5])])
+            result = f.process(resources)
+
+        list_batch.assert_called_once()
+        args, kw = list_batch.call_args
+        self.assertEqual(
+            args[1:5],
+            (SUBSCRIPTION_ID, 'eastus', 'microsoft.compute/virtualmachines',
+             [r['id'] for r in resources]))
+        self.assertEqual(kw['metricnames'], 'Percentage CPU')
+
+        # the resource without data in the batch is queried individually
+        metrics_list = f.manager.get_client.return_value.metrics.list
+        metrics_list.assert_called_once()
+        self.assertEqual(metrics_list.call_args[0][0], resources[5]['id'])
+        self.assertEqual([r['name'] for r in result], ['vm3', 'vm4', 'vm5'])
+        self.assertEqual(
+            resources[3]['c7n:metrics'][f._get_metrics_cache_key()]['measurement'], [60])
+
+    def test_batch_metrics_fallback(self):
+        resources = [self._get_resource('vm%d' % i) for i in range(6)]
+        f = self._get_filter({'op': 'gt', 'threshold': 50})
+        metrics_list = f.manager.get_client.return_value.metrics.list
+        metrics_list.return_value = self._get_response([(None, [70])])
+
+        with patch('c7n_azure.filters.list_metrics_batch') as list_batch:
+            list_batch.side_effect = self._get_error(400)
+            result = f.process(resources)
+
+        self.assertEqual(metrics_list.call_count, 6)
+        self.assertEqual(len(result), 6)
+
+    def test_batch_metrics_unsupported_client(self):
+        resources = [self._get_resource('vm%d' % i) for i in range(6)]
+        f = self._get_filter({'op': 'gt', 'threshold': 50})
+        client = f.manager.get_client.return_value
+        del client._client
+        client.metrics.list.return_value = self._get_response([(None, [70])])
+
+        with patch('c7n_azure.filters.list_metrics_batch') as list_batch:
+            result = f.process(resources)
+
+        list_batch.assert_not_called()
+        self.assertEqual(client.metrics.list.call_count, 6)
+        self.assertEqual(len(result), 6)
+
+    def test_metrics_cache_merge(self):
+        config = Config.empty(metrics_cache=self.get_temp_dir(), cache_period=15)
+        query_key = {'metric': 'Percentage CPU'}
+        c1 = MetricsCache(config, query_key)
+        c2 = MetricsCache(config, query_key)
+        self.assertIsNone(c1.get(SUBSCRIPTION_ID, 'vm0'))
+        self.assertIsNone(c2.get(SUBSCRIPTION_ID, 'vm1'))
+        c1.set(SUBSCRIPTION_ID, 'vm0', [1])
+        c1.save()
+        c2.set(SUBSCRIPTION_ID, 'vm1', [2])
+        c2.save()
+
+        # the later save keeps the entries of the earlier one
+        c3 = MetricsCache(config, query_key)
+        self.assertEqual(c3.get(SUBSCRIPTION_ID, 'vm0'), [1])
+        self.assertEqual(c3.get(SUBSCRIPTION_ID, 'vm1'), [2])
+
+    def test_metrics_cache(self):
+        resources = [self._get_resource('vm%d' % i) for i in range(2)]
+        config = Config.empty(metrics_cache=self.get_temp_dir(), cache_period=15)
+        f = self._get_filter({'op': 'gt', 'threshold': 50}, config)
+        metrics_list = f.manager.get_client.return_value.metrics.list
+        metrics_list.return_value = self._get_response([(None, [70])])
+        self.assertEqual(len(f.process(resources)), 2)
+        self.assertEqual(metrics_list.call_count, 2)
+
+        # a sibling policy filtering on the same metric reuses the measurements
+        resources = [self._get_resource('vm%d' % i) for i in range(3)]
+        f = self._get_filter({'op': 'lt', 'threshold': 50}, config)
+        metrics_list = f.manager.get_client.return_value.metrics.list
+        metrics_list.return_value = self._get_response([(None, [30])])
+        self.assertEqual([r['name'] for r in f.process(resources)], ['vm2'])
+        metrics_list.assert_called_once()
+
+        # another aggregation is queried
+        f = self._get_filter(
+            {'op': 'lt', 'threshold': 50, 'aggregation': 'maximum'}, config)
+        metrics_list = f.manager.get_client.return_value.metrics.list
+        metrics_list.return_value = self._get_response([(None, [70])])
+        self.assertEqual(f.process([self._get_resource('vm0')]), [])
+        metrics_list.assert_called_once()
+
+    def test_throttled(self):
+        self.patch(AdaptiveLimit, 'backoff', 0)
+        f = self._get_filter({'op': 'gt', 'threshold': 50})
+        metrics_list = f.manager.get_client.return_value.metrics.list
+        metrics_list.side_effect = [
+            self._get_error(429), self._get_error(429), self._get_response([(None, [70])])]
+
+        result = f.process([self._get_resource('vm0')])
+        self.assertEqual(len(result), 1)
+        self.assertEqual(metrics_list.call_count, 3)
+        # backed off from the initial concurrency
+        self.assertEqual(f.limit.limit, 2)
+
+    def test_adaptive_limit(self):
+        limit = AdaptiveLimit(4, 2)
+        limit.throttled()
+        self.assertEqual(limit.limit, 1)
+        for i in range(1 + 2 + 3):
+            limit.succeeded()
+        self.assertEqual(limit.limit, 4)
+
+    def _get_filter(self, data, config=None):
+        manager = Mock()
+        manager.config = config or Config.empty()
+        data = dict({'type': 'metric', 'metric': 'Percentage CPU'}, **data)
+        return MetricFilter(data=data, manager=manager)
+
+    def _get_resource(self, name):
+        return {'id': '/subscriptions/%s/resourceGroups/test_vm/providers/'
+                      'Microsoft.Compute/virtualMachines/%s' % (SUBSCRIPTION_ID, name),
+                'name': name,
+                'location': 'eastus'}
+
+    def _get_error(self, status_code):
+        response = Mock(spec=HttpResponse)
+        response.status_code = status_code
+        response.text = 'error'
+        return HttpOperationError(Mock(), response)
+
+    def _get_response(self, series):
+        timeseries = []
+        for rid, values in series:
+            metadata = rid and [MetadataValue(
+                name=LocalizableString(value='Microsoft.ResourceId'), value=rid)] or None
+            timeseries.append(TimeSeriesElement(
+                metadatavalues=metadata,
+                data=[MetricValue(time_stamp=None, average=v, maximum=v) for v in values]))
+        return Response(
+            timespan='', value=[Metric(
+                id='', type='Microsoft.Insights/metrics', unit='Percent',
+                name=LocalizableString(value='Percentage CPU'), timeseries=timeseries)])
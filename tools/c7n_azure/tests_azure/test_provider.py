@@ -27,3 +27,9 @@ class ProviderTest(BaseTest):
 
         session = azure.get_session_factory(options)()
         self.assertEqual(sample_account_id, session.get_subscription_id())
+
+    def test_initialize_metrics_cache(self):
+        options = Config.empty(account_id=DEFAULT_SUBSCRIPTION_ID, cache='~/.cache/c7n/')
+        Azure().initialize(options)
+        self.assertEqual(options['cache'], 'memory')
+        self.assertEqual(options['metrics_cache'], '~/.cache/c7n/')
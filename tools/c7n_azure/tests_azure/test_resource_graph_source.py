@@ -16,8 +16,10 @@ from datetime import timedelta
 
 from tests_azure.azure_common import BaseTest, arm_template
 from dateutil.parser import parse
+from mock import MagicMock
 
 from c7n.exceptions import PolicyValidationError
+from c7n_azure.query import ResourceGraphSource as GraphSource
 
 
 class ResourceGraphSource(BaseTest):
@@ -39,6 +41,113 @@ class ResourceGraphSource(BaseTest):
             })
             self.assertTrue(p)
 
+    def test_resource_graph_query_pushdown(self):
+        p = self.load_policy({
+            'name': 'test-azure-storage-graph-query',
+            'resource': 'azure.storage',
+            'source': 'resource-graph',
+            'filters': [
+                {'name': 'cctstorage'},
+                {'type': 'value', 'key': 'properties.provisioningState',
+                 'value': 'Succeeded'},
+                {'type': 'value', 'key': 'location', 'op': 'in',
+                 'value': ['eastus', "west'us"]},
+                {'type': 'value', 'key': 'resourceGroup', 'op': 'ne', 'value': 'test'},
+                {'type': 'value', 'key': 'name', 'op': 'glob', 'value': 'cct*'},
+                {'type': 'value', 'key': 'kind', 'value': 'StorageV2',
+                 'value_type': 'normalize'},
+                {'or': [{'name': 'a'}, {'name': 'b'}]}]
+        })
+        self.assertEqual(
+            p.resource_manager.source.get_query().split('\n'),
+            ["Resources",
+             "| where type =~ 'Microsoft.Storage/storageAccounts'",
+             "| where name =~ 'cctstorage'",
+             "| where tostring(properties['provisioningState']) =~ 'Succeeded'",
+             "| where location in~ ('eastus', 'west\\'us')",
+             "| where resourceGroup != 'test'",
+             "| project id, name, type, kind, location, tags, sku, plan, identity, "
+             "zones, managedBy, properties, subscriptionId, resourceGroup"])
+
+    def test_resource_graph_paging(self):
+        p = self.load_policy({
+            'name': 'test-azure-storage-graph-query',
+            'resource': 'azure.storage',
+            'source': 'resource-graph'})
+        session = MagicMock()
+        session.get_subscription_id.return_value = 'sub-a'
+        client = session.client.return_value
+        client.resources.side_effect = [
+            MagicMock(data=[{'id': 'a1'}, {'id': 'a2'}], skip_token='next'),
+            MagicMock(data=[{'id': 'a3'}], skip_token=None)]
+        p.resource_manager._session = session
+
+        self.assertEqual(
+            [r['id'] for r in p.resource_manager.source.get_resources(None)],
+            ['a1', 'a2', 'a3'])
+        requests = [c[0][0] for c in client.resources.call_args_list]
+        self.assertEqual(requests[0].subscriptions, ['sub-a'])
+        self.assertEqual(requests[1].options.skip_token, 'next')
+        self.assertEqual(requests[1].options.result_format, 'objectArray')
+
+    def test_resource_graph_batch_subscriptions(self):
+        self.patch(GraphSource, 'batch_results', {})
+        session = MagicMock()
+        client = session.client.return_value
+        client.resources.return_value = MagicMock(data=[
+            {'id': 'a1', 'subscriptionId': 'SUB-A'},
+            {'id': 'b1', 'subscriptionId': 'sub-b'},
+            {'id': 'a2', 'subscriptionId': 'sub-a'}], skip_token=None)
+
+        resources = {}
+        for s in ('sub-a', 'sub-b', 'sub-c'):
+            p = self.load_policy({
+                'name': 'test-azure-storage-graph-query',
+                'resource': 'azure.storage',
+                'source': 'resource-graph'},
+                config={'resource_graph_subscriptions': ['sub-a', 'sub-b', 'sub-c']})
+            session.get_subscription_id.return_value = s
+            p.resource_manager._session = session
+            resources[s] = [r['id'] for r in p.resource_manager.source.get_resources(None)]
+
+        # one query for the batch, split per subscription
+        self.assertEqual(resources, {'sub-a': ['a1', 'a2'], 'sub-b': ['b1'], 'sub-c': []})
+        self.assertEqual(client.resources.call_count, 1)
+        self.assertEqual(
+            client.resources.call_args[0][0].subscriptions, ['sub-a', 'sub-b', 'sub-c'])
+        self.assertEqual(GraphSource.batch_results, {})
+
+    def test_resource_graph_cache_key(self):
+        policies = [self.load_policy({
+            'name': 'test-azure-storage-graph-query',
+            'resource': 'azure.storage',
+            'source': 'resource-graph',
+            'filters': [{'name': name}]}) for name in ('a', 'b')]
+        keys = [p.resource_manager.get_cache_key(None) for p in policies]
+        self.assertNotEqual(keys[0], keys[1])
+        self.assertIn("| where name =~ 'a'", keys[0]['source_query'])
+
+    def test_resource_graph_max_resources_percent(self):
+        p = self.load_policy({
+            'name': 'test-azure-storage-graph-query',
+            'resource': 'azure.storage',
+            'source': 'resource-graph',
+            'max-resources-percent': 10,
+            'filters': [{'name': 'a'}]})
+        session = MagicMock()
+        client = session.client.return_value
+        client.resources.return_value = MagicMock(data=[{'Count': 100}], skip_token=None)
+        p.resource_manager._session = session
+
+        # the percentage is of all the storage accounts, not of those
+        # selected by the pushed down filter.
+        p.resource_manager.check_resource_limit(5, 5)
+        self.assertEqual(
+            client.resources.call_args[0][0].query.split('\n'),
+            ["Resources",
+             "| where type =~ 'Microsoft.Storage/storageAccounts'",
+             "| count"])
+
     @arm_template('storage.json')
     def test_resource_graph_and_arm_sources_storage_are_equivalent(self):
         p1 = self.load_policy({
@@ -11,13 +11,19 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import base64
+import json
 import os
 import shutil
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
 import yaml
+from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_MISSED
 from azure.common import AzureHttpError
 from azure.storage.queue.models import QueueMessage
+from dateutil.tz import tzutc
 from mock import ANY, Mock, patch
 
 from ..azure_common import BaseTest
@@ -436,6 +442,116 @@ class ContainerHostTest(BaseTest):
         host.poll_queue()
         self.assertEqual(1, run_policy_mock.call_count)
 
+    @patch('c7n_azure.container_host.host.Host.update_event_subscription')
+    @patch('c7n_azure.container_host.host.Host.prepare_queue_storage')
+    @patch('c7n_azure.container_host.host.Storage')
+    @patch('c7n_azure.container_host.host.BlockingScheduler.start')
+    @patch('c7n_azure.container_host.host.BlockingScheduler.add_job')
+    def test_process_messages(self, add_job_mock, _0, storage_mock, _2, _3):
+        host = Host(DEFAULT_EVENT_QUEUE_ID, DEFAULT_EVENT_QUEUE_NAME, DEFAULT_POLICY_STORAGE)
+        add_job_mock.reset_mock()
+
+        host.policies = {
+            'one': {
+                'policy': ContainerHostTest.get_mock_policy({
+                    'name': 'one',
+                    'mode': {
+                        'type': 'container-event',
+                        'events': ['ResourceGroupWrite', 'VnetWrite']
+                    }
+                })
+            }
+        }
+
+        messages = []
+        for i, rg in enumerate(['rg1', 'rg1', 'RG1', 'rg2']):
+            event = {
+                'id': 'event-%d' % i,
+                'subject': '/subscriptions/ea98974b-5d2a-4d98-a78a-382f3715d07e/'
+                           'resourceGroups/%s' % rg,
+                'data': {'operationName': 'Microsoft.Resources/subscriptions/resourceGroups/write'}
+            }
+            message = QueueMessage()
+            message.id = i
+            message.dequeue_count = 0
+            message.insertion_time = datetime.now(tz=tzutc()) - timedelta(seconds=10)
+            message.content = base64.b64encode(json.dumps(event).encode('utf-8'))
+            messages.append(message)
+
+        invalid = QueueMessage()
+        invalid.id = 4
+        invalid.dequeue_count = 0
+        invalid.content = 'invalid'
+        messages.append(invalid)
+
+        # a single worker, so the first of the duplicate events is processed first
+        with ThreadPoolExecutor(max_workers=1) as w:
+            stats = host.process_messages(w, messages)
+
+        # events for the same resource within the window run policies once
+        self.assertEqual(
+            sorted(c[1]['id'] for c in add_job_mock.call_args_list),
+            ['oneevent-0', 'oneevent-3'])
+
+        # messages failing to process are left to be retried
+        self.assertEqual(
+            sorted(c[1]['message'].id for c in storage_mock.delete_queue_message.call_args_list),
+            [0, 1, 2, 3])
+        self.assertEqual(stats['events'], 5)
+        self.assertEqual(stats['failed'], 1)
+        self.assertGreaterEqual(stats['queue_lag_max'], 10)
+
+        # latency is measured once a policy job finishes
+        self.assertEqual(sorted(host.pending_events), ['oneevent-0', 'oneevent-3'])
+        with patch('c7n_azure.container_host.host.log') as log_mock:
+            host.job_finished(Mock(job_id='oneevent-0', code=EVENT_JOB_EXECUTED))
+            host.job_finished(Mock(job_id='oneevent-3', code=EVENT_JOB_MISSED))
+        self.assertEqual(log_mock.info.call_count, 1)
+        self.assertGreaterEqual(
+            log_mock.info.call_args[1]['extra']['properties']['event_latency'], 10)
+        self.assertEqual(host.pending_events, {})
+
+    @patch('c7n_azure.container_host.host.Host.update_event_subscription')
+    @patch('c7n_azure.container_host.host.Host.prepare_queue_storage')
+    @patch('c7n_azure.container_host.host.Storage')
+    @patch('c7n_azure.container_host.host.BlockingScheduler.start')
+    @patch('c7n_azure.container_host.host.BlockingScheduler.add_job')
+    def test_run_policy_for_event_schedule_error(self, add_job_mock, _0, _1, _2, _3):
+        host = Host(DEFAULT_EVENT_QUEUE_ID, DEFAULT_EVENT_QUEUE_NAME, DEFAULT_POLICY_STORAGE)
+        add_job_mock.reset_mock()
+        host.policies = {
+            'one': {
+                'policy': ContainerHostTest.get_mock_policy({
+                    'name': 'one',
+                    'mode': {
+                        'type': 'container-event',
+                        'events': ['ResourceGroupWrite']
+                    }
+                })
+            }
+        }
+        message = QueueMessage()
+        message.id = 1
+        message.dequeue_count = 0
+        message.content = base64.b64encode(json.dumps({
+            'id': 'event-1',
+            'subject': '/subscriptions/ea98974b-5d2a-4d98-a78a-382f3715d07e/resourceGroups/rg1',
+            'data': {'operationName': 'Microsoft.Resources/subscriptions/resourceGroups/write'}
+        }).encode('utf-8'))
+
+        # an event failing to schedule isn't a duplicate when retried
+        add_job_mock.side_effect = [ValueError('scheduler'), None]
+        with self.assertRaises(ValueError):
+            host.run_policies_for_event(message)
+        host.run_policies_for_event(message)
+        self.assertEqual(add_job_mock.call_count, 2)
+
+    def test_scheduler_config(self):
+        config = Host.get_scheduler_config()
+        self.assertEqual(config['apscheduler.executors.default']['max_workers'], '8')
+        config = Host.get_scheduler_config(16)
+        self.assertEqual(config['apscheduler.executors.default']['max_workers'], '16')
+
     @patch('c7n_azure.container_host.host.Host.update_event_subscription')
     @patch('c7n_azure.container_host.host.Host.prepare_queue_storage')
     @patch('c7n_azure.container_host.host.Storage')
@@ -43,6 +43,7 @@ from c7n.reports.csvout import Formatter, fs_record_set
 from c7n.resources import load_available
 from c7n.utils import CONN_CACHE, dumps
 
+from c7n_org.scheduler import RunJournal, batch_tasks, get_tasks, run_timed
 from c7n_org.utils import environ, account_tags
 
 log = logging.getLogger('c7n_org')
@@ -507,8 +508,29 @@ def accounts_iterator(config):
         yield d
 
 
+def run_tasks(tasks, output_path, cache_period, cache_path, metrics, dryrun, debug):
+    """Execute a batch of tasks in sequence, returning their timed results.
+
+    The subscriptions of a batch of several tasks are passed to each
+    execution, for resource graph queries to cover them. A task's error
+    is returned as its result.
+    """
+    subscriptions = len(tasks) > 1 and [a['account_id'] for _, a, _, _ in tasks] or ()
+    results = []
+    for key, a, r, task_config in tasks:
+        try:
+            results.append(run_timed(
+                run_account, a, r, task_config, output_path, cache_period,
+                cache_path, metrics, dryrun, debug, subscriptions))
+        except Exception as e:
+            if debug:
+                raise
+            results.append(e)
+    return results
+
+
 def run_account(account, region, policies_config, output_path,
-                cache_period, cache_path, metrics, dryrun, debug):
+                cache_period, cache_path, metrics, dryrun, debug, subscriptions=()):
     """Execute a set of policies on an account.
     """
     logging.getLogger('custodian.output').setLevel(logging.ERROR + 1)
@@ -526,7 +548,8 @@ def run_account(account, region, policies_config, output_path,
         region=region, cache=cache_path,
         cache_period=cache_period, dryrun=dryrun, output_dir=output_path,
         account_id=account['account_id'], metrics_enabled=metrics,
-        log_group=None, profile=None, external_id=None)
+        log_group=None, profile=None, external_id=None,
+        resource_graph_subscriptions=list(subscriptions))
 
     env_vars = account_tags(account)
 
@@ -614,12 +637,21 @@ def run_account(account, region, policies_config, output_path,
 @click.option("--metrics", default=False, is_flag=True)
 @click.option("--metrics-uri", default=None, help="Configure provider metrics target")
 @click.option("--dryrun", default=False, is_flag=True)
+@click.option("--resume", default=False, is_flag=True,
+              help="Skip tasks completed by the previous, interrupted run")
+@click.option("--batch-subscriptions", default=0, type=int,
+              help="Run azure subscriptions in batches of this size, "
+              "querying the resource graph once per batch")
 @click.option('--debug', default=False, is_flag=True)
 @click.option('-v', '--verbose', default=False, help="Verbose", is_flag=True)
 def run(config, use, output_dir, accounts, tags, region,
         policy, policy_tags, cache_period, cache_path, metrics,
-        dryrun, debug, verbose, metrics_uri):
-    """run a custodian policy across accounts"""
+        dryrun, resume, batch_subscriptions, debug, verbose, metrics_uri):
+    """run a custodian policy across accounts
+
+    Work is scheduled per account, region and resource type, longest
+    first by the durations of previous runs.
+    """
     accounts_config, custodian_config, executor = init(
         config, use, debug, verbose, accounts, tags, policy, policy_tags=policy_tags)
     policy_counts = Counter()
@@ -633,37 +665,53 @@ def run(config, use, output_dir, accounts, tags, region,
         if not os.path.exists(cache_path):
             os.makedirs(cache_path)
 
+    tasks = get_tasks(
+        accounts_config['accounts'],
+        lambda a: resolve_regions(region or a.get('regions', ())),
+        custodian_config)
+    journal = RunJournal(cache_path, tasks, resume)
+    pending = []
+    for key, a, r, task_config in journal.order(tasks):
+        if key in journal.completed:
+            policy_counts.update(journal.completed[key]['policy_counts'])
+            continue
+        pending.append((key, a, r, task_config))
+
     with executor(max_workers=WORKER_COUNT) as w:
         futures = {}
-        for a in accounts_config['accounts']:
-            for r in resolve_regions(region or a.get('regions', ())):
-                futures[w.submit(
-                    run_account,
-                    a, r,
-                    custodian_config,
-                    output_dir,
-                    cache_period,
-                    cache_path,
-                    metrics,
-                    dryrun,
-                    debug)] = (a, r)
+        for batch in batch_tasks(pending, batch_subscriptions):
+            futures[w.submit(
+                run_tasks,
+                batch,
+                output_dir,
+                cache_period,
+                cache_path,
+                metrics,
+                dryrun,
+                debug)] = batch
 
         for f in as_completed(futures):
-            a, r = futures[f]
             if f.exception():
                 if debug:
-                    raise
-                log.warning(
-                    "Error running policy in %s @ %s exception: %s",
-                    a['name'], r, f.exception())
-                continue
+                    raise f.exception()
+                results = [f.exception()] * len(futures[f])
+            else:
+                results = f.result()
+            for (key, a, r, _), result in zip(futures[f], results):
+                if isinstance(result, Exception):
+                    log.warning(
+                        "Error running policy in %s @ %s exception: %s",
+                        a['name'], r, result)
+                    continue
 
-            account_region_pcounts, account_region_success = f.result()
-            for p in account_region_pcounts:
-                policy_counts[p] += account_region_pcounts[p]
+                (task_pcounts, task_success), duration = result
+                journal.record(key, duration, task_pcounts, task_success)
+                log.debug("Completed task:%s time:%0.2f", key, duration)
+                for p in task_pcounts:
+                    policy_counts[p] += task_pcounts[p]
 
-            if not account_region_success:
-                success = False
+                if not task_success:
+                    success = False
 
     log.info("Policy resource counts %s" % policy_counts)
 
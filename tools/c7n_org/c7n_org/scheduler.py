@@ -0,0 +1,168 @@
+# Copyright 2020 Cloud Custodian Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Task scheduling for org runs.
+
+A run is split into tasks of an account, a region and the policies for
+one resource type, so a large account's work spreads across workers. Task
+durations are journaled as they complete, ordering subsequent runs longest
+first, and letting an interrupted run resume where it stopped.
+
+Note policies of different resource types run in separate tasks, so they
+no longer share the related resources one fetches for another within a
+process.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+
+log = logging.getLogger('c7n_org.scheduler')
+
+
+def get_resource_type(policy):
+    resource = policy['resource']
+    if '.' not in resource:
+        resource = 'aws.%s' % resource
+    return resource
+
+
+def group_policies(policies_config):
+    """Split a policies config into a config per resource type."""
+    groups = {}
+    for p in policies_config.get('policies', ()):
+        groups.setdefault(get_resource_type(p), []).append(p)
+    return [(resource_type, dict(policies_config, policies=policies))
+            for resource_type, policies in groups.items()]
+
+
+def get_digest(data):
+    return hashlib.sha256(
+        json.dumps(data, sort_keys=True, default=str).encode('utf8')).hexdigest()[:12]
+
+
+def get_tasks(accounts, regions, policies_config):
+    """Get the (key, account, region, policies config) tasks of a run.
+
+    Keys include a digest of the task's policies, so changed policies
+    aren't taken as completed by a resumed run.
+
+    :param regions: a function returning the regions of an account.
+    """
+    groups = group_policies(policies_config)
+    tasks = []
+    for a in accounts:
+        account_id = a.get('account_id') or a.get('project_id') or a.get('subscription_id')
+        for r in regions(a):
+            for resource_type, config in groups:
+                key = "%s:%s:%s:%s" % (account_id, r, resource_type, get_digest(config))
+                tasks.append((key, a, r, config))
+    return tasks
+
+
+def batch_tasks(tasks, size):
+    """Group the tasks of azure subscriptions into batches of up to size.
+
+    A batch's tasks share a region and policies and run in sequence in
+    one worker, so resource graph queries can cover the subscriptions of
+    the batch. Other tasks are batches of their own, and batches are
+    ordered by their first task.
+    """
+    batches = []
+    groups = {}
+    for t in tasks:
+        key, a, r, config = t
+        if size < 2 or not get_resource_type(config['policies'][0]).startswith('azure.'):
+            batches.append([t])
+            continue
+        # the task key without its account
+        group_key = key.split(':', 1)[1]
+        batch = groups.get(group_key)
+        if batch is None or len(batch) >= size:
+            batch = groups[group_key] = []
+            batches.append(batch)
+        batch.append(t)
+    return batches
+
+
+def run_timed(func, *args):
+    st = time.time()
+    result = func(*args)
+    return result, time.time() - st
+
+
+class RunJournal:
+    """Durations and completions of an org run's tasks.
+
+    Completed tasks are appended to a journal in the cache directory as
+    they finish, with a journal per set of tasks, so concurrent runs of
+    other accounts or policies don't share one. On start, durations from
+    the journal are merged into those of prior runs, and unless resuming,
+    the journal is reset. A resumed run skips tasks the journal records
+    as successful.
+    """
+
+    journal_file = 'org-run-journal-%s.jsonl'
+    durations_file = 'org-run-durations.json'
+
+    def __init__(self, cache_path, tasks, resume=False):
+        self.journal_path = os.path.join(
+            cache_path, self.journal_file % get_digest(sorted(t[0] for t in tasks)))
+        self.durations_path = os.path.join(cache_path, self.durations_file)
+        self.durations = {}
+        self.completed = {}
+
+        if os.path.exists(self.durations_path):
+            with open(self.durations_path) as fh:
+                self.durations = json.load(fh)
+        records = self.read()
+        for r in records:
+            self.durations[r['key']] = r['duration']
+        # replaced atomically, as concurrent runs may be reading it
+        tmp_path = "%s.%d" % (self.durations_path, os.getpid())
+        with open(tmp_path, 'w') as fh:
+            json.dump(self.durations, fh)
+        os.replace(tmp_path, self.durations_path)
+
+        if resume:
+            self.completed = {r['key']: r for r in records if r['success']}
+            if self.completed:
+                log.info("Resuming run, %d tasks completed", len(self.completed))
+        else:
+            open(self.journal_path, 'w').close()
+
+    def read(self):
+        if not os.path.exists(self.journal_path):
+            return []
+        records = []
+        with open(self.journal_path) as fh:
+            for line in fh:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # a partial record, written as the run was interrupted
+                    continue
+        return records
+
+    def order(self, tasks):
+        """Order tasks longest first, with tasks of unknown duration leading."""
+        return sorted(
+            tasks, key=lambda t: -self.durations.get(t[0], float('inf')))
+
+    def record(self, key, duration, policy_counts, success):
+        self.durations[key] = duration
+        with open(self.journal_path, 'a') as fh:
+            fh.write(json.dumps({
+                'key': key, 'duration': duration,
+                'policy_counts': policy_counts, 'success': success}) + "\n")
@@ -7,6 +7,7 @@ from c7n.testing import TestUtils
 from click.testing import CliRunner
 
 from c7n_org import cli as org
+from c7n_org.scheduler import RunJournal, batch_tasks, get_tasks
 
 
 ACCOUNTS_AWS_DEFAULT = yaml.safe_dump({
@@ -118,12 +119,16 @@ class OrgTest(TestUtils):
             catch_exceptions=False)
         self.assertEqual(result.exit_code, 0)
 
+    def get_run_account(self, counts, failed=()):
+        def run_account(account, region, policies_config, *args):
+            return ({p['name']: counts[p['name']] for p in policies_config['policies']},
+                    not any(p['name'] in failed for p in policies_config['policies']))
+        return mock.MagicMock(side_effect=run_account)
+
     def test_cli_run_aws(self):
         run_dir = self.setup_run_dir()
         logger = mock.MagicMock()
-        run_account = mock.MagicMock()
-        run_account.return_value = (
-            {'compute': 24, 'serverless': 12}, True)
+        run_account = self.get_run_account({'compute': 24, 'serverless': 12})
         self.patch(org, 'logging', logger)
         self.patch(org, 'run_account', run_account)
         self.change_cwd(run_dir)
@@ -141,6 +146,125 @@ class OrgTest(TestUtils):
             log_output.getvalue().strip(),
             "Policy resource counts Counter({'compute': 96, 'serverless': 48})")
 
+    def test_cli_run_resume(self):
+        run_dir = self.setup_run_dir()
+        self.patch(org, 'logging', mock.MagicMock())
+        run_account = self.get_run_account(
+            {'compute': 24, 'serverless': 12}, failed=('serverless',))
+        self.patch(org, 'run_account', run_account)
+        self.change_cwd(run_dir)
+        args = ['run', '-c', 'accounts.yml', '-u', 'policies.yml',
+                '--debug', '-s', 'output', '--cache-path', 'cache']
+
+        result = CliRunner().invoke(org.cli, args)
+        self.assertEqual(result.exit_code, 1)
+        self.assertEqual(run_account.call_count, 8)
+
+        run_account.reset_mock()
+        run_account.side_effect = self.get_run_account(
+            {'compute': 24, 'serverless': 12}).side_effect
+        log_output = self.capture_logging('c7n_org')
+        result = CliRunner().invoke(org.cli, args + ['--resume'], catch_exceptions=False)
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(
+            [c[0][2]['policies'][0]['name'] for c in run_account.call_args_list],
+            ['serverless'] * 4)
+        self.assertEqual(
+            log_output.getvalue().strip().splitlines(),
+            ["Resuming run, 4 tasks completed",
+             "Policy resource counts Counter({'compute': 96, 'serverless': 48})"])
+
+    def test_schedule_order(self):
+        cache_path = self.get_temp_dir()
+        policies = {'policies': [
+            {'name': 'compute', 'resource': 'ec2'},
+            {'name': 'serverless', 'resource': 'aws.lambda'},
+            {'name': 'compute-stopped', 'resource': 'aws.ec2'}]}
+        accounts = [{'name': 'dev', 'account_id': '112233445566'}]
+        tasks = get_tasks(accounts, lambda a: ['us-east-1'], policies)
+        ec2_key, lambda_key = [t[0] for t in tasks]
+        self.assertEqual(
+            [(t[0].rsplit(':', 1)[0], [p['name'] for p in t[3]['policies']]) for t in tasks],
+            [('112233445566:us-east-1:aws.ec2', ['compute', 'compute-stopped']),
+             ('112233445566:us-east-1:aws.lambda', ['serverless'])])
+
+        journal = RunJournal(cache_path, tasks)
+        self.assertEqual(journal.order(tasks), tasks)
+        journal.record(ec2_key, 10, {'compute': 1}, True)
+        journal.record(lambda_key, 30, {'serverless': 1}, False)
+
+        journal = RunJournal(cache_path, tasks, resume=True)
+        self.assertEqual([t[0] for t in journal.order(tasks)], [lambda_key, ec2_key])
+        self.assertEqual(list(journal.completed), [ec2_key])
+
+        # durations persist across runs
+        journal = RunJournal(cache_path, tasks)
+        self.assertEqual(journal.completed, {})
+        self.assertEqual(journal.durations[lambda_key], 30)
+
+    def test_cli_run_batch_subscriptions(self):
+        run_dir = self.setup_run_dir(
+            accounts={'subscriptions': [
+                {'subscription_id': 'sub-%d' % i, 'name': 'sub-%d' % i} for i in range(5)]},
+            policies={'policies': [
+                {'name': 'vms', 'resource': 'azure.vm'},
+                {'name': 'disks', 'resource': 'azure.disk'}]})
+        self.patch(org, 'logging', mock.MagicMock())
+        run_account = self.get_run_account({'vms': 2, 'disks': 1})
+        self.patch(org, 'run_account', run_account)
+        self.change_cwd(run_dir)
+        log_output = self.capture_logging('c7n_org')
+        result = CliRunner().invoke(
+            org.cli,
+            ['run', '-c', 'accounts.yml', '-u', 'policies.yml', '--debug',
+             '-s', 'output', '--cache-path', 'cache', '--batch-subscriptions', '3'],
+            catch_exceptions=False)
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(
+            log_output.getvalue().strip(),
+            "Policy resource counts Counter({'vms': 10, 'disks': 5})")
+        # each task is passed the subscriptions of its batch
+        self.assertEqual(
+            sorted((c[0][0]['account_id'], c[0][2]['policies'][0]['name'], tuple(c[0][-1]))
+                   for c in run_account.call_args_list if c[0][0]['account_id'] == 'sub-4'),
+            [('sub-4', 'disks', ('sub-3', 'sub-4')), ('sub-4', 'vms', ('sub-3', 'sub-4'))])
+
+    def test_batch_tasks(self):
+        policies = {'policies': [
+            {'name': 'vms', 'resource': 'azure.vm'},
+            {'name': 'compute', 'resource': 'ec2'}]}
+        accounts = [{'name': 'sub-%d' % i, 'account_id': 'sub-%d' % i} for i in range(3)]
+        tasks = get_tasks(accounts, lambda a: ['global'], policies)
+        self.assertEqual(
+            [[(t[1]['name'], t[3]['policies'][0]['name']) for t in b]
+             for b in batch_tasks(tasks, 2)],
+            [[('sub-0', 'vms'), ('sub-1', 'vms')], [('sub-0', 'compute')],
+             [('sub-1', 'compute')], [('sub-2', 'vms')], [('sub-2', 'compute')]])
+        self.assertEqual(len(batch_tasks(tasks, 0)), 6)
+
+    def test_resume_changed_policies(self):
+        cache_path = self.get_temp_dir()
+        policies = {'policies': [
+            {'name': 'compute', 'resource': 'ec2'},
+            {'name': 'serverless', 'resource': 'aws.lambda'}]}
+        accounts = [{'name': 'dev', 'account_id': '112233445566'}]
+        tasks = get_tasks(accounts, lambda a: ['us-east-1'], policies)
+        journal = RunJournal(cache_path, tasks)
+        for t in tasks:
+            journal.record(t[0], 10, {}, True)
+
+        # a run of other accounts has its own journal
+        other_tasks = get_tasks(
+            [{'name': 'prod', 'account_id': '665544332211'}], lambda a: ['us-east-1'], policies)
+        RunJournal(cache_path, other_tasks)
+        self.assertEqual(len(RunJournal(cache_path, tasks, resume=True).completed), 2)
+
+        # changed policies are run again
+        policies['policies'][0]['filters'] = [{'State.Name': 'running'}]
+        tasks = get_tasks(accounts, lambda a: ['us-east-1'], policies)
+        journal = RunJournal(cache_path, tasks, resume=True)
+        self.assertEqual(journal.completed, {})
+
     def test_filter_policies(self):
         d = {'policies': [
             {'name': 'find-ml',
@@ -0,0 +1,105 @@
+# Copyright 2020 Cloud Custodian Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark s3 bucket augmentation against recorded placebo data.
+
+Replays a placebo recording for a synthetic fleet of buckets, adding a
+fixed latency to each api call to approximate the service, and reports
+augment time per worker count.
+
+  python tools/dev/s3augmentbench.py --buckets 500 --latency 0.05 \\
+     -w 10 -w 40 -k tag:Env
+"""
+from datetime import datetime
+import os
+import time
+
+import boto3
+import click
+import placebo
+
+from c7n.config import Config
+from c7n.policy import Policy
+from c7n.resources import load_resources
+from c7n.resources import s3
+
+DEFAULT_DATA = os.path.join(
+    os.path.dirname(__file__), os.pardir, os.pardir,
+    'tests', 'data', 'placebo', 'test_s3_normalize')
+
+
+class Counter:
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    def __call__(self, **kw):
+        self.calls += 1
+        time.sleep(self.latency)
+
+
+def recorded_table(data_dir):
+    """The augment methods with a recorded response."""
+    recorded = {n.split('_', 1)[0] for n in os.listdir(data_dir)}
+    table = []
+    for m in s3.S3_AUGMENT_TABLE:
+        op = 's3.%s' % ''.join(p.title() for p in m[0].split('_'))
+        if op in recorded:
+            table.append(m)
+    return table
+
+
+@click.command()
+@click.option('--data-dir', default=DEFAULT_DATA, type=click.Path(exists=True),
+              help="placebo recording with s3 augment responses")
+@click.option('--buckets', default=200, help="number of synthetic buckets")
+@click.option('--latency', default=0.02, help="seconds of latency per api call")
+@click.option('-w', '--workers', multiple=True, type=int, default=(10, 20, 40),
+              help="augment worker counts to compare")
+@click.option('-k', '--filter-key', multiple=True,
+              help="value filter keys of the policy, the default is all attributes")
+def main(data_dir, buckets, latency, workers, filter_key):
+    load_resources(('aws.s3',))
+    table = recorded_table(data_dir)
+    s3.S3_AUGMENT_TABLE = table
+    click.echo("recorded augment methods: %s" % ", ".join(m[0] for m in table))
+
+    fleet = [{'Name': 'bench-%d' % i, 'CreationDate': datetime.utcnow()}
+             for i in range(buckets)]
+    data = {'name': 's3-bench', 'resource': 's3'}
+    if filter_key:
+        data['filters'] = [{'type': 'value', 'key': k, 'value': 'present'}
+                           for k in filter_key]
+
+    for w in workers:
+        session = boto3.Session(region_name='us-east-1')
+        pill = placebo.attach(session, data_dir)
+        counter = Counter(latency)
+        session.events.register_first('before-call.*.*', counter)
+        pill.playback()
+
+        policy = Policy(data, Config.empty(), session_factory=lambda: session)
+        manager = policy.resource_manager
+        manager.augment_keys = manager.get_augment_keys()
+        source = manager.source
+        source.max_workers = w
+
+        t = time.time()
+        source.augment([dict(b) for b in fleet])
+        click.echo("workers:%d buckets:%d calls:%d time:%0.2f" % (
+            w, buckets, counter.calls, time.time() - t))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+# Copyright 2020 Cloud Custodian Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Build the resource indexes of installed providers, for packaging.
+
+An index is written alongside each provider's module and shipped in its
+package. It lets schema generation skip importing resource modules, and
+resources load only the modules of their filters and actions.
+
+  python tools/dev/schemaindex.py -p aws -p gcp
+  python tools/dev/schemaindex.py --clean
+"""
+import os
+
+import click
+
+from c7n.resources import PROVIDER_NAMES, load_available, reset_index
+from c7n.schema import get_index_path, save_index
+
+
+@click.command()
+@click.option('-p', '--provider', multiple=True,
+              help="providers to index, the default is all installed")
+@click.option('--clean', is_flag=True, help="remove the indexes instead")
+def main(provider, clean):
+    # indexes are built with every module of their provider loaded
+    for p in PROVIDER_NAMES:
+        reset_index(p, ignore=True)
+    providers = provider or load_available(resources=False)
+    for p in providers:
+        if clean:
+            path = get_index_path(p)
+            if os.path.exists(path):
+                os.remove(path)
+            click.echo("%s removed:%s" % (p, path))
+            continue
+        index, path = save_index(p)
+        click.echo("%s resources:%d path:%s" % (p, len(index['resources']), path))
+
+
+if __name__ == '__main__':
+    main()
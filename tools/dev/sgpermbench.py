@@ -0,0 +1,100 @@
+# Copyright 2020 Cloud Custodian Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark security group permission filters on a synthetic fleet.
+
+Generates security groups with random ingress rules, and reports the
+time of an ingress filter matching cidrs with interval tables against
+matching with a value filter per range.
+
+  python tools/dev/sgpermbench.py --groups 20000 --rules 100 \\
+     --cidr 10.0.0.0/8 -p 22 -p 3389
+"""
+import random
+import time
+
+import click
+
+from c7n.config import Config
+from c7n.policy import Policy
+from c7n.resources import load_resources
+from c7n.resources import vpc
+
+
+def generate_fleet(groups, rules, cidrs, seed=0):
+    rand = random.Random(seed)
+    cidr_pool = ['0.0.0.0/0']
+    for i in range(cidrs):
+        octets = (rand.choice((10, 172, 192)), rand.randrange(256), rand.randrange(256))
+        if rand.random() < 0.5:
+            cidr_pool.append('%d.%d.0.0/16' % octets[:2])
+        else:
+            cidr_pool.append('%d.%d.%d.0/24' % octets)
+    fleet = []
+    for i in range(groups):
+        permissions = []
+        for j in range(rules):
+            from_port = rand.choice((22, 80, 443, 1024, 3389, 8080))
+            permissions.append({
+                'IpProtocol': 'tcp', 'FromPort': from_port,
+                'ToPort': from_port + rand.choice((0, 0, 0, 100)),
+                'IpRanges': [{'CidrIp': rand.choice(cidr_pool)}
+                             for k in range(rand.randrange(1, 4))],
+                'Ipv6Ranges': [], 'PrefixListIds': [], 'UserIdGroupPairs': []})
+        fleet.append({'GroupId': 'sg-%08x' % i, 'OwnerId': '123456789012',
+                      'IpPermissions': permissions})
+    return fleet
+
+
+def run_filter(policy, fleet, intervals):
+    f = policy.resource_manager.filters[0]
+    if not intervals:
+        original = vpc.CidrMatcher.__init__
+
+        def value_matcher(self, *args):
+            original(self, *args)
+            self.op = None
+        vpc.CidrMatcher.__init__ = value_matcher
+    try:
+        t = time.time()
+        matched = f.process([dict(r) for r in fleet])
+        return len(matched), time.time() - t
+    finally:
+        if not intervals:
+            vpc.CidrMatcher.__init__ = original
+
+
+@click.command()
+@click.option('--groups', default=2000, help="number of synthetic security groups")
+@click.option('--rules', default=50, help="ingress rules per group")
+@click.option('--cidrs', default=500, help="distinct cidrs across the fleet")
+@click.option('--cidr', default='10.0.0.0/8', help="cidr the rules must be within")
+@click.option('-p', '--port', multiple=True, type=int, default=(22, 3389),
+              help="ports the rules must allow")
+def main(groups, rules, cidrs, cidr, port):
+    load_resources(('aws.security-group',))
+    fleet = generate_fleet(groups, rules, cidrs)
+    policy = Policy({
+        'name': 'sg-bench', 'resource': 'security-group',
+        'filters': [{'type': 'ingress', 'Ports': list(port),
+                     'Cidr': {'value': cidr, 'op': 'in', 'value_type': 'cidr'}}]},
+        Config.empty())
+
+    for label, intervals in (('value-filter', False), ('intervals', True)):
+        count, elapsed = run_filter(policy, fleet, intervals)
+        click.echo("%s groups:%d rules:%d matched:%d time:%0.2f" % (
+            label, groups, groups * rules, count, elapsed))
+
+
+if __name__ == '__main__':
+    main()